@@ -0,0 +1,94 @@
+"""
+Keyword Top-k Benchmark
+
+Compares exhaustive BM25 scoring with the block-max top-k evaluator of
+InvertedIndex on synthetic corpora of increasing size. Documents and queries
+draw words from a Zipf-distributed vocabulary, so queries mix very common and
+rare terms like real ones do.
+
+Usage:
+    python -m benchmarks.bench_keyword_topk --sizes 10000,100000,1000000 --k 20
+"""
+
+import argparse
+import tempfile
+import time
+from typing import Iterator, List
+
+import numpy as np
+
+from src.retrieval.inverted_index import IndexEntry, InvertedIndex
+
+
+def make_corpus(rng: np.random.Generator, size: int, vocab_size: int, min_words: int, max_words: int, batch_size: int = 5000) -> Iterator[List[str]]:
+    """Yield the corpus in batches so a million chunks never sit in memory at once."""
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    for start in range(0, size, batch_size):
+        lengths = rng.integers(min_words, max_words, size=min(batch_size, size - start))
+        words = vocab[rng.choice(vocab_size, size=int(lengths.sum()), p=weights)]
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        yield [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(len(lengths))]
+
+
+def make_queries(rng: np.random.Generator, count: int, vocab_size: int) -> List[str]:
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    return [" ".join(f"w{i}" for i in rng.choice(vocab_size, size=rng.integers(1, 5), p=weights)) for _ in range(count)]
+
+
+def time_queries(index: InvertedIndex, queries: List[str], k: int, exhaustive: bool):
+    timings, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, limit=k, exhaustive=exhaustive))
+        timings.append(time.perf_counter() - started)
+    return np.array(timings) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated corpus sizes (chunks)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--vocab", type=int, default=100_000)
+    parser.add_argument("--words", default="40,160", help="Min,max words per chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    min_words, max_words = (int(x) for x in args.words.split(","))
+    rng = np.random.default_rng(args.seed)
+    queries = make_queries(rng, args.queries, args.vocab)
+
+    print(f"{'chunks':>9} {'build s':>8} {'exhaustive ms (p50/p95)':>25} {'top-k ms (p50/p95)':>20} {'speedup':>8} {'same top-k':>10}")
+    for size in (int(x) for x in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as path:
+            index = InvertedIndex(path)
+            build = 0.0
+            for batch in make_corpus(rng, size, args.vocab, min_words, max_words):
+                started = time.perf_counter()
+                index.add([IndexEntry(key=str(len(index) + i), text=text, payload="") for i, text in enumerate(batch)])
+                build += time.perf_counter() - started
+            started = time.perf_counter()
+            index.flush()
+            build += time.perf_counter() - started
+
+            exhaustive, expected = time_queries(index, queries, args.k, exhaustive=True)
+            top_k, actual = time_queries(index, queries, args.k, exhaustive=False)
+            # Compare scores rather than ids so ties may be broken differently
+            same = np.mean([
+                np.allclose([s for _, s in a], [s for _, s in b]) if len(a) == len(b) else False
+                for a, b in zip(expected, actual)
+            ])
+            print(
+                f"{size:>9} {build:>8.1f} "
+                f"{np.median(exhaustive):>12.2f} / {np.percentile(exhaustive, 95):>8.2f} "
+                f"{np.median(top_k):>9.2f} / {np.percentile(top_k, 95):>8.2f} "
+                f"{exhaustive.mean() / top_k.mean():>7.1f}x {same:>10.0%}"
+            )
+            index.conn.close()
+
+
+if __name__ == "__main__":
+    main()
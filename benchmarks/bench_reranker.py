@@ -0,0 +1,114 @@
+"""
+Reranker Backend Benchmark
+
+Scores the same (query, passage) pairs with the PyTorch cross-encoder and the
+ONNX Runtime backend (fp32 and dynamic int8) and reports per-pair latency and
+how closely each ONNX variant agrees with PyTorch: max absolute score
+difference, mean Spearman rank correlation per query and top-k overlap.
+Passages are paragraphs of the text/code files under --path.
+
+Usage:
+    python -m benchmarks.bench_reranker --path . --queries 20 --candidates 20 --threads 4
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from src.retrieval.reranking import DEFAULT_RERANK_MODEL, OnnxCrossEncoder, export_onnx
+
+EXTENSIONS = {".md", ".txt", ".py"}
+
+
+def load_passages(path: str, limit: int = 2000) -> List[str]:
+    passages = []
+    for root, _, files in os.walk(path):
+        if ".git" in root:
+            continue
+        for file in files:
+            if os.path.splitext(file)[1].lower() in EXTENSIONS:
+                with open(os.path.join(root, file), encoding="utf-8", errors="ignore") as f:
+                    passages.extend(p.strip() for p in f.read().split("\n\n") if len(p.strip()) > 80)
+    return passages[:limit]
+
+
+def make_queries(rng: random.Random, passages: List[str], count: int) -> List[str]:
+    # A handful of words from a random passage, so each query has real matches
+    queries = []
+    for _ in range(count):
+        words = rng.choice(passages).split()
+        start = rng.randrange(max(1, len(words) - 6))
+        queries.append(" ".join(words[start:start + 6]))
+    return queries
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    ra, rb = np.argsort(np.argsort(a)), np.argsort(np.argsort(b))
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def run(model, groups: List[List[List[str]]], batch_size: int, repeat: int):
+    model.predict(groups[0], batch_size=batch_size)  # Warm up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scores = [np.asarray(model.predict(pairs, batch_size=batch_size), dtype=np.float32) for pairs in groups]
+        best = min(best, time.perf_counter() - started)
+    return best, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=".")
+    parser.add_argument("--model", default=DEFAULT_RERANK_MODEL)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=20, help="Passages reranked per query")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import CrossEncoder
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    rng = random.Random(args.seed)
+    passages = load_passages(args.path)
+    queries = make_queries(rng, passages, args.queries)
+    groups = [[[query, passage] for passage in rng.sample(passages, args.candidates)] for query in queries]
+    pairs = sum(len(group) for group in groups)
+    print(f"{len(queries)} queries x {args.candidates} candidates = {pairs} pairs")
+
+    torch_seconds, reference = run(CrossEncoder(args.model), groups, args.batch_size, args.repeat)
+    print(f"{'backend':>10} {'model MB':>9} {'ms/pair':>8} {'speedup':>8} {'max |diff|':>11} {'spearman':>9} {'top-k overlap':>14}")
+    print(f"{'torch':>10} {'':>9} {torch_seconds / pairs * 1000:>8.3f} {1.0:>7.1f}x")
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        for quantize in (False, True):
+            path = export_onnx(args.model, model_dir, quantize=quantize)
+            model = OnnxCrossEncoder(args.model, model_dir=model_dir, quantize=quantize, intra_op_threads=args.threads)
+            seconds, scores = run(model, groups, args.batch_size, args.repeat)
+
+            diff = max(float(np.abs(a - b).max()) for a, b in zip(scores, reference))
+            rho = np.mean([spearman(a, b) for a, b in zip(scores, reference)])
+            overlap = np.mean([
+                len(set(np.argsort(-a)[:args.top_k]) & set(np.argsort(-b)[:args.top_k])) / args.top_k
+                for a, b in zip(scores, reference)
+            ])
+            print(
+                f"{'onnx-int8' if quantize else 'onnx-fp32':>10} {os.path.getsize(path) / 2**20:>9.1f} "
+                f"{seconds / pairs * 1000:>8.3f} {torch_seconds / seconds:>7.1f}x "
+                f"{diff:>11.4f} {rho:>9.3f} {overlap:>14.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
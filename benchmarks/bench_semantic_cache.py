@@ -0,0 +1,62 @@
+"""
+Semantic Cache Benchmark
+
+Insert throughput, lookup latency and hit rate of one SemanticCache
+partition (CachePartition) as it grows, on synthetic clustered query
+embeddings. Lookups are near-duplicates of cached queries, so every one
+should hit; a miss means the probed clusters did not contain the entry.
+
+Usage:
+    python -m benchmarks.bench_semantic_cache --sizes 1000,10000,100000 --dim 512
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.config import settings
+from src.orchestration.cache_backends import CachePartition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=settings.SEMANTIC_CACHE_DIMENSIONS or 3072)
+    parser.add_argument("--exact-threshold", type=int, default=settings.SEMANTIC_CACHE_EXACT_THRESHOLD)
+    parser.add_argument("--nprobe", type=int, default=settings.SEMANTIC_CACHE_NPROBE)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.topics, args.dim)).astype(np.float32)
+    print(f"{'entries':>8} {'insert us':>10} {'p50 ms':>8} {'p95 ms':>8} {'hit rate':>9} {'MB':>7}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = centers[rng.integers(args.topics, size=size)] + 0.5 * rng.normal(size=(size, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        partition = CachePartition(args.dim, exact_threshold=args.exact_threshold, nprobe=args.nprobe)
+        started = time.perf_counter()
+        for i, vector in enumerate(vectors):
+            partition.insert(vector, str(i), expires=float("inf"), now=0.0)
+        insert_us = (time.perf_counter() - started) / size * 1e6
+
+        timings, hits = [], 0
+        for i in rng.integers(size, size=args.queries):
+            query = vectors[i] + 0.01 * rng.normal(size=args.dim).astype(np.float32)
+            query /= np.linalg.norm(query)
+            started = time.perf_counter()
+            found = partition.lookup(query, settings.SEMANTIC_CACHE_THRESHOLD, now=1.0)
+            timings.append(time.perf_counter() - started)
+            hits += found is not None and found[0] == str(i)
+        ms = np.array(timings) * 1000
+        print(
+            f"{size:>8} {insert_us:>10.1f} {np.median(ms):>8.3f} {np.percentile(ms, 95):>8.3f} "
+            f"{hits / args.queries:>9.3f} {partition._vectors.nbytes / 2**20:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
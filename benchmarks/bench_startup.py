@@ -0,0 +1,90 @@
+"""
+API Startup Benchmark
+
+Measures how long `import src.api.main` takes in a fresh interpreter (the cost
+every worker, autoscaled pod and test run pays before serving /health) and
+lists the slowest imports from `python -X importtime`. Heavy modules such as
+torch, sentence_transformers, openai and qdrant_client should not show up
+here: they are imported when the orchestrator is built after startup.
+
+With --max-ms the script exits non-zero when the median exceeds the budget,
+so it can run in CI to catch startup regressions.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5 --top 15 --max-ms 1000
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULE = "src.api.main"
+HEAVY_MODULES = ["torch", "sentence_transformers", "onnxruntime", "openai", "qdrant_client"]
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+# Dummy credentials so src.config validates without a .env
+ENV = {
+    "AZURE_OPENAI_API_KEY": "bench",
+    "AZURE_OPENAI_ENDPOINT_EU": "http://localhost",
+    "AZURE_OPENAI_EMBEDDINGS_API_KEY": "bench",
+    "AZURE_OPENAI_EMBEDDINGS_ENDPOINT": "http://localhost",
+}
+
+
+def measure(module: str) -> Tuple[float, Dict[str, int], List[str]]:
+    """Import ``module`` in a subprocess; return (total ms, cumulative us per top-level import, heavy modules loaded)."""
+    script = (
+        "import sys; import " + module + "; "
+        "print(','.join(m for m in " + repr(HEAVY_MODULES) + " if m in sys.modules))"
+    )
+    env = {**ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True, text=True, env=env, check=True
+    )
+    cumulative = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            total_us += us
+        # Top two levels: our modules and what each of them pulled in
+        if indent <= 3:
+            cumulative[name] = max(cumulative.get(name, 0), us)
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    return total_us / 1000, cumulative, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=MODULE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the median import time exceeds this")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    totals = [total for total, _, _ in runs]
+    median = statistics.median(totals)
+    _, cumulative, heavy = runs[-1]
+
+    print(f"import {args.module}: median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms ({args.repeat} runs)")
+    print(f"heavy modules loaded at import: {', '.join(heavy) or 'none'}")
+    print("\nslowest imports (cumulative ms, last run):")
+    for name, us in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{us / 1000:>9.1f}  {name}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"\nFAIL: median import time {median:.0f} ms exceeds budget of {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local Vector Index Benchmark
+
+Measures recall@k against exact search and per-query latency of the local
+IVF index (IVFIndex) for a sweep of nprobe values, plus exact scan latency,
+on synthetic clustered embeddings. Optionally compares with the in-memory
+Qdrant client the VectorStore used to fall back to.
+
+Usage:
+    python -m benchmarks.bench_vector_ann --size 200000 --dim 768 --nprobe 4,8,16,32,64 --k 10
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from src.retrieval.ann import IVFIndex, VectorEntry
+
+
+def make_vectors(rng: np.random.Generator, size: int, centers: np.ndarray, spread: float, batch_size: int = 10_000):
+    """Yield vectors around topic centers in batches (closer to real embeddings than uniform noise)."""
+    dim = centers.shape[1]
+    for start in range(0, size, batch_size):
+        count = min(batch_size, size - start)
+        labels = rng.integers(len(centers), size=count)
+        yield start, centers[labels] + spread * rng.normal(size=(count, dim)).astype(np.float32)
+
+
+def time_queries(search, queries: np.ndarray) -> Tuple[np.ndarray, List[List[int]]]:
+    timings, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query))
+        timings.append(time.perf_counter() - started)
+    return np.array(timings) * 1000, results
+
+
+def recall(actual: List[List[int]], expected: List[List[int]]) -> float:
+    return float(np.mean([len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(actual, expected)]))
+
+
+def bench_qdrant_memory(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    from qdrant_client import AsyncQdrantClient
+    from qdrant_client.http import models
+
+    async def run():
+        client = AsyncQdrantClient(location=":memory:")
+        await client.create_collection("bench", vectors_config=models.VectorParams(size=vectors.shape[1], distance=models.Distance.COSINE))
+        for start in range(0, len(vectors), 1000):
+            await client.upsert("bench", points=models.Batch(
+                ids=list(range(start, min(start + 1000, len(vectors)))), vectors=vectors[start:start + 1000].tolist()
+            ))
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            await client.query_points("bench", query=query.tolist(), limit=k)
+            timings.append(time.perf_counter() - started)
+        return np.array(timings) * 1000
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=1000, help="Topics in the synthetic corpus")
+    parser.add_argument("--spread", type=float, default=1.5, help="Noise around topic centers; higher overlaps topics more")
+    parser.add_argument("--nprobe", default="4,8,16,32,64")
+    parser.add_argument("--nlist", type=int, default=0, help="0 = about sqrt(size)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--qdrant-memory", action="store_true", help="Also time the in-memory Qdrant client (slow to load)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.clusters, args.dim)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as path:
+        # Train explicitly once everything is in, so the timing covers one training
+        index = IVFIndex(path, dim=args.dim, nlist=args.nlist, exact_threshold=args.size + 1)
+        started = time.perf_counter()
+        kept = []
+        for start, batch in make_vectors(rng, args.size, centers, args.spread):
+            index.add([VectorEntry(key=str(start + i), vector=vector, payload="") for i, vector in enumerate(batch)])
+            if args.qdrant_memory:
+                kept.append(batch)
+        insert_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        index.train()
+        train_seconds = time.perf_counter() - started
+        print(f"{args.size} x {args.dim}: insert {insert_seconds:.1f}s, train {train_seconds:.1f}s ({len(index._centroids)} lists)")
+
+        queries = np.concatenate([batch for _, batch in make_vectors(rng, args.queries, centers, args.spread)])
+        exact_ms, expected = time_queries(lambda q: [d for d, _ in index.search(q, args.k, exact=True)], queries)
+
+        print(f"{'search':>14} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+        print(f"{'exact':>14} {1.0:>10.3f} {np.median(exact_ms):>8.2f} {np.percentile(exact_ms, 95):>8.2f} {1.0:>7.1f}x")
+        for nprobe in (int(x) for x in args.nprobe.split(",")):
+            ms, actual = time_queries(lambda q: [d for d, _ in index.search(q, args.k, nprobe=nprobe)], queries)
+            print(
+                f"{'ivf nprobe=' + str(nprobe):>14} {recall(actual, expected):>10.3f} "
+                f"{np.median(ms):>8.2f} {np.percentile(ms, 95):>8.2f} {exact_ms.mean() / ms.mean():>7.1f}x"
+            )
+
+        if args.qdrant_memory:
+            ms = bench_qdrant_memory(np.concatenate(kept), queries, args.k)
+            print(f"{'qdrant :memory:':>14} {1.0:>10.3f} {np.median(ms):>8.2f} {np.percentile(ms, 95):>8.2f} {exact_ms.mean() / ms.mean():>7.1f}x")
+        index.conn.close()
+
+
+if __name__ == "__main__":
+    main()
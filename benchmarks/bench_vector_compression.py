@@ -0,0 +1,129 @@
+"""
+Vector Compression Benchmark
+
+Recall@k against exact full-precision search versus in-RAM bytes per vector
+for the VectorStore storage options:
+  - Matryoshka truncation to the leading --dims dimensions
+    (VECTOR_COMPACT_DIMENSIONS / EMBEDDING_DIMENSIONS),
+  - scalar int8 or binary quantization (VECTOR_QUANTIZATION),
+  - with and without rescoring an oversampled candidate set with the full
+    float32 vectors (VECTOR_OVERSAMPLING).
+
+Quantization is simulated in numpy the way Qdrant does it (int8 with 0.99
+quantile ranges, sign bits for binary), so no Qdrant server is needed.
+
+Real embeddings give the meaningful numbers: --from-cache reads vectors from
+the embedding cache (EMBEDDING_CACHE_PATH) that ingestion filled. Without it,
+synthetic vectors with Matryoshka-like decaying per-dimension variance are used.
+
+Usage:
+    python -m benchmarks.bench_vector_compression --from-cache --dims 3072,1024,512,256 --oversampling 4
+"""
+
+import argparse
+import sqlite3
+
+import numpy as np
+
+from src.config import settings
+
+
+def load_cache(path: str, limit: int) -> np.ndarray:
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT vector FROM embeddings LIMIT ?", (limit,)).fetchall()
+    vectors = [np.frombuffer(blob, dtype=np.float32) for (blob,) in rows]
+    dim = max((len(v) for v in vectors), default=0)
+    return np.stack([v for v in vectors if len(v) == dim]) if vectors else np.empty((0, 0), dtype=np.float32)
+
+
+def make_synthetic(rng: np.random.Generator, size: int, dim: int, topics: int = 500) -> np.ndarray:
+    # Topic structure, with variance concentrated in the leading dims like Matryoshka-trained models
+    scale = (1.0 / np.sqrt(np.arange(1, dim + 1))).astype(np.float32)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(topics, size=size)] + 1.2 * rng.normal(size=(size, dim)).astype(np.float32)
+    return vectors * scale
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def quantized_scores(corpus: np.ndarray, queries: np.ndarray, quantization: str) -> np.ndarray:
+    if quantization == "none":
+        return queries @ corpus.T
+    if quantization == "scalar":
+        lo, hi = np.quantile(corpus, 0.005), np.quantile(corpus, 0.995)
+        step = (hi - lo) / 255
+        codes = np.clip(np.round((corpus - lo) / step), 0, 255).astype(np.uint8)
+        return queries @ (lo + codes.astype(np.float32) * step).T
+    if quantization == "binary":
+        return np.sign(queries) @ np.sign(corpus).T
+    raise ValueError(quantization)
+
+
+def bytes_per_vector(dim: int, quantization: str) -> float:
+    return {"none": 4 * dim, "scalar": dim, "binary": dim / 8}[quantization]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall(actual: np.ndarray, expected: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(actual, expected)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-cache", action="store_true", help="Use real embeddings from the embedding cache")
+    parser.add_argument("--size", type=int, default=50_000, help="Corpus size (synthetic, or max read from the cache)")
+    parser.add_argument("--dim", type=int, default=3072, help="Synthetic vector size")
+    parser.add_argument("--dims", default="3072,1024,512,256")
+    parser.add_argument("--quantization", default="none,scalar,binary")
+    parser.add_argument("--oversampling", type=float, default=4.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.from_cache:
+        vectors = load_cache(settings.EMBEDDING_CACHE_PATH, args.size + args.queries)
+        if len(vectors) <= args.queries:
+            raise SystemExit(f"Only {len(vectors)} vectors in {settings.EMBEDDING_CACHE_PATH}; ingest more or drop --from-cache")
+    else:
+        vectors = make_synthetic(rng, args.size + args.queries, args.dim)
+    # Held-out vectors as queries (document-to-document similarity)
+    order = rng.permutation(len(vectors))
+    queries, corpus = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    full_dim = corpus.shape[1]
+
+    full_corpus, full_queries = normalize(corpus), normalize(queries)
+    full_scores = full_queries @ full_corpus.T
+    expected = top_k(full_scores, args.k)
+    candidates = int(args.k * args.oversampling)
+
+    print(f"{len(corpus)} x {full_dim} vectors, {len(queries)} queries, recall@{args.k}, rescoring top {candidates}")
+    print(f"{'dims':>6} {'quant':>7} {'RAM B/vec':>10} {'vs fp32':>8} {'recall':>7} {'rescored':>9}")
+    for dim in (int(d) for d in args.dims.split(",")):
+        if dim > full_dim:
+            continue
+        compact_corpus, compact_queries = normalize(corpus[:, :dim]), normalize(queries[:, :dim])
+        for quantization in args.quantization.split(","):
+            scores = quantized_scores(compact_corpus, compact_queries, quantization)
+            plain = recall(top_k(scores, args.k), expected)
+
+            # Rescore the oversampled candidates with the full float32 vectors
+            shortlist = top_k(scores, candidates)
+            rescored = np.take_along_axis(full_scores, shortlist, axis=1)
+            reranked = np.take_along_axis(shortlist, np.argsort(-rescored, axis=1)[:, :args.k], axis=1)
+            with_rescore = recall(reranked, expected)
+
+            size = bytes_per_vector(dim, quantization)
+            print(f"{dim:>6} {quantization:>7} {size:>10.0f} {size / (4 * full_dim):>7.1%} {plain:>7.3f} {with_rescore:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,39 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from typing import Dict
+from fastapi import APIRouter, Request, Response
+from pydantic import BaseModel, Field
 
 router = APIRouter(tags=["Health"])
 
 class HealthResponse(BaseModel):
     status: str
+    version: str
+    ready: bool
+    components: Dict[str, str] = Field(default_factory=dict)  # e.g. {"orchestrator": "ready", "reranker": "loading"}
+
+# Component states that let the API serve queries ("lazy": loads on first use)
+READY_STATES = {"ready", "lazy"}
+
+def is_ready(components: Dict[str, str]) -> bool:
+    return bool(components) and all(state in READY_STATES for state in components.values())
+
+def _components(request: Request) -> Dict[str, str]:
+    return dict(getattr(request.app.state, "components", {}))
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(request: Request):
+    """
+    Liveness: the process is up and serving requests, even while models are still loading.
+    """
+    components = _components(request)
+    return HealthResponse(status="ok", version=request.app.version, ready=is_ready(components), components=components)
+
+@router.get("/health/ready", response_model=HealthResponse)
+async def readiness_check(request: Request, response: Response):
     """
-    Basic health check endpoint to verify API is responsive.
+    Readiness: 503 until the orchestrator is built and the reranker is warmed up.
     """
-    return {"status": "ok"}
+    components = _components(request)
+    ready = is_ready(components)
+    if not ready:
+        response.status_code = 503
+    return HealthResponse(status="ready" if ready else "starting", version=request.app.version, ready=ready, components=components)
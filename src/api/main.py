@@ -1,30 +1,72 @@
+import asyncio
+import os
 from fastapi import FastAPI, Depends, HTTPException, Body
 from contextlib import asynccontextmanager
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List
 from src.config import settings
 from src.auth.middleware import get_current_user
 from src.auth.models import User
-from src.orchestration.rag import RAGOrchestrator
 from src.ingestion.loaders import get_loader_for_file
 from src.ingestion.chunking import RecursiveTokenChunker
-from src.ingestion.embeddings import EmbeddingGenerator
-from src.retrieval.vector import VectorStore
+from src.ingestion.embedding_cache import get_embedding_cache
+from src.ingestion.query_embeddings import get_query_embedding_cache
+from src.ingestion.parallel import get_loader_pool, shutdown_loader_pool
+from src.ingestion.pipeline import IngestPipeline
+from src.ingestion.jobs import IngestJob, JobManager, JobStore
+from src.api import health
+from src.types import Document
 # from src.retrieval.keyword import KeywordSearch # Re-initialize/Load index in prod
+# The orchestrator (OpenAI/Qdrant clients, reranker) is imported in start_orchestrator,
+# so importing this module and binding the port stay fast
 
-# Global Orchestrator instance
+# Global Orchestrator instance (None until start_orchestrator has built it)
 orchestrator = None
+# Background ingestion jobs
+job_manager = None
+
+async def start_orchestrator(app: FastAPI):
+    """Build the orchestrator and warm up models while the server already accepts traffic."""
+    global orchestrator
+    components = app.state.components
+    try:
+        components["orchestrator"] = "loading"
+        from src.orchestration.rag import RAGOrchestrator
+        orchestrator = await asyncio.to_thread(RAGOrchestrator)
+        app.state.orchestrator = orchestrator
+        components["orchestrator"] = "ready"
+        print("Orchestrator initialized.")
+
+        if settings.RERANK_WARMUP:
+            components["reranker"] = "loading"
+            await asyncio.to_thread(orchestrator.retriever.reranker.warmup)
+            components["reranker"] = "ready"
+            print("Reranker warmed up.")
+        else:
+            components["reranker"] = "lazy"
+    except Exception as e:
+        failed = next((name for name, state in components.items() if state == "loading"), "orchestrator")
+        components[failed] = f"failed: {e}"
+        print(f"Startup of {failed} failed: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print(f"Starting Enterprise RAG Platform...")
-    global orchestrator
-    orchestrator = RAGOrchestrator()
-    app.state.orchestrator = orchestrator
-    print("Orchestrator initialized.")
+    global job_manager
+    app.state.components = {"orchestrator": "pending", "reranker": "pending"}
+    startup = asyncio.create_task(start_orchestrator(app))
+    job_manager = JobManager(JobStore(settings.INGEST_JOB_DB))
+    job_manager.register("file", run_file_ingest)
+    job_manager.register("github", run_github_ingest)
     yield
     # Shutdown
     print("Shutting down...")
+    startup.cancel()
+    await job_manager.shutdown()
+    if orchestrator:
+        await orchestrator.retriever.flush()
+        orchestrator.retriever.close()
+    shutdown_loader_pool()
 
 app = FastAPI(
     title="Enterprise RAG Platform",
@@ -47,9 +89,17 @@ async def debug_exception_handler(request, exc):
 async def root():
     return {"message": "Welcome to the Enterprise RAG Platform API. Visit /docs for documentation."}
 
-@app.get("/health")
-async def health_check():
-    return {"status": "ok", "version": "0.1.0"}
+# Liveness (/health) and readiness (/health/ready)
+app.include_router(health.router)
+
+@app.get("/metrics")
+async def metrics():
+    embedding_cache = get_embedding_cache()
+    return {
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "semantic_cache": orchestrator.cache.stats() if orchestrator else None,
+    }
 
 # Include OpenAI Router
 from src.api.openai import router as openai_router
@@ -63,69 +113,165 @@ async def query_endpoint(
     if not orchestrator:
         raise HTTPException(status_code=503, detail="System not initialized")
     
-    return await orchestrator.query(query, user)
+    result = await orchestrator.query(query, user)
+    # Build pydantic models only here, where the response is serialized
+    return {**result, "retrieved_docs": [r.to_model() for r in result["retrieved_docs"]]}
+
+def _with_metadata(docs: Iterable[Document], **metadata: Any) -> Iterator[Document]:
+    # Tag documents as they stream through, without materializing the corpus
+    for doc in docs:
+        doc.metadata.update(metadata)
+        yield doc
+
+def _load_files(file_paths: List[str]) -> Iterator[Document]:
+    for file_path in file_paths:
+        # Load lazily (large PDFs are split across the loader pool)
+        loader = get_loader_for_file(file_path, executor=get_loader_pool())
+        # Add access group to metadata for demo
+        access_group = "management" if "strategy" in file_path.lower() else "engineering"
+        yield from _with_metadata(loader.lazy_load(file_path), access_group=access_group)
+
+async def run_file_ingest(job: IngestJob) -> Dict[str, Any]:
+    file_path = job.params["file_path"]
+    retriever = orchestrator.retriever
+
+    # Other local files that were only indexed as duplicates of this file's chunks
+    # lose those aliases when the chunks are rewritten, so they are loaded again too
+    orphaned = await retriever.duplicate_sources([file_path])
+    file_paths = [file_path] + [source for source in orphaned if os.path.isfile(source)]
+    job.progress.files_total = len(file_paths)
+
+    # Stream through Chunk -> Embed -> Index
+    docs = _load_files(file_paths)
+    pipeline = IngestPipeline(retriever, RecursiveTokenChunker(), stats=job.progress, collect_ids=True)
+    stats = await pipeline.run(docs)
 
-# Quick ingest endpoint for demo purposes (usually would be async worker)
-@app.post("/ingest/demo")
+    # Re-ingesting overwrites the file's chunks in place. Only now that it succeeded, drop
+    # those it didn't rewrite (past the new end of a shrunk file, or PDF pages that are
+    # gone), so a failed or cancelled job leaves the previous version searchable
+    await retriever.remove_sources([file_path], keep=pipeline.indexed_ids)
+
+    return {"chunks_ingested": stats.indexed}
+
+async def run_github_ingest(job: IngestJob) -> Dict[str, Any]:
+    from src.ingestion.github import GitHubIngestor
+
+    # Load only what changed since the last sync
+    ingestor = GitHubIngestor(job.params["repo_url"])
+    # The sync state is kept apart from the indexes; if they no longer hold the
+    # repo (wiped, re-created or ephemeral), it can't be trusted
+    if not await orchestrator.retriever.has_sources(ingestor.synced_sources()):
+        ingestor.reset_state()
+    sync = await asyncio.to_thread(ingestor.sync)
+    job.progress.files_total = len(sync.files_to_load)
+
+    if not sync.has_changes:
+        if sync.previous_commit is None:
+            return {"message": "No documents found in repo"}
+        return {"message": "Already up to date", "commit": sync.commit}
+
+    # Remove chunks of modified/deleted files before re-indexing them
+    if sync.stale_sources:
+        orphaned = await orchestrator.retriever.remove_sources(sync.stale_sources)
+        # Unchanged files that were only indexed as duplicates of removed chunks
+        for rel_path in ingestor.paths_for_sources(orphaned):
+            if rel_path not in sync.files_to_load:
+                sync.files_to_load.append(rel_path)
+        job.progress.files_total = len(sync.files_to_load)
+
+    # Stream changed files through Chunk -> Embed -> Index
+    docs = _with_metadata(ingestor.iter_documents(sync), access_group="public") # GitHub is public usually
+    stats = await IngestPipeline(orchestrator.retriever, RecursiveTokenChunker(), stats=job.progress).run(docs)
+
+    ingestor.save_state(sync)
+
+    return {
+        "commit": sync.commit,
+        "files_added": len(sync.added),
+        "files_modified": len(sync.modified),
+        "files_deleted": len(sync.deleted),
+        "files_processed": len(sync.files_to_load),
+        "chunks_ingested": stats.indexed
+    }
+
+def _require_admin(user: User):
+    if "admin" not in user.groups:
+        raise HTTPException(status_code=403, detail="Only admins can ingest")
+
+def _require_jobs():
+    if not job_manager or not orchestrator:
+        raise HTTPException(status_code=503, detail="System not initialized")
+
+# Ingestion runs as a background job; poll /ingest/jobs/{job_id} for progress
+@app.post("/ingest/demo", status_code=202)
 async def ingest_demo_file(
     file_path: str = Body(..., embed=True),
     user: User = Depends(get_current_user)
 ):
-    if "admin" not in user.groups:
-        raise HTTPException(status_code=403, detail="Only admins can ingest")
-        
+    _require_admin(user)
+    _require_jobs()
+
+    # Fail fast on unsupported files instead of queueing a job that can't run
     try:
-        # Load
-        loader = get_loader_for_file(file_path)
-        docs = loader.load(file_path)
-        
-        # Chunk
-        chunker = RecursiveTokenChunker()
-        all_chunks = []
-        for doc in docs:
-            # Add access group to metadata for demo
-            doc.metadata["access_group"] = "management" if "strategy" in file_path.lower() else "engineering"
-            chunks = chunker.chunk(doc)
-            all_chunks.extend(chunks)
-            
-        # Ingest (Embed + Index)
-        await orchestrator.retriever.ingest(all_chunks)
-        
-        return {"status": "success", "chunks_ingested": len(all_chunks)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        get_loader_for_file(file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = job_manager.submit("file", {"file_path": file_path}, submitted_by=user.username)
+    return {"status": job.status, "job_id": job.id}
 
-@app.post("/ingest/github")
+@app.post("/ingest/github", status_code=202)
 async def ingest_github(
     repo_url: str = Body(..., embed=True),
     user: User = Depends(get_current_user)
 ):
-    if "admin" not in user.groups:
-        raise HTTPException(status_code=403, detail="Only admins can ingest")
-        
-    try:
-        from src.ingestion.github import GitHubIngestor
-        from src.ingestion.chunking import RecursiveTokenChunker
-        
-        # Load
-        ingestor = GitHubIngestor(repo_url)
-        docs = ingestor.ingest()
-        
-        if not docs:
-            return {"status": "warning", "message": "No documents found in repo"}
-
-        # Chunk
-        chunker = RecursiveTokenChunker()
-        all_chunks = []
-        for doc in docs:
-            doc.metadata["access_group"] = "public" # GitHub is public usually
-            chunks = chunker.chunk(doc)
-            all_chunks.extend(chunks)
-            
-        # Ingest
-        if all_chunks:
-            await orchestrator.retriever.ingest(all_chunks)
-        
-        return {"status": "success", "files_processed": len(docs), "chunks_ingested": len(all_chunks)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    _require_admin(user)
+    _require_jobs()
+
+    job = job_manager.submit("github", {"repo_url": repo_url}, submitted_by=user.username)
+    return {"status": job.status, "job_id": job.id}
+
+@app.get("/ingest/jobs")
+async def list_ingest_jobs(limit: int = 50, user: User = Depends(get_current_user)):
+    _require_admin(user)
+    _require_jobs()
+    return [job.to_response() for job in job_manager.list(limit)]
+
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str, user: User = Depends(get_current_user)):
+    _require_admin(user)
+    _require_jobs()
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_response()
+
+@app.delete("/ingest/jobs/{job_id}")
+async def cancel_ingest_job(job_id: str, user: User = Depends(get_current_user)):
+    _require_admin(user)
+    _require_jobs()
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status.is_final:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status.value}")
+    # Jobs are shared through the job store, but each one runs as a task of the worker
+    # process that accepted it, and only that process can cancel it
+    if not job_manager.cancel(job_id):
+        raise HTTPException(
+            status_code=409,
+            detail="Job runs in another worker process; it can only be cancelled by the worker running it (retry, or run a single worker)"
+        )
+    return {"status": "cancelling", "job_id": job_id}
+
+@app.delete("/documents")
+async def delete_documents(
+    document_ids: List[str] = Body(..., embed=True),
+    user: User = Depends(get_current_user)
+):
+    _require_admin(user)
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="System not initialized")
+
+    removed = await orchestrator.retriever.remove_documents(document_ids)
+    return {"document_ids": document_ids, "chunks_removed": removed}
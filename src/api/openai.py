@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Union
+from typing import AsyncIterator, List, Optional, Dict, Any, Union
+import json
 import time
+import uuid
 from src.auth.middleware import get_current_user
 from src.auth.models import User
 # from src.api.main import orchestrator # Removed to avoid circular import
@@ -18,6 +21,7 @@ class ChatCompletionRequest(BaseModel):
     messages: List[ChatMessage]
     temperature: Optional[float] = 0.7
     stream: Optional[bool] = False
+    stream_options: Optional[Dict[str, Any]] = None  # {"include_usage": true} adds a final usage chunk
 
 class ChatChoice(BaseModel):
     index: int
@@ -32,6 +36,23 @@ class ChatCompletionResponse(BaseModel):
     choices: List[ChatChoice]
     usage: Dict[str, int]
 
+class ChatDelta(BaseModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+class ChatChunkChoice(BaseModel):
+    index: int
+    delta: ChatDelta
+    finish_reason: Optional[str] = None
+
+class ChatCompletionChunk(BaseModel):
+    id: str
+    object: str = "chat.completion.chunk"
+    created: int
+    model: str
+    choices: List[ChatChunkChoice]
+    usage: Optional[Dict[str, int]] = None
+
 class ModelCard(BaseModel):
     id: str
     object: str = "model"
@@ -75,8 +96,16 @@ async def chat_completions(
     
     query_text = last_message.content
 
+    if chat_request.stream:
+        # Cache lookup and retrieval happen here, so their errors still get a proper status code
+        result = await orchestrator.query_stream(query_text, user)
+        return StreamingResponse(
+            _sse_events(chat_request, result),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     # Call RAG Orchestrator
-    # We ignore streaming for now (Open Web UI handles non-streaming fine usually, though streaming is better UX)
     result = await orchestrator.query(query_text, user)
     answer = result["answer"]
 
@@ -98,3 +127,40 @@ async def chat_completions(
             "total_tokens": 0
         }
     )
+
+
+def _sse(chunk: ChatCompletionChunk) -> str:
+    return f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
+
+async def _sse_events(chat_request: ChatCompletionRequest, result: Dict[str, Any]) -> AsyncIterator[str]:
+    """OpenAI-style chat.completion.chunk events for a streamed answer, ending with [DONE]."""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    def chunk(delta: ChatDelta, finish_reason: Optional[str] = None) -> str:
+        return _sse(ChatCompletionChunk(
+            id=completion_id,
+            created=created,
+            model=chat_request.model,
+            choices=[ChatChunkChoice(index=0, delta=delta, finish_reason=finish_reason)]
+        ))
+
+    yield chunk(ChatDelta(role="assistant", content=""))
+    try:
+        async for delta in result["answer"]:
+            yield chunk(ChatDelta(content=delta))
+    except Exception as e:
+        # Headers are already sent; report in-band like OpenAI does
+        print(f"Streaming Error: {e}")
+        yield f"data: {json.dumps({'error': {'message': str(e), 'type': 'server_error'}})}\n\n"
+        return
+    yield chunk(ChatDelta(), finish_reason="stop")
+
+    if (chat_request.stream_options or {}).get("include_usage"):
+        completion = result["completion"]
+        # Cache hits cost no tokens
+        usage = completion.usage if completion is not None and completion.usage else {
+            "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0
+        }
+        yield _sse(ChatCompletionChunk(id=completion_id, created=created, model=chat_request.model, choices=[], usage=usage))
+    yield "data: [DONE]\n\n"
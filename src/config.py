@@ -17,12 +17,86 @@ class Settings(BaseSettings):
     AZURE_OPENAI_EMBEDDINGS_ENDPOINT: str = Field(..., description="Endpoint for Embeddings")
     AZURE_OPENAI_EMBEDDINGS_API_VERSION: str = Field(default="2024-02-01")
     AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT: str = Field(default="text-embedding-3-large")
+    EMBEDDING_DIMENSIONS: Optional[int] = Field(default=None, description="Ask the model for shortened (Matryoshka) embeddings of this size. If None, the model's native size (3072) is used")
+
+    # Embedding Batching
+    EMBEDDING_BATCH_MAX_TOKENS: int = Field(default=100_000, description="Max total tokens sent in one embeddings request")
+    EMBEDDING_BATCH_MAX_ITEMS: int = Field(default=512, description="Max number of inputs sent in one embeddings request")
+    EMBEDDING_MAX_INPUT_TOKENS: int = Field(default=8191, description="Per-input token limit of the embedding model; longer inputs are truncated")
+    EMBEDDING_MAX_CONCURRENCY: int = Field(default=4, description="Max embeddings requests in flight per ingest")
+
+    # Embedding Cache
+    EMBEDDING_CACHE_PATH: Optional[str] = Field(default=".cache/embeddings.sqlite", description="SQLite file for the persistent embedding cache. If empty, caching is disabled")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = Field(default=100_000, description="Max cached embeddings before least recently used entries are evicted")
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = Field(default=10_000, description="Max query embeddings kept in process memory (0 disables the in-memory query cache)")
+    QUERY_EMBEDDING_CACHE_TTL: float = Field(default=3600.0, description="Seconds a query embedding stays in the in-memory query cache")
 
     # Project Defaults
     DEFAULT_CHAT_MODEL: str = Field(default="gpt-4o-mini")
     FALLBACK_CHAT_MODEL: str = Field(default="gpt-4o")
 
+    # Document Loading
+    INGEST_LOADER_WORKERS: Optional[int] = Field(default=None, description="Processes used for document loading. If None, uses the CPU count")
+    PDF_PAGES_PER_TASK: int = Field(default=16, description="PDF pages extracted per worker task; smaller PDFs load in-process")
+
+    # Ingest Pipeline
+    INGEST_BATCH_SIZE: int = Field(default=128, description="Chunks per batch handed from chunking to embedding/indexing")
+    INGEST_QUEUE_SIZE: int = Field(default=4, description="Max batches buffered between pipeline stages (bounds peak memory)")
+    INGEST_EMBED_WORKERS: int = Field(default=2, description="Embedding batches processed concurrently by the ingest pipeline")
+    INGEST_DEDUP_ENABLED: bool = Field(default=True, description="Drop exact and near-duplicate chunks before embedding")
+    INGEST_DEDUP_THRESHOLD: float = Field(default=0.9, description="Estimated Jaccard similarity above which chunks count as near duplicates")
+
+    # Ingest Jobs
+    INGEST_JOB_DB: str = Field(default=".cache/jobs.sqlite", description="SQLite file persisting ingestion job status")
+    INGEST_MAX_CONCURRENT_JOBS: int = Field(default=1, description="Ingestion jobs running at once; the rest wait in the queue")
+
+    # GitHub Ingestion
+    GITHUB_CACHE_DIR: str = Field(default=".cache/github", description="Persistent checkouts and per-repo sync state for incremental GitHub ingestion")
+
+    # Keyword Index
+    KEYWORD_INDEX_PATH: Optional[str] = Field(default=None, description="Directory of the persistent keyword inverted index (e.g. .cache/keyword_index); only one process may open it at a time. If None, each process keeps its own index in a temporary directory that is removed on shutdown")
+    KEYWORD_INDEX_FLUSH_POSTINGS: int = Field(default=2_000_000, description="Buffered postings that trigger writing a new on-disk segment")
+    KEYWORD_INDEX_MAX_SEGMENTS: int = Field(default=8, description="On-disk segments kept before they are merged into one")
+
+    # Retrieval
+    RETRIEVAL_VECTOR_TIMEOUT: float = Field(default=2.0, description="Seconds allowed for query embedding + vector search per query")
+    RETRIEVAL_KEYWORD_TIMEOUT: float = Field(default=0.5, description="Seconds allowed for keyword search per query")
+    RETRIEVAL_ALLOW_PARTIAL: bool = Field(default=True, description="Return the other branch's results when one times out or fails, instead of failing the query")
+
+    # Semantic Cache
+    EXACT_CACHE_MAX_ENTRIES: int = Field(default=10_000, description="Answers kept per process for exact repeats of a question (same normalized text and access groups), served without embedding the query. 0 disables the tier")
+    SEMANTIC_CACHE_BACKEND: str = Field(default="shared", description="'shared' (one cache for all workers on the host, kept across restarts) or 'memory' (per process)")
+    SEMANTIC_CACHE_PATH: str = Field(default=".cache/semantic_cache", description="Directory of the shared semantic cache")
+    SEMANTIC_CACHE_THRESHOLD: float = Field(default=0.9, description="Min cosine similarity between query embeddings to serve a cached answer")
+    SEMANTIC_CACHE_MAX_ENTRIES: int = Field(default=50_000, description="Max cached answers across all ACL partitions (0 disables the cache)")
+    SEMANTIC_CACHE_TTL: float = Field(default=86_400.0, description="Seconds a cached answer may be served")
+    SEMANTIC_CACHE_EVICTION: str = Field(default="lru", description="Which entries make room when the cache is full: 'lru' (least recently used) or 'lfu' (least frequently used)")
+    SEMANTIC_CACHE_DIMENSIONS: Optional[int] = Field(default=512, description="Leading (Matryoshka) embedding dims kept per cached query. If None, the full embedding")
+    SEMANTIC_CACHE_EXACT_THRESHOLD: int = Field(default=10_000, description="Entries in one ACL partition above which lookups only scan the nearest clusters")
+    SEMANTIC_CACHE_NPROBE: int = Field(default=8, description="Clusters scanned per lookup in large partitions")
+
+    # Reranking
+    RERANK_MAX_BATCH_SIZE: int = Field(default=64, description="Max (query, passage) pairs scored in one cross-encoder call across concurrent requests")
+    RERANK_MAX_WAIT_MS: float = Field(default=5.0, description="How long the first queued rerank request waits for others to join its batch")
+    RERANK_WARMUP: bool = Field(default=True, description="Load and warm up the reranker in the background at startup; if False it loads on the first query")
+    RERANK_BACKEND: str = Field(default="torch", description="Cross-encoder runtime: 'torch' (sentence-transformers) or 'onnx' (ONNX Runtime, CPU)")
+    RERANK_ONNX_DIR: str = Field(default=".cache/reranker-onnx", description="Where the exported ONNX reranker (and its int8 variant) is stored")
+    RERANK_ONNX_QUANTIZE: bool = Field(default=True, description="Use the dynamically int8-quantized ONNX model")
+    RERANK_INTRA_OP_THREADS: int = Field(default=0, description="ONNX Runtime intra-op threads per reranker (0 = runtime default)")
+
     # Vector Store
+    VECTOR_BACKEND: str = Field(default="qdrant", description="'qdrant' (QDRANT_URL, or in-memory Qdrant if unset) or 'local' (persistent in-process IVF index, single process only)")
+    LOCAL_VECTOR_PATH: str = Field(default=".cache/vector_index", description="Directory of the local vector index; only one process may open it at a time")
+    LOCAL_VECTOR_NLIST: int = Field(default=0, description="IVF lists of the local index (0 = about sqrt(number of vectors))")
+    LOCAL_VECTOR_NPROBE: int = Field(default=16, description="IVF lists scanned per query; higher is slower with better recall")
+    LOCAL_VECTOR_EXACT_THRESHOLD: int = Field(default=20_000, description="Below this many vectors the local index does an exact scan instead of IVF")
+    VECTOR_COMPACT_DIMENSIONS: Optional[int] = Field(default=None, description="Search the leading (Matryoshka) slice of this many dims first, then rescore with the full vectors (e.g. 512). Changes the collection layout, so existing collections must be re-created. If None, search full vectors only")
+    VECTOR_QUANTIZATION: str = Field(default="scalar", description="Quantization of the in-RAM search vectors in Qdrant: 'none', 'scalar' (int8) or 'binary'")
+    VECTOR_OVERSAMPLING: float = Field(default=4.0, description="Candidates fetched per result from the compact/quantized vectors before full-precision rescoring")
+    VECTOR_UPSERT_BATCH_SIZE: int = Field(default=256, description="Points per Qdrant upsert request")
+    VECTOR_UPSERT_CONCURRENCY: int = Field(default=4, description="Qdrant upsert requests in flight per ingest batch")
+    VECTOR_PROJECTED_SEARCH: bool = Field(default=True, description="Search Qdrant without chunk content and fetch it in bulk only for the candidates that survive filtering")
+    CHUNK_STORE_PATH: Optional[str] = Field(default=None, description="SQLite file for compressed chunk texts (e.g. .cache/chunks.db). If set, content is kept there instead of in the Qdrant payload")
     QDRANT_URL: Optional[str] = Field(default=None, description="URL for Qdrant (e.g. http://localhost:6333). If None, uses :memory:")
     QDRANT_COLLECTION: str = Field(default="enterprise-rag", description="Name of the Qdrant collection")
 
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterable, Iterator, List
+import numpy as np
 import tiktoken
 from src.types import Document, Chunk
 
@@ -8,6 +9,15 @@ class BaseChunker(ABC):
     def chunk(self, document: Document) -> List[Chunk]:
         pass
 
+    def chunk_many(self, documents: List[Document]) -> List[List[Chunk]]:
+        # Chunkers that can amortize work across documents override this
+        return [self.chunk(document) for document in documents]
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Chunk]:
+        # Lazily chunk a document stream without materializing it
+        for document in documents:
+            yield from self.chunk(document)
+
 class FixedSizeChunker(BaseChunker):
     def __init__(self, chunk_size: int = 1000, overlap: int = 200):
         self.chunk_size = chunk_size
@@ -34,28 +44,79 @@ class FixedSizeChunker(BaseChunker):
         return chunks
 
 class RecursiveTokenChunker(BaseChunker):
-    def __init__(self, chunk_size: int = 500, overlap: int = 50, model_name: str = "gpt-4"):
+    def __init__(self, chunk_size: int = 500, overlap: int = 50, model_name: str = "gpt-4", num_threads: int = 8, batch_docs: int = 64):
         self.chunk_size = chunk_size
         self.overlap = overlap
         self.encoder = tiktoken.encoding_for_model(model_name)
+        self.num_threads = num_threads
+        self.batch_docs = batch_docs
 
     def chunk(self, document: Document) -> List[Chunk]:
-        tokens = self.encoder.encode(document.content)
-        chunks = []
-        start = 0
-        
-        while start < len(tokens):
-            end = start + self.chunk_size
-            chunk_tokens = tokens[start:end]
-            chunk_text = self.encoder.decode(chunk_tokens)
-            
-            chunks.append(Chunk(
+        tokens = self.encoder.encode_ordinary(document.content)
+        return self._split(document, tokens)
+
+    def chunk_many(self, documents: List[Document]) -> List[List[Chunk]]:
+        # tiktoken encodes the batch in parallel native threads
+        token_lists = self.encoder.encode_ordinary_batch(
+            [document.content for document in documents], num_threads=self.num_threads
+        )
+        return [self._split(document, tokens) for document, tokens in zip(documents, token_lists)]
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Chunk]:
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= self.batch_docs:
+                for chunks in self.chunk_many(batch):
+                    yield from chunks
+                batch = []
+        if batch:
+            for chunks in self.chunk_many(batch):
+                yield from chunks
+
+    def _char_offsets(self, text: str, tokens: List[int], bounds: List[int]) -> List[int]:
+        """Character offsets of the given (sorted) token positions within text."""
+        # Decode each token exactly once, one span between consecutive bounds at a time
+        byte_offsets = [0]
+        for start, end in zip(bounds, bounds[1:]):
+            byte_offsets.append(byte_offsets[-1] + len(self.encoder.decode_bytes(tokens[start:end])))
+
+        raw = text.encode("utf-8")
+        if len(raw) == len(text):
+            return byte_offsets  # ASCII: byte offsets are character offsets
+
+        # Map each byte to the character containing it (continuation bytes are 10xxxxxx)
+        is_char_start = (np.frombuffer(raw, dtype=np.uint8) & 0xC0) != 0x80
+        char_of_byte = np.empty(len(raw) + 1, dtype=np.int64)
+        np.cumsum(is_char_start, out=char_of_byte[:-1])
+        char_of_byte[:-1] -= 1
+        char_of_byte[-1] = len(text)
+        return char_of_byte[byte_offsets].tolist()
+
+    def _split(self, document: Document, tokens: List[int]) -> List[Chunk]:
+        """Slice overlapping token windows out of the original text by character offset,
+        instead of decoding every window (and every overlap twice)."""
+        if not tokens:
+            return []
+
+        step = self.chunk_size - self.overlap
+        windows = []
+        for start in range(0, len(tokens), step):
+            end = min(start + self.chunk_size, len(tokens))
+            windows.append((start, end))
+            if end == len(tokens):
+                break  # The next window would only repeat this one's overlap
+
+        bounds = sorted({position for window in windows for position in window})
+        offsets = dict(zip(bounds, self._char_offsets(document.content, tokens, bounds)))
+
+        return [
+            Chunk(
                 document_id=document.id,
-                content=chunk_text,
-                chunk_index=len(chunks),
-                metadata=document.metadata
-            ))
-            
-            start += self.chunk_size - self.overlap
-            
-        return chunks
+                content=document.content[offsets[start]:offsets[end]],
+                chunk_index=i,
+                metadata=document.metadata,
+                token_count=end - start
+            )
+            for i, (start, end) in enumerate(windows)
+        ]
@@ -0,0 +1,137 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.types import Chunk
+
+_TOKEN_RE = re.compile(r"\w+")
+_PRIME = np.uint64(4294967291)  # Largest prime below 2**32, keeps signatures in uint32
+
+
+class ChunkDeduplicator:
+    """
+    Drops exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are found by hashing whitespace-normalized content. Near
+    duplicates use MinHash signatures over word shingles with LSH banding, and
+    candidates are confirmed by their estimated Jaccard similarity. The first
+    copy seen is kept and the dropped copies are recorded on it under
+    ``metadata["duplicates"]``, if it came in the same filter() call. Kept
+    chunks of earlier calls may already be indexed, so their aliases are
+    collected until take_pending_aliases() and written to the stores by the
+    caller (see RetrievalService.add_duplicates).
+
+    Chunks are only compared within the same ``access_group``, so dedup never
+    hides content from a group that could see its own copy. Only hashes,
+    signatures and ids of kept chunks are held, for the lifetime of the
+    instance, i.e. one ingest run.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+        # Per access group: exact hash -> kept id, LSH buckets -> kept ids,
+        # kept id -> (position in arrival order, signature)
+        self._exact: Dict[Optional[str], Dict[bytes, str]] = defaultdict(dict)
+        self._buckets: Dict[Optional[str], List[Dict[bytes, List[str]]]] = defaultdict(
+            lambda: [defaultdict(list) for _ in range(self.bands)]
+        )
+        self._signatures: Dict[Optional[str], Dict[str, Tuple[int, np.ndarray]]] = defaultdict(dict)
+        # Kept id -> aliases found after its filter() call returned
+        self._pending_aliases: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def filter(self, chunks: List[Chunk]) -> List[Chunk]:
+        """Return the chunks that are not duplicates of anything seen so far."""
+        unique: Dict[str, Chunk] = {}
+        for chunk in chunks:
+            group = chunk.metadata.get("access_group")
+            normalized = " ".join(chunk.content.split())
+
+            exact_key = hashlib.sha1(normalized.encode("utf-8")).digest()
+            original_id = self._exact[group].get(exact_key)
+            if original_id is not None:
+                self.exact_duplicates += 1
+                self._add_alias(unique, original_id, chunk)
+                continue
+
+            signature = self._signature(normalized)
+            original_id = self._find_near_duplicate(group, signature)
+            if original_id is not None:
+                self.near_duplicates += 1
+                self._add_alias(unique, original_id, chunk)
+                continue
+
+            chunk_id = str(chunk.id)
+            self._exact[group][exact_key] = chunk_id
+            self._index(group, chunk_id, signature)
+            unique[chunk_id] = chunk
+        return list(unique.values())
+
+    def take_pending_aliases(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Aliases of chunks returned by earlier filter() calls, by kept chunk id; cleared once taken."""
+        pending, self._pending_aliases = dict(self._pending_aliases), defaultdict(list)
+        return pending
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        tokens = _TOKEN_RE.findall(normalized.lower())
+        if len(tokens) <= self.shingle_size:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)}
+
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p for every permutation/shingle pair; a, b, x < 2**32 so this can't overflow
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _find_near_duplicate(self, group: Optional[str], signature: np.ndarray) -> Optional[str]:
+        buckets = self._buckets[group]
+        candidates = set()
+        for band in range(self.bands):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            candidates.update(buckets[band].get(key, ()))
+
+        # The earliest kept chunk wins
+        signatures = self._signatures[group]
+        for candidate in sorted(candidates, key=lambda chunk_id: signatures[chunk_id][0]):
+            if np.mean(signatures[candidate][1] == signature) >= self.threshold:
+                return candidate
+        return None
+
+    def _index(self, group: Optional[str], chunk_id: str, signature: np.ndarray):
+        signatures = self._signatures[group]
+        signatures[chunk_id] = (len(signatures), signature)
+        buckets = self._buckets[group]
+        for band in range(self.bands):
+            buckets[band][signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(chunk_id)
+
+    def _add_alias(self, unique: Dict[str, Chunk], original_id: str, duplicate: Chunk):
+        alias = {
+            "document_id": duplicate.document_id,
+            "chunk_index": duplicate.chunk_index,
+            "source": duplicate.metadata.get("source"),
+        }
+        original = unique.get(original_id)
+        if original is None:
+            # Already handed on (and maybe indexed) by an earlier call
+            self._pending_aliases[original_id].append(alias)
+            return
+        if "duplicates" not in original.metadata:
+            # Chunks of one document share their metadata dict; give the kept one its own
+            original.metadata = {**original.metadata, "duplicates": []}
+        original.metadata["duplicates"].append(alias)
@@ -0,0 +1,115 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from src.config import settings
+
+
+class EmbeddingCache:
+    """Content-addressed, size-bounded embedding store backed by SQLite.
+
+    Vectors are stored as float32 blobs keyed by a hash of the deployment name
+    and the exact text sent to the API, so identical chunks are only ever
+    embedded once per deployment. The least recently used entries are evicted
+    once ``max_entries`` is exceeded.
+    """
+
+    # Stay well under SQLite's bound-parameter limit
+    _QUERY_BATCH = 500
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+        self._size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str, deployment: str, dimensions: Optional[int] = None) -> str:
+        # Shortened embeddings are different vectors; native-size keys are unchanged
+        model = deployment if dimensions is None else f"{deployment}@{dimensions}"
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), self._QUERY_BATCH):
+                batch = keys[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+            self.conn.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._size += len(rows)
+            if self._size > self.max_entries:
+                # Other workers may share the file, so recount before evicting
+                self._size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = self._size - self.max_entries
+                if overflow > 0:
+                    self.conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._size -= overflow
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache shared by every EmbeddingGenerator; None when disabled."""
+    global _embedding_cache
+    if _embedding_cache is None and settings.EMBEDDING_CACHE_PATH:
+        _embedding_cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_PATH,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+    return _embedding_cache
@@ -1,9 +1,36 @@
-from typing import List
+import asyncio
+import base64
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+import tiktoken
 from openai import AsyncAzureOpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
 from src.config import settings
+from src.ingestion.embedding_cache import EmbeddingCache, get_embedding_cache
+from src.ingestion.query_embeddings import get_query_embedding_cache, request_embeddings
 from src.types import Chunk
 
+# text-embedding-3-* and ada-002 all use cl100k_base
+EMBEDDING_ENCODING = "cl100k_base"
+
+
+def iter_token_batches(token_counts: List[int], max_tokens: int, max_items: int) -> Iterator[range]:
+    """Split inputs into contiguous index ranges that respect both request limits.
+
+    An input larger than ``max_tokens`` on its own still gets a batch of one,
+    so callers should truncate to the model's per-input limit first.
+    """
+    start = 0
+    total = 0
+    for i, count in enumerate(token_counts):
+        if i > start and (total + count > max_tokens or i - start >= max_items):
+            yield range(start, i)
+            start, total = i, 0
+        total += count
+    if start < len(token_counts):
+        yield range(start, len(token_counts))
+
+
 class EmbeddingGenerator:
     def __init__(self):
         self.client = AsyncAzureOpenAI(
@@ -12,37 +39,153 @@ class EmbeddingGenerator:
             azure_endpoint=settings.AZURE_OPENAI_EMBEDDINGS_ENDPOINT
         )
         self.deployment = settings.AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT
+        self.dimensions = settings.EMBEDDING_DIMENSIONS
+        self.max_batch_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_items = settings.EMBEDDING_BATCH_MAX_ITEMS
+        self.max_input_tokens = settings.EMBEDDING_MAX_INPUT_TOKENS
+        self.max_concurrency = settings.EMBEDDING_MAX_CONCURRENCY
+        self.cache = get_embedding_cache()
+        self.query_cache = get_query_embedding_cache()
+        self._encoder = None
+
+    @property
+    def encoder(self) -> tiktoken.Encoding:
+        if self._encoder is None:
+            self._encoder = tiktoken.get_encoding(EMBEDDING_ENCODING)
+        return self._encoder
+
+    def _uses_mock_key(self) -> bool:
+        return self.client.api_key.startswith("REPL") or self.client.api_key == "REPLACE_WITH_KEY"
+
+    def _mock_embeddings(self, count: int) -> np.ndarray:
+        # Random vectors of the configured size (3072 for text-embedding-3-large)
+        return np.random.random((count, self.dimensions or 3072)).astype(np.float32)
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def generate(self, texts: List[str]) -> List[List[float]]:
+    async def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        # base64 transfers raw float32 bytes, so vectors go straight into one
+        # matrix without ever becoming Python floats
+        response = await self.client.embeddings.create(
+            input=texts,
+            model=self.deployment,
+            encoding_format="base64",
+            **({"dimensions": self.dimensions} if self.dimensions else {})
+        )
+        return np.stack([np.frombuffer(base64.b64decode(data.embedding), dtype=np.float32) for data in response.data])
+
+    async def generate(self, texts: List[str], fallback: bool = True) -> np.ndarray:
+        """Embed texts into a contiguous (len(texts), dim) float32 matrix.
+
+        On API errors, returns mock vectors if ``fallback`` is set and raises otherwise.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
         # Check for invalid key prefix to avoid wasting time/retries
-        if self.client.api_key.startswith("REPL") or self.client.api_key == "REPLACE_WITH_KEY":
+        if self._uses_mock_key():
             print("WARNING: Using MOCK Embeddings due to invalid API Key.")
-            # Return random 3072-dim vectors (text-embedding-3-large size)
-            import random
-            return [[random.random() for _ in range(3072)] for _ in texts]
+            return self._mock_embeddings(len(texts))
 
-        # Azure OpenAI Embeddings require replacing newlines for better performance 
+        # Azure OpenAI Embeddings require replacing newlines for better performance
         # (check if still needed for v3, usually good practice)
         processed_texts = [text.replace("\n", " ") for text in texts]
-        
+
+        if self.cache is None:
+            return await self._embed_uncached(processed_texts, fallback=fallback)
+
+        keys = [self.cache.make_key(text, self.deployment, self.dimensions) for text in processed_texts]
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+
+        # Request each distinct missing text once, even if it repeats in the batch
+        missing = {}
+        for key, text in zip(keys, processed_texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            fresh = await self._embed_uncached(list(missing.values()), cache_keys=list(missing.keys()), fallback=fallback)
+            cached.update(zip(missing.keys(), fresh))
+
+        return np.stack([cached[key] for key in keys])
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed one search query. Reuses the embedding from the current request scope
+        or the process-wide query cache, so a query is sent to the API at most once.
+        """
+        key = EmbeddingCache.make_key(query.replace("\n", " "), self.deployment, self.dimensions)
+        scope = request_embeddings()
+        if scope is not None and key in scope:
+            return scope[key]
+
+        if self._uses_mock_key():
+            embedding = (await self.generate([query]))[0]
+        else:
+            try:
+                embedding = await self.query_cache.get_or_embed(key, lambda: self._embed_one(query))
+            except Exception as e:
+                # Same fallback as generate(), but mock vectors never reach the query cache
+                print(f"Embedding Error: {e}")
+                print("Falling back to MOCK Embeddings due to Error.")
+                embedding = self._mock_embeddings(1)[0]
+        if scope is not None:
+            scope[key] = embedding
+        return embedding
+
+    async def _embed_one(self, query: str) -> np.ndarray:
+        return (await self.generate([query], fallback=False))[0]
+
+    async def _embed_uncached(self, texts: List[str], cache_keys: Optional[List[str]] = None, fallback: bool = True) -> np.ndarray:
         try:
-            response = await self.client.embeddings.create(
-                input=processed_texts,
-                model=self.deployment
-            )
-            return [data.embedding for data in response.data]
+            embeddings = await self._request_embeddings(texts)
         except Exception as e:
+            if not fallback:
+                raise
             print(f"Embedding Error: {e}")
             print("Falling back to MOCK Embeddings due to Error.")
-            import random
-            return [[random.random() for _ in range(3072)] for _ in texts]
+            # Mock vectors are never written to the cache
+            return self._mock_embeddings(len(texts))
+
+        if cache_keys is not None:
+            await asyncio.to_thread(self.cache.put_many, dict(zip(cache_keys, embeddings)))
+        return embeddings
 
+    def _prepare_texts(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        """Truncate inputs to the per-input limit and return their token counts."""
+        token_lists = self.encoder.encode_ordinary_batch(texts)
+        prepared = []
+        counts = []
+        for text, tokens in zip(texts, token_lists):
+            if len(tokens) > self.max_input_tokens:
+                tokens = tokens[:self.max_input_tokens]
+                text = self.encoder.decode(tokens)
+            prepared.append(text)
+            counts.append(len(tokens))
+        return prepared, counts
 
     async def embed_chunks(self, chunks: List[Chunk]):
-        texts = [chunk.content for chunk in chunks]
-        # Batching could be implemented here if texts list is too large
-        embeddings = await self.generate(texts)
-        
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk.embedding = embedding
+        if not chunks:
+            return
+
+        if all(chunk.token_count is not None and chunk.token_count <= self.max_input_tokens for chunk in chunks):
+            # The chunker already counted tokens, no need to re-encode for batching
+            texts = [chunk.content for chunk in chunks]
+            token_counts = [chunk.token_count for chunk in chunks]
+        else:
+            # Tokenizing thousands of chunks is CPU-bound, keep it off the event loop
+            texts, token_counts = await asyncio.to_thread(
+                self._prepare_texts, [chunk.content for chunk in chunks]
+            )
+        batches = list(iter_token_batches(token_counts, self.max_batch_tokens, self.max_batch_items))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch: range):
+            async with semaphore:
+                # Each batch retries (and falls back) on its own, so one bad
+                # request does not turn the whole ingest into mock vectors
+                embeddings = await self.generate([texts[i] for i in batch])
+            # Chunks hold row views into the batch matrix, no per-chunk copies
+            for i, embedding in zip(batch, embeddings):
+                chunks[i].embedding = embedding
+
+        await asyncio.gather(*(embed_batch(batch) for batch in batches))
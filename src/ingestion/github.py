@@ -1,65 +1,205 @@
+import hashlib
+import json
 import os
 import shutil
 import tempfile
 import subprocess
-from typing import List, Optional
-from src.types import Document
-from src.ingestion.loaders import get_loader_for_file
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+from src.config import settings
+from src.types import Document, document_id_for
+from src.ingestion.loaders import load_path
+from src.ingestion.parallel import get_loader_pool, imap_ordered
+
+class RepoSync(BaseModel):
+    """Changes between the last ingested commit of a repo and its current head."""
+    commit: str
+    previous_commit: Optional[str] = None
+    files_to_load: List[str] = Field(default_factory=list)  # Added/modified files, relative to the checkout
+    added: List[str] = Field(default_factory=list)
+    modified: List[str] = Field(default_factory=list)
+    deleted: List[str] = Field(default_factory=list)
+    file_hashes: Dict[str, str] = Field(default_factory=dict)  # Full manifest after this sync
+    stale_sources: List[str] = Field(default_factory=list)  # Sources whose old chunks must be removed
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
 
 class GitHubIngestor:
-    def __init__(self, repo_url: str, branch: str = "main"):
+    def __init__(self, repo_url: str, branch: str = "main", cache_dir: Optional[str] = None):
         self.repo_url = repo_url
         self.branch = branch
         self.supported_extensions = {'.md', '.txt', '.py', '.js', '.ts', '.html', '.css', '.json'} # Expand as needed
 
+        # Persistent checkout + state live under the cache dir so re-syncs only fetch and diff
+        repo_key = hashlib.sha1(f"{repo_url}@{branch}".encode("utf-8")).hexdigest()[:16]
+        base_dir = Path(cache_dir or settings.GITHUB_CACHE_DIR)
+        self.checkout_dir = base_dir / repo_key
+        self.state_path = base_dir / f"{repo_key}.json"
+
     def ingest(self) -> List[Document]:
         with tempfile.TemporaryDirectory() as temp_dir:
             repo_name = self.repo_url.split("/")[-1].replace(".git", "")
             target_dir = os.path.join(temp_dir, repo_name)
-            
+
             print(f"Cloning {self.repo_url}...")
-            try:
-                subprocess.run(
-                    ["git", "clone", "--depth", "1", "--branch", self.branch, self.repo_url, target_dir],
-                    check=True,
-                    capture_output=True
-                )
-            except subprocess.CalledProcessError:
-                # Try without branch if main fails (fallback to default)
-                subprocess.run(
-                    ["git", "clone", "--depth", "1", self.repo_url, target_dir],
-                    check=True,
-                    capture_output=True
-                )
-
-            documents = []
+            self._clone(target_dir)
+
+            rel_paths = []
             for root, _, files in os.walk(target_dir):
                 if ".git" in root:
                     continue
-                    
+
                 for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in self.supported_extensions:
-                        file_path = os.path.join(root, file)
-                        try:
-                            # Use existing loaders where possible, or fallback to text
-                            try:
-                                loader = get_loader_for_file(file_path)
-                                docs = loader.load(file_path)
-                            except ValueError:
-                                # Fallback for code files not explicitly in get_loader_for_file
-                                from src.ingestion.loaders import TextLoader
-                                loader = TextLoader()
-                                docs = loader.load(file_path)
-                            
-                            # Add Repo Metadata
-                            for doc in docs:
-                                rel_path = os.path.relpath(file_path, target_dir)
-                                doc.metadata["source"] = f"{self.repo_url}/blob/{self.branch}/{rel_path}"
-                                doc.metadata["repo"] = self.repo_url
-                            
-                            documents.extend(docs)
-                        except Exception as e:
-                            print(f"Failed to ingest {file}: {e}")
-                            
-            return documents
+                    if self._is_supported(file):
+                        rel_paths.append(os.path.relpath(os.path.join(root, file), target_dir))
+
+            return list(self._iter_files(target_dir, rel_paths))
+
+    def sync(self) -> RepoSync:
+        """
+        Fetch the repo and work out which files changed since the last saved sync.
+
+        Stream the changed files with iter_documents(), then call save_state() once
+        they have been indexed, otherwise the next sync reports the same changes again.
+        """
+        state = self._load_state()
+        previous_commit = state.get("commit")
+        old_hashes: Dict[str, str] = state.get("files", {})
+
+        candidates = None  # None means "scan every tracked file"
+        if (self.checkout_dir / ".git").exists():
+            print(f"Fetching {self.repo_url}...")
+            self._fetch()
+            commit = self._git("rev-parse", "FETCH_HEAD")
+            if commit == previous_commit:
+                return RepoSync(commit=commit, previous_commit=previous_commit, file_hashes=old_hashes)
+            self._git("reset", "--hard", "FETCH_HEAD")
+            if previous_commit and self._has_commit(previous_commit):
+                # Without rename detection, a renamed file lists both its old and new path
+                candidates = self._git("diff", "--name-only", "--no-renames", previous_commit, commit).splitlines()
+        else:
+            print(f"Cloning {self.repo_url}...")
+            if self.checkout_dir.exists():
+                shutil.rmtree(self.checkout_dir)
+            self.checkout_dir.parent.mkdir(parents=True, exist_ok=True)
+            self._clone(str(self.checkout_dir))
+            commit = self._git("rev-parse", "HEAD")
+
+        if candidates is None:
+            candidates = set(self._git("ls-files").splitlines()) | set(old_hashes)
+
+        new_hashes = dict(old_hashes)
+        result = RepoSync(commit=commit, previous_commit=previous_commit)
+        for rel_path in sorted(set(candidates)):
+            if not self._is_supported(rel_path):
+                continue
+            file_path = self.checkout_dir / rel_path
+            if not file_path.is_file():
+                if new_hashes.pop(rel_path, None) is not None:
+                    result.deleted.append(rel_path)
+                continue
+
+            content_hash = hashlib.sha256(file_path.read_bytes()).hexdigest()
+            previous_hash = new_hashes.get(rel_path)
+            if previous_hash == content_hash:
+                continue  # Touched by the diff (e.g. mode change) but content is identical
+            new_hashes[rel_path] = content_hash
+            (result.modified if previous_hash else result.added).append(rel_path)
+            result.files_to_load.append(rel_path)
+
+        result.file_hashes = new_hashes
+        result.stale_sources = [self._source_for(p) for p in result.modified + result.deleted]
+        return result
+
+    def iter_documents(self, result: RepoSync) -> Iterator[Document]:
+        return self._iter_files(str(self.checkout_dir), result.files_to_load)
+
+    def paths_for_sources(self, sources: List[str]) -> List[str]:
+        """Map chunk sources of this repo back to checkout-relative paths that still exist."""
+        prefix = self._source_for("")
+        return [
+            source[len(prefix):]
+            for source in sources
+            if source.startswith(prefix) and (self.checkout_dir / source[len(prefix):]).is_file()
+        ]
+
+    def save_state(self, result: RepoSync):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps({
+            "repo": self.repo_url,
+            "branch": self.branch,
+            "commit": result.commit,
+            "files": result.file_hashes,
+        }))
+
+    def synced_sources(self) -> List[str]:
+        """Sources of every file the saved state says is indexed."""
+        return [self._source_for(rel_path) for rel_path in self._load_state().get("files", {})]
+
+    def reset_state(self):
+        """Forget the last sync, so the next one loads every file again."""
+        self.state_path.unlink(missing_ok=True)
+
+    def _load_state(self) -> Dict:
+        if not self.state_path.exists():
+            return {}
+        return json.loads(self.state_path.read_text())
+
+    def _clone(self, target_dir: str):
+        try:
+            subprocess.run(
+                ["git", "clone", "--depth", "1", "--branch", self.branch, self.repo_url, target_dir],
+                check=True,
+                capture_output=True
+            )
+        except subprocess.CalledProcessError:
+            # Try without branch if main fails (fallback to default)
+            subprocess.run(
+                ["git", "clone", "--depth", "1", self.repo_url, target_dir],
+                check=True,
+                capture_output=True
+            )
+
+    def _fetch(self):
+        try:
+            self._git("fetch", "--depth", "1", "origin", self.branch)
+        except subprocess.CalledProcessError:
+            # Clone fell back to the default branch, keep following it
+            self._git("fetch", "--depth", "1", "origin", "HEAD")
+
+    def _git(self, *args: str) -> str:
+        completed = subprocess.run(
+            ["git", "-c", "core.quotepath=off", "-C", str(self.checkout_dir), *args],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        return completed.stdout.strip()
+
+    def _has_commit(self, commit: str) -> bool:
+        try:
+            self._git("cat-file", "-e", f"{commit}^{{commit}}")
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    def _is_supported(self, file_name: str) -> bool:
+        return os.path.splitext(file_name)[1].lower() in self.supported_extensions
+
+    def _source_for(self, rel_path: str) -> str:
+        return f"{self.repo_url}/blob/{self.branch}/{rel_path}"
+
+    def _iter_files(self, base_dir: str, rel_paths: List[str]) -> Iterator[Document]:
+        # Read/parse files across the loader process pool, keeping repo order
+        file_paths = [os.path.join(base_dir, rel_path) for rel_path in rel_paths]
+        for rel_path, docs in zip(rel_paths, imap_ordered(get_loader_pool(), load_path, file_paths)):
+            # Add Repo Metadata
+            for doc in docs:
+                doc.metadata["source"] = self._source_for(rel_path.replace(os.sep, "/"))
+                # Ids follow the repo source, not the local checkout path
+                doc.id = document_id_for(doc.metadata["source"], doc.metadata.get("page"))
+                doc.metadata["repo"] = self.repo_url
+                yield doc
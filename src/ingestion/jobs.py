@@ -0,0 +1,193 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+from pydantic import BaseModel, Field
+from src.config import settings
+from src.ingestion.pipeline import IngestStats
+
+# Identifies this server process; pids are reused after a restart, this never is
+INSTANCE_ID = uuid4().hex
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def is_final(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class IngestJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    kind: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    submitted_by: Optional[str] = None
+    worker_pid: int = Field(default_factory=os.getpid)
+    worker_instance: Optional[str] = None  # INSTANCE_ID of the process running the job
+    status: JobStatus = JobStatus.QUEUED
+    progress: IngestStats = Field(default_factory=IngestStats)
+    result: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def throughput(self) -> float:
+        """Indexed chunks per second since the job started."""
+        if not self.started_at:
+            return 0.0
+        end = self.finished_at or datetime.utcnow()
+        elapsed = (end - self.started_at).total_seconds()
+        return self.progress.indexed / elapsed if elapsed > 0 else 0.0
+
+    def to_response(self) -> Dict[str, Any]:
+        data = self.model_dump(mode="json")
+        data["throughput_chunks_per_s"] = round(self.throughput, 2)
+        return data
+
+
+JobHandler = Callable[[IngestJob], Awaitable[Dict[str, Any]]]
+
+
+class JobStore:
+    """Local persistent job store (SQLite), so job history survives restarts."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, created_at TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def save(self, job: IngestJob):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, created_at, data) VALUES (?, ?, ?)",
+                (job.id, job.created_at.isoformat(), job.model_dump_json())
+            )
+            self.conn.commit()
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return IngestJob.model_validate_json(row[0]) if row else None
+
+    def list(self, limit: int = 50) -> List[IngestJob]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT data FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [IngestJob.model_validate_json(row[0]) for row in rows]
+
+
+class JobManager:
+    """
+    Runs ingestion jobs in the background with a concurrency limit.
+
+    Handlers are registered per job kind and receive the job, whose ``progress``
+    they update in place (e.g. by passing it to IngestPipeline as ``stats``).
+    Live jobs are served from memory; finished ones from the store.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        max_concurrent: Optional[int] = None,
+        flush_interval: float = 2.0,
+        instance_id: str = INSTANCE_ID,
+    ):
+        self.store = store
+        self.instance_id = instance_id
+        self.flush_interval = flush_interval
+        self._handlers: Dict[str, JobHandler] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent or settings.INGEST_MAX_CONCURRENT_JOBS)
+        self._active: Dict[str, IngestJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._recover()
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, params: Dict[str, Any], submitted_by: Optional[str] = None) -> IngestJob:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        job = IngestJob(kind=kind, params=params, submitted_by=submitted_by, worker_instance=self.instance_id)
+        self.store.save(job)
+        self._active[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._active.get(job_id) or self.store.get(job_id)
+
+    def list(self, limit: int = 50) -> List[IngestJob]:
+        jobs = {job.id: job for job in self.store.list(limit)}
+        jobs.update(self._active)
+        return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)[:limit]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job running in this process; False if it isn't (finished, or run by another worker)."""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _recover(self):
+        # The indexes are single-process, so a job started by any other server
+        # instance (even one whose pid this process now has) can't be running
+        for job in self.store.list(limit=1000):
+            if not job.status.is_final and job.worker_instance != self.instance_id:
+                job.status = JobStatus.FAILED
+                job.error = "Interrupted by server restart"
+                job.finished_at = datetime.utcnow()
+                self.store.save(job)
+
+    async def _flush_progress(self, job: IngestJob):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.store.save, job)
+
+    async def _run(self, job: IngestJob):
+        flusher = None
+        try:
+            async with self._semaphore:
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.utcnow()
+                self.store.save(job)
+                flusher = asyncio.create_task(self._flush_progress(job))
+
+                job.result = await self._handlers[job.kind](job) or {}
+                job.status = JobStatus.SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+        except Exception as e:
+            print(f"Ingest job {job.id} failed: {e}")
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            if flusher:
+                flusher.cancel()
+            job.finished_at = datetime.utcnow()
+            self.store.save(job)
+            self._active.pop(job.id, None)
+            self._tasks.pop(job.id, None)
@@ -1,46 +1,94 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from concurrent.futures import Executor
+from functools import partial
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 import os
 from pypdf import PdfReader
-from src.types import Document
+from src.config import settings
+from src.ingestion.parallel import imap_ordered
+from src.types import Document, document_id_for
 
 class BaseLoader(ABC):
     @abstractmethod
     def load(self, file_path: str) -> List[Document]:
         pass
 
+    def lazy_load(self, file_path: str) -> Iterator[Document]:
+        # Loaders that can produce documents incrementally override this
+        yield from self.load(file_path)
+
 class TextLoader(BaseLoader):
     def load(self, file_path: str) -> List[Document]:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
-        
+
         return [Document(
+            id=document_id_for(file_path),
             content=content,
             metadata={"source": file_path, "type": "text"}
         )]
 
+def _extract_pdf_pages(file_path: str, page_range: Tuple[int, int]) -> List[Tuple[int, str]]:
+    # Module-level so it can be pickled into worker processes
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text()) for i in range(*page_range)]
+
 class PDFLoader(BaseLoader):
+    def __init__(self, executor: Optional[Executor] = None, pages_per_task: Optional[int] = None):
+        # With an executor, page ranges are extracted in parallel (e.g. a process pool)
+        self.executor = executor
+        self.pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+
     def load(self, file_path: str) -> List[Document]:
+        return list(self.lazy_load(file_path))
+
+    def lazy_load(self, file_path: str) -> Iterator[Document]:
         reader = PdfReader(file_path)
-        documents = []
-        
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text()
+        page_count = len(reader.pages)
+
+        if self.executor is None or page_count <= self.pages_per_task:
+            page_texts = ((i, page.extract_text()) for i, page in enumerate(reader.pages))
+        else:
+            ranges = [
+                (start, min(start + self.pages_per_task, page_count))
+                for start in range(0, page_count, self.pages_per_task)
+            ]
+            # Results come back in submission order so pages stay in document order
+            page_texts = (
+                page
+                for pages in imap_ordered(self.executor, partial(_extract_pdf_pages, file_path), ranges)
+                for page in pages
+            )
+
+        for i, text in page_texts:
             if text:
-                documents.append(Document(
+                yield Document(
+                    id=document_id_for(file_path, i + 1),
                     content=text,
                     metadata={
-                        "source": file_path, 
-                        "type": "pdf", 
+                        "source": file_path,
+                        "type": "pdf",
                         "page": i + 1
                     }
-                ))
-        return documents
+                )
 
-def get_loader_for_file(file_path: str) -> BaseLoader:
+def get_loader_for_file(file_path: str, executor: Optional[Executor] = None) -> BaseLoader:
     ext = os.path.splitext(file_path)[1].lower()
     if ext == '.pdf':
-        return PDFLoader()
+        return PDFLoader(executor=executor)
     elif ext in ['.txt', '.md']:
         return TextLoader()
     raise ValueError(f"No loader found for extension: {ext}")
+
+def load_path(file_path: str) -> List[Document]:
+    """Load any supported file, falling back to plain text. Safe to run in a worker process."""
+    try:
+        try:
+            loader = get_loader_for_file(file_path)
+        except ValueError:
+            # Fallback for code files not explicitly in get_loader_for_file
+            loader = TextLoader()
+        return loader.load(file_path)
+    except Exception as e:
+        print(f"Failed to ingest {file_path}: {e}")
+        return []
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+from src.config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_loader_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_loader_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all loaders, created on first use."""
+    global _loader_pool
+    if _loader_pool is None:
+        workers = settings.INGEST_LOADER_WORKERS or os.cpu_count() or 1
+        # spawn: the API process runs an event loop and threads, which don't survive fork
+        _loader_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _loader_pool
+
+
+def shutdown_loader_pool():
+    global _loader_pool
+    if _loader_pool is not None:
+        _loader_pool.shutdown(cancel_futures=True)
+        _loader_pool = None
+
+
+def imap_ordered(executor: Executor, fn: Callable[[T], R], items: Iterable[T], window: Optional[int] = None) -> Iterator[R]:
+    """
+    Like executor.map, but submits lazily and keeps at most ``window`` tasks in flight.
+
+    Results are yielded in input order as soon as the head of the window is done,
+    so a consumer can start on the first file while later ones are still loading.
+    """
+    window = window or 2 * (getattr(executor, "_max_workers", None) or 1)
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
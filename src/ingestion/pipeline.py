@@ -0,0 +1,151 @@
+import asyncio
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Set
+from pydantic import BaseModel
+from src.config import settings
+from src.ingestion.chunking import BaseChunker
+from src.ingestion.dedup import ChunkDeduplicator
+from src.types import Chunk, Document
+
+if TYPE_CHECKING:
+    from src.retrieval.service import RetrievalService
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+
+class IngestStats(BaseModel):
+    files_total: Optional[int] = None  # Known upfront for file/repo ingests
+    documents: int = 0
+    chunks: int = 0
+    duplicates: int = 0  # Chunks dropped as exact/near duplicates
+    embedded: int = 0
+    indexed: int = 0
+
+
+class IngestPipeline:
+    """
+    Streaming load -> chunk (+ dedup) -> embed -> index pipeline.
+
+    Each stage runs as its own task and hands work to the next one through a
+    bounded queue, so loading, chunking, embedding and upserts overlap while at
+    most ``queue_size`` items per stage are held in memory, however large the
+    corpus is. Blocking work (file parsing, tokenization) runs in threads.
+    """
+
+    def __init__(
+        self,
+        retriever: "RetrievalService",
+        chunker: BaseChunker,
+        batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        embed_workers: Optional[int] = None,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+        stats: Optional[IngestStats] = None,
+        collect_ids: bool = False,
+        dedup: Optional[bool] = None,
+    ):
+        self.retriever = retriever
+        self.chunker = chunker
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.embed_workers = embed_workers or settings.INGEST_EMBED_WORKERS
+        # dedup=None: on if a deduplicator is given, else as INGEST_DEDUP_ENABLED says
+        if dedup is None:
+            dedup = deduplicator is not None or settings.INGEST_DEDUP_ENABLED
+        if dedup and deduplicator is None:
+            deduplicator = ChunkDeduplicator(threshold=settings.INGEST_DEDUP_THRESHOLD)
+        self.deduplicator = deduplicator if dedup else None
+        # Callers may pass their own stats object to observe progress while running
+        self.stats = stats or IngestStats()
+        # Ids of the indexed chunks, if requested (e.g. to drop what a re-ingest didn't rewrite)
+        self.indexed_ids: Optional[Set[str]] = set() if collect_ids else None
+
+    def _chunk_batch(self, docs: List[Document]) -> List[Chunk]:
+        chunks = [chunk for doc_chunks in self.chunker.chunk_many(docs) for chunk in doc_chunks]
+        if self.deduplicator is None:
+            return chunks
+        # Duplicates never reach the embedding API or the indexes
+        unique = self.deduplicator.filter(chunks)
+        self.stats.duplicates += len(chunks) - len(unique)
+        return unique
+
+    async def run(self, documents: Iterable[Document]) -> IngestStats:
+        doc_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size * 8)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embedded_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def load():
+            doc_iter: Iterator[Document] = iter(documents)
+            while True:
+                # Loaders are plain (possibly process-pool backed) generators
+                doc = await asyncio.to_thread(next, doc_iter, _DONE)
+                if doc is _DONE:
+                    break
+                self.stats.documents += 1
+                await doc_queue.put(doc)
+            await doc_queue.put(_DONE)
+
+        async def chunk():
+            batch: List[Chunk] = []
+            done = False
+            while not done:
+                docs = [await doc_queue.get()]
+                # Take whatever else is already loaded so the chunker can batch-encode it
+                while docs[-1] is not _DONE and not doc_queue.empty():
+                    docs.append(doc_queue.get_nowait())
+                if docs[-1] is _DONE:
+                    docs.pop()
+                    done = True
+                if docs:
+                    batch.extend(await asyncio.to_thread(self._chunk_batch, docs))
+                while len(batch) >= self.batch_size:
+                    ready, batch = batch[:self.batch_size], batch[self.batch_size:]
+                    self.stats.chunks += len(ready)
+                    await chunk_queue.put(ready)
+            if batch:
+                self.stats.chunks += len(batch)
+                await chunk_queue.put(batch)
+            await chunk_queue.put(_DONE)
+
+        async def embed_worker():
+            while True:
+                batch = await chunk_queue.get()
+                if batch is _DONE:
+                    # Leave the marker for the other embed workers
+                    await chunk_queue.put(_DONE)
+                    return
+                await self.retriever.embedding_gen.embed_chunks(batch)
+                self.stats.embedded += len(batch)
+                await embedded_queue.put(batch)
+
+        async def embed():
+            await asyncio.gather(*(embed_worker() for _ in range(self.embed_workers)))
+            await embedded_queue.put(_DONE)
+
+        async def index():
+            while True:
+                batch = await embedded_queue.get()
+                if batch is _DONE:
+                    return
+                await self.retriever.index(batch)
+                # Vectors now live in the vector store; release the batch matrix
+                # even if the caller holds on to the chunks
+                for item in batch:
+                    item.embedding = None
+                if self.indexed_ids is not None:
+                    self.indexed_ids.update(str(item.id) for item in batch)
+                self.stats.indexed += len(batch)
+
+        # End-of-stream markers are only sent on success; any failure cancels every stage
+        tasks = [asyncio.create_task(stage()) for stage in (load, chunk, embed, index)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        if self.deduplicator is not None:
+            # Duplicates of chunks that were already indexed when they turned up
+            await self.retriever.add_duplicates(self.deduplicator.take_pending_aliases())
+        await self.retriever.flush()
+        return self.stats
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+import numpy as np
+from src.config import settings
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU of query embeddings with a time-to-live.
+
+    Sits in front of the embeddings API for search queries, which are short,
+    repeat across users and are needed by several components per request.
+    Concurrent misses for the same key share a single request.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_embed(self, key: str, embed: Callable[[], Awaitable[np.ndarray]]) -> np.ndarray:
+        vector = self.get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # Its own task, so cancelling the request that started it doesn't fail the others waiting on it
+        task = loop.create_task(self._embed(key, embed))
+        # Every caller may be gone by the time it fails; don't warn about an unretrieved exception
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _embed(self, key: str, embed: Callable[[], Awaitable[np.ndarray]]) -> np.ndarray:
+        try:
+            vector = await embed()
+            self.put(key, vector)
+            return vector
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+_query_embedding_cache: Optional[QueryEmbeddingCache] = None
+
+# Embeddings of the queries handled by the current request (see query_embedding_scope)
+_request_embeddings: ContextVar[Optional[Dict[str, np.ndarray]]] = ContextVar("request_query_embeddings", default=None)
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Process-wide query embedding cache shared by every EmbeddingGenerator."""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = QueryEmbeddingCache(
+            max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL
+        )
+    return _query_embedding_cache
+
+
+@contextmanager
+def query_embedding_scope(embeddings: Optional[Dict[str, np.ndarray]] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Remember query embeddings for the duration of one request, so cache lookup,
+    retrieval and cache write embed a query at most once, even if the process
+    cache is disabled or evicts it in between. Tasks started inside the scope share it.
+
+    Pass the dict yielded by an earlier scope to re-enter it, e.g. for work that
+    runs after a streamed response.
+    """
+    embeddings = embeddings if embeddings is not None else {}
+    token = _request_embeddings.set(embeddings)
+    try:
+        yield embeddings
+    finally:
+        _request_embeddings.reset(token)
+
+
+def request_embeddings() -> Optional[Dict[str, np.ndarray]]:
+    return _request_embeddings.get()
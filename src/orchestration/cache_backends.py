@@ -0,0 +1,530 @@
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.config import settings
+from src.retrieval.ann import spherical_kmeans
+
+
+class CacheBackend(ABC):
+    """
+    Storage and nearest-neighbour lookup of SemanticCache entries.
+
+    ``partition`` is an opaque string (the ACL partition of the entry); vectors
+    are unit-norm float32. Backends own capacity, expiry and eviction, and must
+    be safe to call from the event loop and worker threads at once.
+    """
+
+    max_entries: int
+
+    @abstractmethod
+    def lookup(self, partition: str, vector: np.ndarray, threshold: float, now: float) -> Optional[Tuple[str, float]]:
+        """(answer, expiry) of the most similar live entry of ``partition`` scoring at least ``threshold``, if any."""
+
+    @abstractmethod
+    def insert(self, partition: str, vector: np.ndarray, answer: str, expires: float, now: float):
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, float]:
+        pass
+
+
+class CachePartition:
+    """
+    Cached answers of one ACL partition, with unit-norm query embeddings as rows
+    of one contiguous float32 matrix so a lookup is a single matmul + argmax.
+
+    Slots of evicted or expired entries are reused. Past ``exact_threshold``
+    entries, the rows are clustered (spherical k-means over about sqrt(N) lists)
+    and sorted so each list is a contiguous block; a lookup only scores the
+    blocks of the ``nprobe`` lists nearest the query, plus the tail of rows
+    appended since the blocks were last built.
+    """
+
+    _INITIAL_CAPACITY = 256
+    _TRAIN_ITERATIONS = 8
+    _TRAIN_MAX_SAMPLES = 20_000
+    _TAIL_MIN = 1024  # Rows appended since the last list build are scanned exactly, up to max(this, N / 32)
+
+    def __init__(self, dim: int, exact_threshold: int = 20_000, nprobe: int = 8, seed: int = 0):
+        self.dim = dim
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self._rng = np.random.default_rng(seed)
+
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._expires = np.zeros(0, dtype=np.float64)
+        self._last_used = np.zeros(0, dtype=np.float64)
+        self._hits = np.zeros(0, dtype=np.int64)
+        self._live = np.zeros(0, dtype=bool)
+        self._answers: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._size = 0  # Slots ever used (high-water mark)
+        self.count = 0
+
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._list_offsets: Optional[np.ndarray] = None
+        self._tail = 0  # First row not in a list block
+
+    def _grow(self):
+        capacity = max(self._INITIAL_CAPACITY, 2 * len(self._vectors))
+
+        def grown(values: np.ndarray) -> np.ndarray:
+            buffer = np.zeros((capacity,) + values.shape[1:], dtype=values.dtype)
+            buffer[:len(values)] = values
+            return buffer
+
+        self._vectors = grown(self._vectors)
+        self._expires = grown(self._expires)
+        self._last_used = grown(self._last_used)
+        self._hits = grown(self._hits)
+        self._live = grown(self._live)
+        self._assignments = grown(self._assignments)
+        self._answers.extend([None] * (capacity - len(self._answers)))
+
+    def lookup(self, vector: np.ndarray, threshold: float, now: float) -> Optional[Tuple[str, float]]:
+        best_slot, best_score = -1, threshold
+        for rows in self._candidates(vector):
+            scores = self._vectors[rows] @ vector
+            if not len(scores):
+                continue
+            scores[~(self._live[rows] & (self._expires[rows] > now))] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] >= best_score:
+                best_slot = rows.start + best
+                best_score = scores[best]
+        if best_slot < 0:
+            return None
+        self._last_used[best_slot] = now
+        self._hits[best_slot] += 1
+        return self._answers[best_slot], float(self._expires[best_slot])
+
+    def insert(self, vector: np.ndarray, answer: str, expires: float, now: float):
+        if self._free and self._centroids is None:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self._vectors):
+                self._grow()
+            slot = self._size
+            self._size += 1
+        self._vectors[slot] = vector
+        self._answers[slot] = answer
+        self._expires[slot] = expires
+        self._last_used[slot] = now
+        self._hits[slot] = 0
+        self._live[slot] = True
+        self.count += 1
+
+        if self._centroids is not None:
+            self._assignments[slot] = np.argmax(self._centroids @ vector)
+            # Rebuilding also compacts away the slots freed since the last build
+            if self._size - self._tail > max(self._TAIL_MIN, self.count // 32):
+                self._build_lists()
+        self._maybe_train()
+
+    def remove(self, slots: Iterable[int]):
+        for slot in slots:
+            if self._live[slot]:
+                self._live[slot] = False
+                self._answers[slot] = None
+                self._free.append(int(slot))
+                self.count -= 1
+
+    def discard(self, answers: Iterable[str]):
+        """Remove the live entries holding any of these answers."""
+        answers = set(answers)
+        self.remove([slot for slot in np.flatnonzero(self._live[:self._size]) if self._answers[slot] in answers])
+
+    def expired(self, now: float) -> np.ndarray:
+        return np.flatnonzero(self._live[:self._size] & (self._expires[:self._size] <= now))
+
+    def eviction_keys(self, policy: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(slots, primary, secondary) of live entries; the smallest keys are evicted first."""
+        slots = np.flatnonzero(self._live[:self._size])
+        if policy == "lfu":
+            return slots, self._hits[slots].astype(np.float64), self._last_used[slots]
+        return slots, self._last_used[slots], np.zeros(len(slots))
+
+    # --- Coarse quantizer for large partitions ---
+
+    def _maybe_train(self):
+        if self.count < self.exact_threshold:
+            return
+        if self._centroids is None or self.count >= 2 * self._trained_size:
+            self._train()
+
+    def _train(self):
+        live = np.flatnonzero(self._live[:self._size])
+        nlist = max(16, int(np.sqrt(len(live))))
+        sample = self._vectors[np.sort(self._rng.choice(live, min(len(live), self._TRAIN_MAX_SAMPLES), replace=False))]
+        self._centroids = spherical_kmeans(sample, nlist, self._TRAIN_ITERATIONS, self._rng)
+        self._trained_size = len(live)
+        for lo in range(0, self._size, 8192):
+            hi = min(lo + 8192, self._size)
+            self._assignments[lo:hi] = np.argmax(self._vectors[lo:hi] @ self._centroids.T, axis=1)
+        self._build_lists()
+
+    def _build_lists(self):
+        """Reorder the slots so every list is one contiguous block of rows, with dead slots last."""
+        live = self._live[:self._size]
+        nlist = len(self._centroids)
+        order = np.argsort(np.where(live, self._assignments[:self._size], nlist), kind="stable")
+        for name in ("_vectors", "_expires", "_last_used", "_hits", "_live", "_assignments"):
+            values = getattr(self, name)
+            values[:self._size] = values[:self._size][order]
+        self._answers[:self._size] = [self._answers[i] for i in order]
+
+        counts = np.bincount(self._assignments[:self._size][self._live[:self._size]], minlength=nlist)
+        self._list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._list_offsets[1:])
+        self._size = self._tail = self.count
+        self._free = []
+
+    def _candidates(self, vector: np.ndarray) -> List[slice]:
+        """Row blocks to score: everything, or the nearest lists plus the tail."""
+        if self._centroids is None or self.count < self.exact_threshold // 2:
+            return [slice(0, self._size)]
+        nprobe = min(self.nprobe, len(self._centroids))
+        lists = np.argpartition(-(self._centroids @ vector), nprobe - 1)[:nprobe]
+        blocks = [slice(int(self._list_offsets[i]), int(self._list_offsets[i + 1])) for i in lists]
+        blocks.append(slice(self._tail, self._size))
+        return blocks
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Per-process cache: one CachePartition per ACL partition. Past ``max_entries``
+    in total, expired entries are dropped first, then the least recently
+    (``lru``) or least frequently (``lfu``) used ones across partitions.
+    """
+
+    _EVICT_FRACTION = 0.01  # Evict in small batches to amortize the victim search
+
+    def __init__(
+        self,
+        max_entries: int = 50_000,
+        eviction: str = "lru",
+        exact_threshold: int = 10_000,
+        nprobe: int = 8,
+    ):
+        if eviction not in ("lru", "lfu"):
+            raise ValueError(f"Unknown semantic cache eviction policy: {eviction}")
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.partitions: Dict[str, CachePartition] = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, partition: str, vector: np.ndarray, threshold: float, now: float) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entries = self.partitions.get(partition)
+            if entries is None or entries.dim != len(vector):
+                return None
+            return entries.lookup(vector, threshold, now)
+
+    def insert(self, partition: str, vector: np.ndarray, answer: str, expires: float, now: float):
+        with self._lock:
+            if len(self) >= self.max_entries:
+                self._evict(now)
+            entries = self.partitions.get(partition)
+            if entries is None or entries.dim != len(vector):
+                # A changed embedding size makes the old entries unusable
+                entries = self.partitions[partition] = CachePartition(len(vector), self.exact_threshold, self.nprobe)
+            entries.insert(vector, answer, expires, now)
+
+    def __len__(self) -> int:
+        return sum(entries.count for entries in self.partitions.values())
+
+    def _evict(self, now: float):
+        # Expired entries go first
+        for entries in self.partitions.values():
+            expired = entries.expired(now)
+            entries.remove(expired)
+            self.evictions += len(expired)
+
+        overflow = len(self) - self.max_entries + 1
+        if overflow > 0:
+            overflow = max(overflow, int(self.max_entries * self._EVICT_FRACTION))
+            keys = [(key, *entries.eviction_keys(self.eviction)) for key, entries in self.partitions.items()]
+            owners = np.concatenate([np.full(len(slots), i) for i, (_, slots, _, _) in enumerate(keys)])
+            slots = np.concatenate([slots for _, slots, _, _ in keys])
+            primary = np.concatenate([p for _, _, p, _ in keys])
+            secondary = np.concatenate([s for _, _, _, s in keys])
+            victims = np.lexsort((secondary, primary))[:overflow]
+            for i, (key, _, _, _) in enumerate(keys):
+                self.partitions[key].remove(slots[victims[owners[victims] == i]])
+            self.evictions += len(victims)
+
+        for key in [key for key, entries in self.partitions.items() if not entries.count]:
+            del self.partitions[key]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "backend": "memory",
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "partitions": len(self.partitions),
+            "evictions": self.evictions,
+        }
+
+
+class SharedCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker on the host and kept across restarts.
+
+    Layout under ``path``:
+      - ``cache.sqlite``: one row per slot (ACL partition, answer, expiry and
+        usage) and a write sequence number, bumped whenever a slot changes.
+      - ``vectors-<dim>.f32``: float32 matrix of the slots' unit-norm vectors,
+        written before the row that references it is committed.
+
+    Every worker keeps an in-RAM CachePartition per partition, holding
+    ``slot:seq`` keys instead of answers. Before each lookup it reads the rows
+    whose sequence number is past the last one it saw, so entries any worker
+    cached are served by all of them, and evicted entries are dropped. Only
+    the matched answer is read from SQLite. Hits are counted in memory and
+    written for eviction along with the next insert.
+    """
+
+    _EVICT_FRACTION = 0.01
+    _HIT_FLUSH = 256  # Pending hit records that force a write on lookup
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 50_000,
+        eviction: str = "lru",
+        exact_threshold: int = 10_000,
+        nprobe: int = 8,
+    ):
+        if eviction not in ("lru", "lfu"):
+            raise ValueError(f"Unknown semantic cache eviction policy: {eviction}")
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Autocommit; writes open their own BEGIN IMMEDIATE transactions
+        self.conn = sqlite3.connect(self.path / "cache.sqlite", check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "slot INTEGER PRIMARY KEY, seq INTEGER NOT NULL, partition TEXT, answer TEXT, "
+            "expires REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_seq ON entries(seq)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_hits ON entries(hits, last_used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_free ON entries(slot) WHERE partition IS NULL")
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', 0), ('seq', 0), ('entries', 0)")
+
+        # This worker's view, as of sequence number _seen
+        self._seen = 0
+        self._dim = 0
+        self._vectors: Optional[np.memmap] = None
+        self._versions: Dict[int, Tuple[int, str]] = {}  # slot -> (seq, partition)
+        self.partitions: Dict[str, CachePartition] = {}
+        self._pending_hits: Dict[Tuple[int, int], List[float]] = {}  # (slot, seq) -> [hits, last used]
+
+    def _meta(self, key: str) -> int:
+        return self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _set_meta(self, key: str, value: int):
+        self.conn.execute("UPDATE meta SET value = ? WHERE key = ?", (value, key))
+
+    def _next_seq(self) -> int:
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'seq'")
+        return self._meta("seq")
+
+    def _vector_path(self, dim: int) -> Path:
+        return self.path / f"vectors-{dim}.f32"
+
+    def _map(self, dim: int, slots: int) -> np.memmap:
+        """The vectors file mapped with room for at least ``slots`` rows (growing it if needed)."""
+        if self._vectors is None or self._vectors.shape[1] != dim or len(self._vectors) < slots:
+            path = self._vector_path(dim)
+            capacity = path.stat().st_size // (dim * 4) if path.exists() else 0
+            if capacity < slots:
+                # Only writers need to grow it, and they hold the write lock. Never shrink: other workers map it
+                capacity = max(slots, 2 * capacity, 1024)
+                with open(path, "ab") as f:
+                    f.truncate(capacity * dim * 4)
+            self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        return self._vectors
+
+    def _sync(self):
+        """Apply the rows other workers (or this one) wrote since the last sync."""
+        self.conn.execute("BEGIN")
+        try:
+            rows = self.conn.execute(
+                "SELECT slot, seq, partition, expires FROM entries WHERE seq > ? ORDER BY seq", (self._seen,)
+            ).fetchall()
+            dim = self._meta("dim") if rows else self._dim
+            if rows and dim != self._dim:
+                # Store was cleared for a new embedding size
+                self._dim = dim
+                self._versions.clear()
+                self.partitions.clear()
+            added = [row for row in rows if row[2] is not None]
+            vectors = self._map(dim, max(slot for slot, _, _, _ in added) + 1)[[row[0] for row in added]] if added else None
+        finally:
+            self.conn.execute("COMMIT")
+        if not rows:
+            return
+
+        stale: Dict[str, List[str]] = {}
+        for slot, seq, partition, _ in rows:
+            previous = self._versions.pop(slot, None)
+            if previous is not None:
+                stale.setdefault(previous[1], []).append(f"{slot}:{previous[0]}")
+            if partition is not None:
+                self._versions[slot] = (seq, partition)
+        for partition, keys in stale.items():
+            if partition in self.partitions:
+                self.partitions[partition].discard(keys)
+
+        for (slot, seq, partition, expires), vector in zip(added, vectors if added else []):
+            entries = self.partitions.get(partition)
+            if entries is None:
+                entries = self.partitions[partition] = CachePartition(dim, self.exact_threshold, self.nprobe)
+            entries.insert(np.asarray(vector), f"{slot}:{seq}", expires, 0.0)
+        for partition in [partition for partition, entries in self.partitions.items() if not entries.count]:
+            del self.partitions[partition]
+        self._seen = rows[-1][1]
+
+    def lookup(self, partition: str, vector: np.ndarray, threshold: float, now: float) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            self._sync()
+            entries = self.partitions.get(partition)
+            if entries is None or entries.dim != len(vector):
+                return None
+            found = entries.lookup(vector, threshold, now)
+            if found is None:
+                return None
+            slot, seq = (int(part) for part in found[0].split(":"))
+            row = self.conn.execute("SELECT answer, expires FROM entries WHERE slot = ? AND seq = ?", (slot, seq)).fetchone()
+            if row is None:
+                return None  # Evicted by another worker since the sync
+
+            hit = self._pending_hits.setdefault((slot, seq), [0, now])
+            hit[0] += 1
+            hit[1] = now
+            if len(self._pending_hits) >= self._HIT_FLUSH:
+                self._write(self._flush_hits)
+            return row[0], row[1]
+
+    def insert(self, partition: str, vector: np.ndarray, answer: str, expires: float, now: float):
+        with self._lock:
+            self._write(lambda: self._insert(partition, vector, answer, expires, now))
+
+    def _write(self, fn):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            fn()
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _insert(self, partition: str, vector: np.ndarray, answer: str, expires: float, now: float):
+        self._flush_hits()
+        dim = self._meta("dim")
+        if dim != len(vector):
+            if dim:
+                # A changed embedding size makes the old entries unusable
+                print(f"Semantic cache: embedding size changed from {dim} to {len(vector)}, clearing {self.path}")
+                self.conn.execute(
+                    "UPDATE entries SET partition = NULL, answer = NULL, seq = ? WHERE partition IS NOT NULL",
+                    (self._next_seq(),)
+                )
+                # Unlinking is safe while other workers still map the file
+                self._vector_path(dim).unlink(missing_ok=True)
+            dim = len(vector)
+            self._set_meta("dim", dim)
+            self._set_meta("entries", 0)
+
+        count = self._meta("entries")
+        if count >= self.max_entries:
+            count -= self._evict(now, count)
+
+        free = self.conn.execute("SELECT slot FROM entries WHERE partition IS NULL LIMIT 1").fetchone()
+        slot = free[0] if free else self.conn.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()[0]
+        vectors = self._map(dim, slot + 1)
+        vectors[slot] = vector
+        vectors.flush()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (slot, seq, partition, answer, expires, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (slot, self._next_seq(), partition, answer, expires, now)
+        )
+        self._set_meta("entries", count + 1)
+
+    def _evict(self, now: float, count: int) -> int:
+        """Free expired, then least recently/frequently used slots; returns how many were freed."""
+        seq = self._next_seq()
+        freed = self.conn.execute(
+            "UPDATE entries SET partition = NULL, answer = NULL, seq = ? WHERE partition IS NOT NULL AND expires <= ?",
+            (seq, now)
+        ).rowcount
+        overflow = count - freed - self.max_entries + 1
+        if overflow > 0:
+            order = "hits, last_used" if self.eviction == "lfu" else "last_used"
+            freed += self.conn.execute(
+                "UPDATE entries SET partition = NULL, answer = NULL, seq = ? WHERE slot IN "
+                f"(SELECT slot FROM entries WHERE partition IS NOT NULL ORDER BY {order} LIMIT ?)",
+                (seq, max(overflow, int(self.max_entries * self._EVICT_FRACTION)))
+            ).rowcount
+        self.evictions += freed
+        return freed
+
+    def _flush_hits(self):
+        if self._pending_hits:
+            self.conn.executemany(
+                "UPDATE entries SET hits = hits + ?, last_used = MAX(last_used, ?) WHERE slot = ? AND seq = ?",
+                [(hits, last_used, slot, seq) for (slot, seq), (hits, last_used) in self._pending_hits.items()]
+            )
+            self._pending_hits.clear()
+
+    def __len__(self) -> int:
+        return self._meta("entries")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "backend": "shared",
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "partitions": len(self.partitions),
+            "evictions": self.evictions,
+        }
+
+
+def create_cache_backend() -> CacheBackend:
+    """CacheBackend for SEMANTIC_CACHE_BACKEND: 'shared' (all workers on the host, kept across restarts) or 'memory'."""
+    options = dict(
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        eviction=settings.SEMANTIC_CACHE_EVICTION,
+        exact_threshold=settings.SEMANTIC_CACHE_EXACT_THRESHOLD,
+        nprobe=settings.SEMANTIC_CACHE_NPROBE
+    )
+    if settings.SEMANTIC_CACHE_BACKEND == "shared":
+        return SharedCacheBackend(settings.SEMANTIC_CACHE_PATH, **options)
+    if settings.SEMANTIC_CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(**options)
+    raise ValueError(f"Unknown semantic cache backend: {settings.SEMANTIC_CACHE_BACKEND}")
@@ -1,35 +1,161 @@
-from typing import Optional
-from src.ingestion.embeddings import EmbeddingGenerator
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
 import numpy as np
+from src.config import settings
+from src.ingestion.embeddings import EmbeddingGenerator
+from src.orchestration.cache_backends import CacheBackend, create_cache_backend
+
+
+class ExactMatchCache:
+    """
+    In-memory LRU of answers keyed by a hash of the normalized query text and
+    the ACL partition, so a repeated question is answered without any network
+    call (not even the query embedding).
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 86_400.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, partition: str) -> str:
+        # Case and whitespace differences don't change the question
+        normalized = " ".join(query.casefold().split())
+        return hashlib.sha256(f"{partition}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, answer: str, expires: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (answer, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
 
 class SemanticCache:
-    def __init__(self, threshold: float = 0.9):
-        # Naive in-memory cache: List of (embedding, answer)
-        # In prod: Redis or dedicated vector store
-        self.cache = [] 
-        self.threshold = threshold
+    """
+    Answers of earlier queries, served again for queries whose embeddings are
+    at least ``threshold`` cosine-similar.
+
+    Entries are partitioned by the asking user's set of access groups, so an
+    answer built from documents one set of groups may see is only served to
+    users with exactly those groups. Entries expire after ``ttl_seconds``.
+    Only the leading ``dimensions`` of each (Matryoshka) embedding are kept,
+    re-normalized. Storage, capacity and eviction belong to the backend (see
+    SEMANTIC_CACHE_BACKEND).
+
+    An ExactMatchCache tier in front answers repeats of the same normalized
+    question before the query is embedded; semantic hits are promoted into it.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        dimensions: Optional[int] = None,
+        backend: Optional[CacheBackend] = None,
+        exact: Optional[ExactMatchCache] = None,
+    ):
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.SEMANTIC_CACHE_TTL
+        self.dimensions = dimensions if dimensions is not None else settings.SEMANTIC_CACHE_DIMENSIONS
+        self.backend = backend if backend is not None else create_cache_backend()
+        self.exact = exact if exact is not None else ExactMatchCache(settings.EXACT_CACHE_MAX_ENTRIES, self.ttl_seconds)
         self.embedding_gen = EmbeddingGenerator()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def partition_key(groups: Optional[Iterable[str]]) -> str:
+        return json.dumps(sorted(set(groups or ())))
+
+    def _cache_vector(self, embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self.dimensions:
+            vector = vector[:self.dimensions]
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
 
-    async def get(self, query: str) -> Optional[str]:
-        if not self.cache:
+    async def get(self, query: str, groups: Optional[List[str]] = None) -> Optional[str]:
+        partition = self.partition_key(groups)
+        exact_key = self.exact.make_key(query, partition)
+        now = time.time()
+        answer = self.exact.get(exact_key, now)
+        if answer is not None:
+            return answer
+
+        vector = self._cache_vector(await self.embedding_gen.embed_query(query))
+        # Shared backends may touch disk
+        found = await asyncio.to_thread(self.backend.lookup, partition, vector, self.threshold, now)
+        if found is None:
+            self.misses += 1
             return None
-            
-        query_embedding = (await self.embedding_gen.generate([query]))[0]
-        
-        best_score = -1
-        best_answer = None
-        
-        for cached_emb, answer in self.cache:
-            # Cosine similarity
-            score = np.dot(query_embedding, cached_emb) / (np.linalg.norm(query_embedding) * np.linalg.norm(cached_emb))
-            if score > best_score:
-                best_score = score
-                best_answer = answer
-                
-        if best_score >= self.threshold:
-            return best_answer
-        return None
-
-    async def set(self, query: str, answer: str):
-        query_embedding = (await self.embedding_gen.generate([query]))[0]
-        self.cache.append((query_embedding, answer))
+        self.hits += 1
+        answer, expires = found
+        # Promoted for the entry's remaining lifetime, not a fresh TTL
+        self.exact.put(exact_key, answer, expires)
+        return answer
+
+    async def set(self, query: str, answer: str, groups: Optional[List[str]] = None):
+        partition = self.partition_key(groups)
+        now = time.time()
+        self.exact.put(self.exact.make_key(query, partition), answer, now + self.ttl_seconds)
+        if self.backend.max_entries <= 0:
+            return
+        vector = self._cache_vector(await self.embedding_gen.embed_query(query))
+        await asyncio.to_thread(self.backend.insert, partition, vector, answer, now + self.ttl_seconds, now)
+
+    @property
+    def size(self) -> int:
+        return len(self.backend)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tier counters; the semantic tier only sees the exact tier's misses."""
+        exact_hits = self.exact.hits
+        lookups = exact_hits + self.hits + self.misses
+        semantic_lookups = self.hits + self.misses
+        return {
+            "overall": {
+                "hits": exact_hits + self.hits,
+                "misses": self.misses,
+                "hit_rate": (exact_hits + self.hits) / lookups if lookups else 0.0,
+            },
+            "exact": self.exact.stats(),
+            "semantic": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / semantic_lookups if semantic_lookups else 0.0,
+                **self.backend.stats(),
+            },
+        }
@@ -1,8 +1,11 @@
 from openai import AsyncAzureOpenAI
 from src.config import settings
-from typing import List, Dict, Any
+from typing import AsyncIterator, Dict, List, Optional
 from src.orchestration.cost import cost_tracker
 
+MOCK_ANSWER = "This is a MOCK response. The system is working, but your Azure OpenAI API Key is invalid in .env."
+AUTH_FAILED_ANSWER = "MOCK RESPONSE: Authentication failed with Azure OpenAI. Please check your API Key."
+
 class LLMClient:
     def __init__(self):
         self.client = AsyncAzureOpenAI(
@@ -13,32 +16,100 @@ class LLMClient:
         self.deployment = settings.AZURE_OPENAI_GPT4O_MINI_DEPLOYMENT
         self.cost_tracker = cost_tracker
 
+    def _uses_mock_key(self) -> bool:
+        return self.client.api_key.startswith("REPL") or self.client.api_key == "REPLACE_WITH_KEY"
+
+    def _track_usage(self, usage, user_id: Optional[str]):
+        if self.cost_tracker and usage is not None:
+            self.cost_tracker.track_request(
+                model=self.deployment,
+                input_tokens=usage.prompt_tokens,
+                output_tokens=usage.completion_tokens,
+                user_id=user_id
+            )
+
     async def generate_completion(self, messages: list, user_id: str = None) -> str:
         # Check for invalid key prefix
-        if self.client.api_key.startswith("REPL") or self.client.api_key == "REPLACE_WITH_KEY":
-            return "This is a MOCK response. The system is working, but your Azure OpenAI API Key is invalid in .env."
+        if self._uses_mock_key():
+            return MOCK_ANSWER
 
         try:
             response = await self.client.chat.completions.create(
                 model=self.deployment,
                 messages=messages
             )
-            
+
             # Extract answer
             answer = response.choices[0].message.content
-            
+
             # Track cost
-            if self.cost_tracker:
-                self.cost_tracker.track_request(
-                    model=self.deployment,
-                    input_tokens=response.usage.prompt_tokens,
-                    output_tokens=response.usage.completion_tokens,
-                    user_id=user_id
-                )
-                
+            self._track_usage(response.usage, user_id)
+
             return answer
         except Exception as e:
             print(f"LLM Error: {e}")
             if "401" in str(e) or "Access Denied" in str(e):
-                return "MOCK RESPONSE: Authentication failed with Azure OpenAI. Please check your API Key."
+                return AUTH_FAILED_ANSWER
+            raise e
+
+    def stream_completion(self, messages: list, user_id: str = None) -> "CompletionStream":
+        """Stream the answer as text deltas (see CompletionStream); nothing is sent until it is iterated."""
+        return CompletionStream(self, messages, user_id)
+
+
+class CompletionStream:
+    """
+    Text deltas of one streamed chat completion, in arrival order.
+
+    Once iteration finishes, ``text`` is the whole answer and ``usage`` holds
+    the token counts from the final chunk, from which the cost is tracked.
+    """
+
+    def __init__(self, llm: LLMClient, messages: list, user_id: Optional[str] = None):
+        self.llm = llm
+        self.messages = messages
+        self.user_id = user_id
+        self.usage: Optional[Dict[str, int]] = None
+        self._parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        async for delta in self._deltas():
+            self._parts.append(delta)
+            yield delta
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        llm = self.llm
+        if llm._uses_mock_key():
+            yield MOCK_ANSWER
+            return
+
+        try:
+            stream = await llm.client.chat.completions.create(
+                model=llm.deployment,
+                messages=self.messages,
+                stream=True,
+                # Token counts arrive in one last chunk without choices
+                stream_options={"include_usage": True}
+            )
+        except Exception as e:
+            print(f"LLM Error: {e}")
+            if "401" in str(e) or "Access Denied" in str(e):
+                yield AUTH_FAILED_ANSWER
+                return
             raise e
+
+        async for chunk in stream:
+            # Azure sends content-filter results as chunks without choices or content
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage is not None:
+                self.usage = {
+                    "prompt_tokens": chunk.usage.prompt_tokens,
+                    "completion_tokens": chunk.usage.completion_tokens,
+                    "total_tokens": chunk.usage.total_tokens
+                }
+                llm._track_usage(chunk.usage, self.user_id)
@@ -1,11 +1,14 @@
 from jinja2 import Template
-from typing import Dict, Any
-from src.retrieval.service import RetrievalService
-from src.orchestration.llm import LLMClient
+from typing import Any, AsyncIterator, Dict, List
+import numpy as np
+from src.retrieval.service import RetrievalService, RetrievalTimings
+from src.orchestration.llm import CompletionStream, LLMClient
 from src.orchestration.prompts import SYSTEM_PROMPT, USER_PROMPT
 from src.orchestration.caching import SemanticCache
+from src.ingestion.query_embeddings import query_embedding_scope
 
 from src.auth.models import User
+from src.types import SearchResult
 
 class RAGOrchestrator:
     def __init__(self):
@@ -14,37 +17,90 @@ class RAGOrchestrator:
         self.cache = SemanticCache()
 
     async def query(self, user_query: str, user: User) -> Dict[str, Any]:
+        # Cache lookup, retrieval and cache write share one embedding of the query
+        with query_embedding_scope():
+            return await self._query(user_query, user)
+
+    async def _query(self, user_query: str, user: User) -> Dict[str, Any]:
         # 1. Check Cache
-        cached_answer = await self.cache.get(user_query)
+        cached_answer = await self.cache.get(user_query, user.groups)
         if cached_answer:
             return {
                 "answer": cached_answer,
                 "source": "cache",
-                "retrieved_docs": []
+                "retrieved_docs": [],
+                "retrieval_timings": None
             }
 
         # 2. Retrieve
-        results = await self.retriever.search(user_query, user, limit=5)
+        timings = RetrievalTimings()
+        results = await self.retriever.search(user_query, user, limit=5, timings=timings)
         
         # 3. Assemble Context
-        context_text = "\n\n".join([f"Source ({r.chunk.metadata.get('source', 'unknown')}): {r.chunk.content}" for r in results])
-        
-        system_message = Template(SYSTEM_PROMPT).render(context=context_text)
-        user_message = Template(USER_PROMPT).render(question=user_query)
-        
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ]
+        messages = self._build_messages(user_query, results)
 
         # 4. Generate
         answer = await self.llm.generate_completion(messages)
         
         # 5. Cache (in background ideally)
-        await self.cache.set(user_query, answer)
+        await self.cache.set(user_query, answer, user.groups)
 
         return {
             "answer": answer,
             "source": "llm",
-            "retrieved_docs": [r.dict() for r in results]
+            "retrieved_docs": results,  # SearchResult records; converted at the API boundary
+            "retrieval_timings": timings
+        }
+
+    async def query_stream(self, user_query: str, user: User) -> Dict[str, Any]:
+        """
+        Like query, but "answer" is an async iterator of text deltas and "completion"
+        the CompletionStream behind it (None for cache hits). Cache lookup and
+        retrieval are done on return; the answer is cached once it is fully streamed.
+        """
+        with query_embedding_scope() as embeddings:
+            cached_answer = await self.cache.get(user_query, user.groups)
+            if cached_answer:
+                return {
+                    "answer": self._replay(cached_answer),
+                    "completion": None,
+                    "source": "cache",
+                    "retrieved_docs": [],
+                    "retrieval_timings": None
+                }
+
+            timings = RetrievalTimings()
+            results = await self.retriever.search(user_query, user, limit=5, timings=timings)
+
+        completion = self.llm.stream_completion(self._build_messages(user_query, results), user_id=user.id)
+        return {
+            "answer": self._stream_and_cache(completion, user_query, user, embeddings),
+            "completion": completion,
+            "source": "llm",
+            "retrieved_docs": results,
+            "retrieval_timings": timings
         }
+
+    @staticmethod
+    async def _replay(answer: str) -> AsyncIterator[str]:
+        yield answer
+
+    async def _stream_and_cache(self, completion: CompletionStream, user_query: str, user: User, embeddings: Dict[str, np.ndarray]) -> AsyncIterator[str]:
+        async for delta in completion:
+            yield delta
+        # Not reached if the client disconnects mid-answer, so partial answers are never cached.
+        # Back in the request's scope, the write reuses the lookup's query embedding
+        with query_embedding_scope(embeddings):
+            await self.cache.set(user_query, completion.text, user.groups)
+
+    @staticmethod
+    def _build_messages(user_query: str, results: List[SearchResult]) -> List[Dict[str, str]]:
+        context_text = "\n\n".join([f"Source ({r.chunk.metadata.get('source', 'unknown')}): {r.chunk.content}" for r in results])
+
+        system_message = Template(SYSTEM_PROMPT).render(context=context_text)
+        user_message = Template(USER_PROMPT).render(question=user_query)
+
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
@@ -0,0 +1,483 @@
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.retrieval.dir_lock import DirectoryLock
+
+
+@dataclass(slots=True)
+class VectorEntry:
+    key: str
+    vector: np.ndarray
+    payload: str
+    source: Optional[str] = None
+    document_id: Optional[str] = None
+    group: Optional[str] = None  # Access group; None or "" means public
+
+
+class IVFIndex:
+    """
+    Persistent IVF (inverted file) index for cosine similarity search.
+
+    Layout under ``path``:
+      - ``store.sqlite``: one row per vector (key, source, access group and the
+        caller's payload), written on every add/delete.
+      - ``vectors.f32``: memory-mapped float32 matrix of unit-normalized
+        vectors, one row per doc id. Rows are synced before their store row
+        is committed, so every stored document has its vector on disk.
+      - ``centroids.npy`` / ``assignments.npy`` / ``manifest.json``: the coarse
+        quantizer and the list of every row as of the last flush. Rows added
+        later are re-assigned on open.
+
+    Below ``exact_threshold`` live vectors, search is an exact scan of the
+    matrix. Past it, k-means centroids (``nlist``, by default about sqrt(N))
+    are trained and a query only scores the rows of its ``nprobe`` nearest
+    lists. The quantizer is retrained whenever the index has grown 4x since
+    the last training. Deletes are tombstones; their rows are skipped, not
+    reclaimed.
+
+    Searches restricted to access groups mask candidates before top-k
+    selection, and probe more lists when too few visible rows were found, so
+    callers get a full top k of documents they may see.
+
+    The index is single-process: the quantizer and list assignments live in
+    memory until flush, so opening a directory that another process (or
+    another instance) holds raises IndexLockedError (see DirectoryLock).
+    """
+
+    _QUERY_BATCH = 500
+    _SCORE_ROWS = 8192  # Rows scored per matmul, bounds the temporary copy
+    _TRAIN_ITERATIONS = 10
+    _TRAIN_SAMPLES_PER_LIST = 64
+    _TRAIN_MAX_SAMPLES = 25_000
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dim: int = 3072,
+        nlist: int = 0,
+        nprobe: int = 16,
+        exact_threshold: int = 20_000,
+        seed: int = 0,
+    ):
+        self.path = Path(path or tempfile.mkdtemp(prefix="vector-index-"))
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._dir_lock = DirectoryLock(self.path)
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+
+        self.conn = sqlite3.connect(self.path / "store.sqlite", check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS groups (name TEXT PRIMARY KEY, group_id INTEGER NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "doc_id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, source TEXT, document_id TEXT, "
+            "group_id INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_document_id ON docs(document_id)")
+        self.conn.commit()
+        self._group_ids: Dict[str, int] = dict(self.conn.execute("SELECT name, group_id FROM groups").fetchall())
+
+        self._load()
+
+    # --- Loading / persistence ---
+
+    def _load(self):
+        manifest_path = self.path / "manifest.json"
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        if manifest.get("dim", self.dim) != self.dim:
+            raise ValueError(f"Index at {self.path} holds {manifest['dim']}-dim vectors, not {self.dim}")
+
+        size = self.conn.execute("SELECT COALESCE(MAX(doc_id) + 1, 0) FROM docs").fetchone()[0]
+        self._vectors: Optional[np.memmap] = None
+        self._size = 0
+        self._live = np.zeros(0, dtype=bool)
+        self._groups = np.zeros(0, dtype=np.int32)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._group_masks: Dict[int, np.ndarray] = {}
+        self._visible_cache: Dict[frozenset, np.ndarray] = {}
+        self._grow(size)
+
+        # Live rows and their groups come straight from the store
+        for doc_id, group_id in self.conn.execute("SELECT doc_id, group_id FROM docs"):
+            self._live[doc_id] = True
+            self._groups[doc_id] = group_id
+        self._group_masks = {int(group_id): self._groups == group_id for group_id in np.unique(self._groups)}
+        self._live_count = int(self._live.sum())
+
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = manifest.get("trained_size", 0)
+        self._lists_dirty = True
+        if manifest.get("trained_size"):
+            self._centroids = np.load(self.path / "centroids.npy")
+            assigned = np.load(self.path / "assignments.npy")
+            count = min(len(assigned), size)
+            self._assignments[:count] = assigned[:count]
+            # Rows written after the last flush
+            self._assign(count, size)
+
+    def flush(self):
+        """Persist the quantizer and list assignments (vectors and rows are already durable)."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._centroids is not None:
+                self._save_array("centroids.npy", self._centroids)
+                self._save_array("assignments.npy", self._assignments)
+            tmp_path = self.path / "manifest.json.tmp"
+            tmp_path.write_text(json.dumps({"dim": self.dim, "trained_size": self._trained_size}))
+            os.replace(tmp_path, self.path / "manifest.json")
+
+    def close(self):
+        """Release the directory (without flushing), so another instance may open it."""
+        with self._lock:
+            self.conn.close()
+            self._dir_lock.release()
+
+    def _save_array(self, name: str, values: np.ndarray):
+        tmp_path = self.path / f"{name}.tmp.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, self.path / name)
+
+    def _grow(self, size: int):
+        if size <= self._size:
+            return
+        vectors_path = self.path / "vectors.f32"
+        if self._vectors is not None:
+            capacity = len(self._vectors)
+        else:
+            capacity = vectors_path.stat().st_size // (self.dim * 4) if vectors_path.exists() else 0
+        if size > capacity or self._vectors is None:
+            capacity = max(size, 2 * capacity, 1024) if size > capacity else capacity
+            if self._vectors is not None:
+                self._vectors.flush()
+            with open(vectors_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+            self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+        def grown(values: np.ndarray, fill) -> np.ndarray:
+            # Arrays are views of capacity-sized buffers; only reallocate when full
+            base = values.base if values.base is not None else values
+            if len(base) >= size:
+                return base[:size]
+            buffer = np.full(capacity, fill, dtype=values.dtype)
+            buffer[:len(values)] = values
+            return buffer[:size]
+
+        self._live = grown(self._live, False)
+        self._groups = grown(self._groups, -1)
+        self._assignments = grown(self._assignments, -1)
+        self._group_masks = {group_id: grown(mask, False) for group_id, mask in self._group_masks.items()}
+        self._visible_cache.clear()
+        self._size = size
+
+    # --- Updates ---
+
+    def add(self, entries: List[VectorEntry]):
+        if not entries:
+            return
+        with self._lock:
+            # Re-adding a key replaces it
+            self._delete_rows("key", [entry.key for entry in entries])
+
+            vectors = np.stack([np.asarray(entry.vector, dtype=np.float32) for entry in entries])
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+            group_ids = [self._resolve_group(entry.group) for entry in entries]
+
+            start = self._size
+            end = start + len(entries)
+            self._grow(end)
+            self._vectors[start:end] = _normalize(vectors)
+            self._vectors.flush()
+
+            self.conn.executemany(
+                "INSERT INTO docs (doc_id, key, source, document_id, group_id, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (doc_id, entry.key, entry.source, entry.document_id, group_id, entry.payload)
+                    for doc_id, entry, group_id in zip(range(start, end), entries, group_ids)
+                ]
+            )
+            self.conn.commit()
+
+            self._live[start:end] = True
+            self._groups[start:end] = group_ids
+            for group_id in set(group_ids):
+                if group_id not in self._group_masks:
+                    self._group_masks[group_id] = np.zeros(len(self._groups), dtype=bool)
+                self._group_masks[group_id][start:end] = self._groups[start:end] == group_id
+            self._live_count += len(entries)
+            self._visible_cache.clear()
+
+            if self._centroids is not None:
+                self._assign(start, end)
+            self._maybe_train()
+
+    def delete_by_source(self, sources: Iterable[str], keep: Iterable[str] = ()) -> List[str]:
+        """Delete every vector with one of these sources, except the keys in ``keep``; returns their payloads."""
+        keep = set(keep)
+        if not keep:
+            return self._delete_and_commit("source", list(sources))
+        sources = list(sources)
+        with self._lock:
+            keys = []
+            for i in range(0, len(sources), self._QUERY_BATCH):
+                batch = sources[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                keys.extend(
+                    key for (key,) in self.conn.execute(f"SELECT key FROM docs WHERE source IN ({placeholders})", batch)
+                    if key not in keep
+                )
+            return self._delete_and_commit("key", keys)
+
+    def delete_by_document(self, document_ids: Iterable[str]) -> List[str]:
+        return self._delete_and_commit("document_id", list(document_ids))
+
+    def delete_by_key(self, keys: Iterable[str]) -> List[str]:
+        return self._delete_and_commit("key", list(keys))
+
+    def has_sources(self, sources: Iterable[str]) -> bool:
+        """Whether any document of these sources is stored."""
+        sources = list(sources)
+        with self._lock:
+            for i in range(0, len(sources), self._QUERY_BATCH):
+                batch = sources[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                if self.conn.execute(f"SELECT 1 FROM docs WHERE source IN ({placeholders}) LIMIT 1", batch).fetchone():
+                    return True
+        return False
+
+    def update_payloads(self, keys: Iterable[str], update: Callable[[str, str], str]) -> Dict[str, str]:
+        """
+        Replace the payload of each stored key with ``update(key, payload)``;
+        returns the new payloads.
+        """
+        keys = list(keys)
+        updated: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._QUERY_BATCH):
+                batch = keys[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for key, payload in self.conn.execute(
+                    f"SELECT key, payload FROM docs WHERE key IN ({placeholders})", batch
+                ).fetchall():
+                    updated[key] = update(key, payload)
+            self.conn.executemany("UPDATE docs SET payload = ? WHERE key = ?", [(payload, key) for key, payload in updated.items()])
+            self.conn.commit()
+        return updated
+
+    def _delete_and_commit(self, column: str, values: List[str]) -> List[str]:
+        with self._lock:
+            payloads = self._delete_rows(column, values)
+            if payloads:
+                self.conn.commit()
+            return payloads
+
+    def _delete_rows(self, column: str, values: List[str]) -> List[str]:
+        payloads = []
+        for i in range(0, len(values), self._QUERY_BATCH):
+            batch = values[i:i + self._QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT doc_id, payload FROM docs WHERE {column} IN ({placeholders})", batch
+            ).fetchall()
+            if not rows:
+                continue
+            doc_ids = [doc_id for doc_id, _ in rows]
+            self._live_count -= len(doc_ids)
+            self._live[doc_ids] = False
+            self._visible_cache.clear()
+            payloads.extend(payload for _, payload in rows)
+            self.conn.execute(f"DELETE FROM docs WHERE {column} IN ({placeholders})", batch)
+        return payloads
+
+    def _resolve_group(self, group: Optional[str]) -> int:
+        if not group:
+            return -1
+        group_id = self._group_ids.get(group)
+        if group_id is None:
+            group_id = self._group_ids[group] = len(self._group_ids)
+            self.conn.execute("INSERT INTO groups (name, group_id) VALUES (?, ?)", (group, group_id))
+        return group_id
+
+    # --- Quantizer ---
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _maybe_train(self):
+        if self._live_count < self.exact_threshold:
+            return
+        if self._centroids is None or self._live_count >= 4 * self._trained_size:
+            self.train()
+
+    def train(self, nlist: Optional[int] = None):
+        """(Re)train the centroids with spherical k-means on a sample of live rows and re-assign every row."""
+        with self._lock:
+            live = np.flatnonzero(self._live)
+            if not len(live):
+                return
+            nlist = min(nlist or self.nlist or max(16, int(math.sqrt(len(live)))), len(live))
+            print(f"Training vector index: {nlist} lists over {len(live)} vectors...")
+            sample_size = min(len(live), nlist * self._TRAIN_SAMPLES_PER_LIST, max(self._TRAIN_MAX_SAMPLES, nlist))
+            sample = np.asarray(self._vectors[np.sort(self._rng.choice(live, sample_size, replace=False))])
+
+            self._centroids = spherical_kmeans(sample, nlist, self._TRAIN_ITERATIONS, self._rng)
+            self._trained_size = len(live)
+            self._assign(0, self._size)
+            self.flush()
+
+    def _assign(self, start: int, end: int):
+        if self._centroids is None:
+            return
+        for lo in range(start, end, self._SCORE_ROWS):
+            hi = min(lo + self._SCORE_ROWS, end)
+            self._assignments[lo:hi] = _nearest(np.asarray(self._vectors[lo:hi]), self._centroids)
+        self._lists_dirty = True
+
+    def _lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """CSR view of the inverted lists: (offsets, row ids sorted by list)."""
+        if self._lists_dirty:
+            rows = np.argsort(self._assignments, kind="stable").astype(np.int32)
+            counts = np.bincount(self._assignments, minlength=len(self._centroids))
+            self._list_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=self._list_offsets[1:])
+            self._list_rows = rows
+            self._lists_dirty = False
+        return self._list_offsets, self._list_rows
+
+    # --- Search ---
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def search(
+        self, vector: np.ndarray, limit: int = 10, groups: Optional[Iterable[str]] = None, exact: bool = False, nprobe: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Cosine top-k as (doc_id, score), best first. ``exact`` scans every row
+        instead of probing lists. With ``groups``, only public rows and those of
+        the given access groups are returned.
+        """
+        with self._lock:
+            if not self._live_count or limit <= 0:
+                return []
+            query = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+            visible = self._visible(groups)
+            if exact or self._centroids is None:
+                return self._scan(query, limit, visible)
+            return self._probe(query, limit, visible, nprobe or self.nprobe)
+
+    def _visible(self, groups: Optional[Iterable[str]]) -> np.ndarray:
+        if groups is None:
+            return self._live
+        key = frozenset(self._group_ids[group] for group in groups if group in self._group_ids)
+        visible = self._visible_cache.get(key)
+        if visible is None:
+            visible = np.zeros(self._size, dtype=bool)
+            for group_id in key | {-1}:
+                if group_id in self._group_masks:
+                    visible |= self._group_masks[group_id]
+            visible &= self._live
+            if len(self._visible_cache) >= 64:
+                self._visible_cache.clear()
+            visible = self._visible_cache[key] = visible
+        return visible
+
+    def _scan(self, query: np.ndarray, limit: int, visible: np.ndarray) -> List[Tuple[int, float]]:
+        scores = np.full(self._size, -np.inf, dtype=np.float32)
+        for lo in range(0, self._size, self._SCORE_ROWS):
+            hi = min(lo + self._SCORE_ROWS, self._size)
+            if visible[lo:hi].any():
+                scores[lo:hi] = self._vectors[lo:hi] @ query
+        scores[~visible] = -np.inf
+        return _top_k(np.arange(self._size), scores, limit)
+
+    def _probe(self, query: np.ndarray, limit: int, visible: np.ndarray, nprobe: int) -> List[Tuple[int, float]]:
+        offsets, rows = self._lists()
+        order = np.argsort(-(self._centroids @ query))
+        probed = 0
+        candidates = []
+        found = 0
+        # Widen the probe until enough visible rows were found (filtered searches)
+        while probed < len(order):
+            lists = order[probed:probed + max(nprobe - probed, 1)]
+            probed += len(lists)
+            for list_id in lists:
+                members = rows[offsets[list_id]:offsets[list_id + 1]]
+                members = members[visible[members]]
+                candidates.append(members)
+                found += len(members)
+            if found >= limit:
+                break
+            nprobe *= 2
+        if not found:
+            return []
+        candidates = np.sort(np.concatenate(candidates))  # Sequential reads from the memmap
+        scores = np.empty(len(candidates), dtype=np.float32)
+        for lo in range(0, len(candidates), self._SCORE_ROWS):
+            batch = candidates[lo:lo + self._SCORE_ROWS]
+            scores[lo:lo + len(batch)] = self._vectors[batch] @ query
+        return _top_k(candidates, scores, limit)
+
+    def fetch(self, doc_ids: List[int]) -> Dict[int, str]:
+        """Payloads by doc id, in the given order. Ids deleted since they were found are missing."""
+        with self._lock:
+            found: Dict[int, str] = {}
+            for i in range(0, len(doc_ids), self._QUERY_BATCH):
+                batch = doc_ids[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self.conn.execute(
+                    f"SELECT doc_id, payload FROM docs WHERE doc_id IN ({placeholders})", batch
+                ).fetchall())
+            return {doc_id: found[doc_id] for doc_id in doc_ids if doc_id in found}
+
+
+def spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit-norm centroids of ``nlist`` clusters of the unit-normalized rows of ``sample``."""
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        nonempty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(
+            sample[np.argsort(labels, kind="stable")], (np.cumsum(counts) - counts)[nonempty], axis=0
+        )
+        # Re-seed empty lists with random sample points
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+    valid = np.isfinite(scores)
+    if not valid.all():
+        ids, scores = ids[valid], scores[valid]
+    if len(scores) > limit:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        ids, scores = ids[top], scores[top]
+    order = np.argsort(-scores, kind="stable")
+    return [(int(ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesces items submitted by concurrent requests into batched calls of ``fn``.
+
+    The first waiting request opens a window of ``max_wait_ms``; everything that
+    arrives before it closes (or until ``max_batch_size`` items are queued) runs
+    as one call on a dedicated worker thread, and each request gets back the
+    results for its own items. While a batch is running, new requests queue up
+    and form the next one, so batches grow with load instead of requests
+    serializing one by one.
+    """
+
+    def __init__(self, fn: Callable[[List[T]], Sequence[R]], max_batch_size: int = 64, max_wait_ms: float = 5.0, name: str = "batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, items: List[T]) -> List[R]:
+        if not items:
+            return []
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((items, future))
+        return await future
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # (Re)bind to the running loop, e.g. after a test created a new one
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        if self._executor is None:
+            # One thread: the model is not re-entrant and batches are the unit of parallelism
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+
+    async def _run(self):
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = self._loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(request)
+                size += len(request[0])
+            await self._execute(pending)
+
+    async def _execute(self, pending: List[Tuple[List[T], asyncio.Future]]):
+        # Requests cancelled while queued (e.g. a retrieval deadline) are dropped
+        pending = [(items, future) for items, future in pending if not future.done()]
+        if not pending:
+            return
+        batch = [item for items, _ in pending for item in items]
+        try:
+            results = await self._loop.run_in_executor(self._executor, self.fn, batch)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        offset = 0
+        for items, future in pending:
+            if not future.done():
+                future.set_result(list(results[offset:offset + len(items)]))
+            offset += len(items)
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class ChunkTextStore:
+    """zlib-compressed chunk texts in SQLite, keyed by chunk id.
+
+    Lets the vector index keep only ids, vectors and small metadata, with
+    content fetched in one bulk read for the candidates that survive
+    filtering. Source and document id are stored so deletes can follow the
+    vector index.
+    """
+
+    # Stay well under SQLite's bound-parameter limit
+    _QUERY_BATCH = 500
+
+    def __init__(self, path: str, level: int = 6):
+        self.path = path
+        self.level = level
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "chunk_id TEXT PRIMARY KEY, source TEXT, document_id TEXT, content BLOB NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id)")
+        self.conn.commit()
+
+    def put_many(self, items: Iterable[Tuple[str, Optional[str], Optional[str], str]]):
+        """Store (chunk_id, source, document_id, content) rows, replacing existing ids."""
+        rows = [
+            (chunk_id, source, document_id, zlib.compress(content.encode("utf-8"), self.level))
+            for chunk_id, source, document_id, content in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, source, document_id, content) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+    def get_many(self, chunk_ids: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(chunk_ids), self._QUERY_BATCH):
+                batch = chunk_ids[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_id, blob in self.conn.execute(
+                    f"SELECT chunk_id, content FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ):
+                    found[chunk_id] = zlib.decompress(blob).decode("utf-8")
+        return found
+
+    def delete_matching(self, column: str, values: List[str], keep: Iterable[str] = ()):
+        """Delete rows whose ``column`` (source or document_id) is one of ``values``, except the chunk ids in ``keep``."""
+        if column not in ("source", "document_id"):
+            raise ValueError(f"Cannot delete chunks by {column}")
+        keep = set(keep)
+        with self._lock:
+            for i in range(0, len(values), self._QUERY_BATCH):
+                batch = values[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                if not keep:
+                    self.conn.execute(f"DELETE FROM chunks WHERE {column} IN ({placeholders})", batch)
+                    continue
+                stale = [
+                    chunk_id for (chunk_id,) in self.conn.execute(f"SELECT chunk_id FROM chunks WHERE {column} IN ({placeholders})", batch)
+                    if chunk_id not in keep
+                ]
+                self.conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in stale])
+            self.conn.commit()
@@ -0,0 +1,45 @@
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, single-process use is not enforced
+    fcntl = None
+
+
+class IndexLockedError(RuntimeError):
+    """The index directory is already open in another process (or another instance in this one)."""
+
+
+class DirectoryLock:
+    """
+    Exclusive, non-blocking ``flock`` on a ``LOCK`` file inside an index directory.
+
+    The local indexes keep in-memory state (quantizer, deltas, bitmaps) that is
+    only written back on flush, so a second opener would silently diverge from
+    the first and overwrite its files. Opening fails fast instead. The lock is
+    released by ``release()`` or when the process exits, so a crash never leaves
+    a stale lock behind.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path) / "LOCK"
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(self._fd)
+                self._fd = None
+                raise IndexLockedError(
+                    f"{path} is already open in another process; the local index is single-process only. "
+                    "Run a single worker (uvicorn --workers 1) or point each process at its own directory."
+                ) from None
+        # For whoever finds the lock held
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, str(os.getpid()).encode())
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
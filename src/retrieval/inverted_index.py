@@ -0,0 +1,767 @@
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from src.retrieval.dir_lock import DirectoryLock
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass(slots=True)
+class IndexEntry:
+    key: str  # Unique id; adding an existing key replaces the old entry
+    text: str
+    payload: str  # Returned as-is by fetch(); must let replay_text recover the text
+    source: Optional[str] = None
+    document_id: Optional[str] = None
+    group: Optional[str] = None  # Access group; None or "" is visible to everyone
+
+
+class _Segment:
+    """
+    Immutable CSR postings for a contiguous range of doc ids.
+
+    Alongside the postings, every (term, block of ``2 ** _BLOCK_BITS`` doc ids)
+    pair stores the max of the BM25 tf component over its postings, computed with
+    the average document length at build time. Top-k search uses these as
+    per-block score upper bounds to skip blocks that cannot make the top k.
+    """
+
+    _ARRAYS = ("term_ids", "offsets", "docs", "tfs", "block_offsets", "block_ids", "block_max")
+
+    def __init__(self, arrays: Dict[str, np.ndarray], avgdl: float, path: Optional[Path] = None):
+        self.term_ids = arrays["term_ids"]  # Sorted global term ids
+        self.offsets = arrays["offsets"]
+        self.docs = arrays["docs"]  # Sorted within each term
+        self.tfs = arrays["tfs"]
+        self.block_offsets = arrays["block_offsets"]  # Per term, into block_ids/block_max
+        self.block_ids = arrays["block_ids"]
+        self.block_max = arrays["block_max"]
+        self.avgdl = avgdl
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @classmethod
+    def build(
+        cls, term_ids: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+        lengths: np.ndarray, avgdl: float, k1: float, b: float
+    ) -> "_Segment":
+        """Build from CSR postings (each term's docs sorted), computing the block bounds."""
+        block_ids, block_max, block_counts = [], [], []
+        norm_base, norm_scale = np.float32(k1 * (1 - b)), np.float32(k1 * b / (avgdl or 1.0))
+        for lo, hi in _term_slices(offsets):
+            start, end = offsets[lo], offsets[hi]
+            slice_docs = np.asarray(docs[start:end])
+            blocks = slice_docs >> _BLOCK_BITS
+            tf = np.asarray(tfs[start:end], dtype=np.float32)
+            tf_part = tf / (tf + norm_base + norm_scale * lengths[slice_docs])
+
+            # A run starts at every new block and at every new term
+            new_run = np.empty(len(blocks), dtype=bool)
+            new_run[0] = True
+            np.not_equal(blocks[1:], blocks[:-1], out=new_run[1:])
+            new_run[offsets[lo:hi] - start] = True
+            runs = np.flatnonzero(new_run)
+
+            block_ids.append(blocks[runs])
+            block_max.append(np.maximum.reduceat(tf_part, runs))
+            block_counts.append(np.diff(np.searchsorted(runs, offsets[lo:hi + 1] - start)))
+
+        block_offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        if block_counts:
+            np.cumsum(np.concatenate(block_counts), out=block_offsets[1:])
+        return cls({
+            "term_ids": np.asarray(term_ids, dtype=np.int32),
+            "offsets": np.asarray(offsets, dtype=np.int64),
+            "docs": np.asarray(docs, dtype=np.int32),
+            "tfs": np.asarray(tfs, dtype=np.uint16),
+            "block_offsets": block_offsets,
+            "block_ids": np.concatenate(block_ids) if block_ids else _EMPTY_DOCS,
+            "block_max": np.concatenate(block_max) if block_max else _EMPTY_BOUNDS,
+        }, avgdl)
+
+    @classmethod
+    def load(cls, path: Path) -> "_Segment":
+        meta = json.loads((path / "meta.json").read_text())
+        return cls({name: np.load(path / f"{name}.npy", mmap_mode="r") for name in cls._ARRAYS}, meta["avgdl"], path)
+
+    def save(self, path: Path) -> "_Segment":
+        # Built next to its final name and renamed into place, so a crash never leaves a half-written segment
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        for name in self._ARRAYS:
+            np.save(tmp_path / f"{name}.npy", getattr(self, name))
+        (tmp_path / "meta.json").write_text(json.dumps({"avgdl": self.avgdl}))
+        os.replace(tmp_path, path)
+        return self.load(path)
+
+    def lookup(self, term_id: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """(docs, tfs, block_ids, block_max) of a term, or None if it has no postings here."""
+        # An int32 key keeps searchsorted from converting the whole term array
+        i = int(np.searchsorted(self.term_ids, np.int32(term_id)))
+        if i == len(self.term_ids) or self.term_ids[i] != term_id:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        block_start, block_end = self.block_offsets[i], self.block_offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end], self.block_ids[block_start:block_end], self.block_max[block_start:block_end]
+
+
+
+def _term_slices(offsets: np.ndarray, size: int = 1 << 22) -> Iterator[Tuple[int, int]]:
+    """Split CSR terms into [lo, hi) ranges of about ``size`` postings, to bound temporaries."""
+    lo, n_terms = 0, len(offsets) - 1
+    while lo < n_terms:
+        hi = int(np.searchsorted(offsets, offsets[lo] + size, side="right")) - 1
+        hi = min(max(hi, lo + 1), n_terms)
+        yield lo, hi
+        lo = hi
+
+
+def _merge_postings(segments: List["_Segment"], live: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge segments covering increasing doc ids into one CSR (term_ids, offsets,
+    docs, tfs), dropping postings of docs that are not ``live``. Each term's
+    postings are the concatenation of its postings in every segment, so docs
+    stay sorted without a global sort.
+    """
+    term_ids = np.unique(np.concatenate([np.asarray(segment.term_ids) for segment in segments]))
+    positions = [np.searchsorted(term_ids, segment.term_ids) for segment in segments]
+
+    # Postings kept per term of each segment
+    kept = []
+    for segment in segments:
+        counts = np.diff(segment.offsets)
+        if live is not None:
+            for lo, hi in _term_slices(segment.offsets):
+                start, end = segment.offsets[lo], segment.offsets[hi]
+                keep = live[segment.docs[start:end]]
+                counts[lo:hi] = np.add.reduceat(keep, segment.offsets[lo:hi] - start, dtype=np.int64)
+        kept.append(counts)
+
+    totals = np.zeros(len(term_ids), dtype=np.int64)
+    for position, counts in zip(positions, kept):
+        totals[position] += counts
+    present = totals > 0
+    remap = np.cumsum(present) - 1
+    term_ids, totals = term_ids[present], totals[present]
+    offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+    np.cumsum(totals, out=offsets[1:])
+
+    docs = np.empty(offsets[-1], dtype=np.int32)
+    tfs = np.empty(offsets[-1], dtype=np.uint16)
+    cursor = offsets[:-1].copy()  # Next write position of each term
+    for segment, position, counts in zip(segments, positions, kept):
+        position = remap[position]  # Terms with nothing kept write nothing
+        for lo, hi in _term_slices(segment.offsets):
+            start, end = segment.offsets[lo], segment.offsets[hi]
+            slice_docs, slice_tfs = np.asarray(segment.docs[start:end]), np.asarray(segment.tfs[start:end])
+            if live is not None:
+                keep = live[slice_docs]
+                slice_docs, slice_tfs = slice_docs[keep], slice_tfs[keep]
+            slice_counts = counts[lo:hi]
+            first = np.cumsum(slice_counts) - slice_counts
+            dest = np.arange(len(slice_docs)) + np.repeat(cursor[position[lo:hi]] - first, slice_counts)
+            docs[dest] = slice_docs
+            tfs[dest] = slice_tfs
+        np.add.at(cursor, position, counts)
+    return term_ids, offsets, docs, tfs
+
+
+_BLOCK_BITS = 7
+_EMPTY_DOCS = np.empty(0, dtype=np.int32)
+_EMPTY_BOUNDS = np.empty(0, dtype=np.float32)
+_EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, end) for every pair."""
+    lengths = ends - starts
+    if not lengths.sum():
+        return _EMPTY_POSITIONS
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+@dataclass(slots=True)
+class _QueryTerm:
+    docs: np.ndarray  # All postings, sorted by doc id
+    tfs: np.ndarray
+    idf: float
+    blocks: np.ndarray  # Doc id blocks containing the term
+    bounds: np.ndarray  # Upper bound of the term's score within each block
+
+
+class InvertedIndex:
+    """
+    Persistent, incrementally updatable BM25 inverted index.
+
+    Layout under ``path``:
+      - ``store.sqlite``: term vocabulary plus one row per document (key, source,
+        length and the caller's payload). It is written on every add/delete and
+        doubles as the write-ahead log for postings.
+      - ``seg-*/``: immutable CSR postings segments (int32 doc ids, uint16 term
+        frequencies, per-block score bounds), loaded with ``mmap_mode="r"``.
+      - ``doc_lengths.npy`` / ``live.npy`` / ``doc_groups.npy`` /
+        ``manifest.json``: per-document arrays and the segment list as of the
+        last flush.
+
+    New documents go to an in-memory delta segment that is flushed to disk
+    once it grows past ``flush_postings`` or when flush() is called. Deletes are
+    tombstones in the ``live`` mask and are dropped when segments are merged.
+    Documents added after the last flush are re-tokenized from the store on
+    open, so nothing is lost if the process dies before flushing.
+
+    Every access group has a bitmap over doc ids. Searches restricted to a set
+    of groups mask candidates with the union of those bitmaps before top-k
+    selection, so callers get a full top k of documents they may see.
+
+    The index is single-process: the delta and per-document arrays live in
+    memory until flush, so opening a directory that another process (or
+    another instance) holds raises IndexLockedError (see DirectoryLock).
+    """
+
+    _QUERY_BATCH = 500
+    _EXHAUSTIVE_POSTINGS = 32_768
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        flush_postings: int = 2_000_000,
+        max_segments: int = 8,
+        replay_text: Optional[Callable[[str], str]] = None,
+    ):
+        # Without a path the index lives in a private temporary directory, removed on close
+        self._temporary = path is None
+        self.path = Path(path or tempfile.mkdtemp(prefix="keyword-index-"))
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._dir_lock = DirectoryLock(self.path)
+        self.k1 = k1
+        self.b = b
+        self.flush_postings = flush_postings
+        self.max_segments = max_segments
+        self.replay_text = replay_text or (lambda payload: payload)
+        self._lock = threading.RLock()
+
+        self.conn = sqlite3.connect(self.path / "store.sqlite", check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, term_id INTEGER NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS groups (name TEXT PRIMARY KEY, group_id INTEGER NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "doc_id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, source TEXT, document_id TEXT, "
+            "group_id INTEGER NOT NULL, length INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_document_id ON docs(document_id)")
+        self.conn.commit()
+
+        self._term_cache: Dict[str, int] = {}
+        self._next_term_id = self.conn.execute("SELECT COALESCE(MAX(term_id) + 1, 0) FROM terms").fetchone()[0]
+        self._group_ids: Dict[str, int] = dict(self.conn.execute("SELECT name, group_id FROM groups").fetchall())
+
+        self._load()
+
+    # --- Loading / persistence ---
+
+    def _load(self):
+        manifest_path = self.path / "manifest.json"
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        self._segments = [_Segment.load(self.path / name) for name in manifest.get("segments", [])]
+        self._next_segment = manifest.get("next_segment", 0)
+        # Segments written (or half-written) by a process that died before updating the manifest
+        referenced = set(manifest.get("segments", []))
+        for orphan in self.path.glob("seg-*"):
+            if orphan.name not in referenced:
+                shutil.rmtree(orphan, ignore_errors=True)
+        self._watermark = manifest.get("watermark", 0)  # Doc ids below this are in segments
+
+        if self._watermark:
+            self._lengths = np.load(self.path / "doc_lengths.npy")
+            self._live = np.load(self.path / "live.npy")
+            self._groups = np.load(self.path / "doc_groups.npy")
+        else:
+            self._lengths = np.zeros(0, dtype=np.int32)
+            self._live = np.zeros(0, dtype=bool)
+            self._groups = np.zeros(0, dtype=np.int32)
+        # Group id (-1 for public) -> bitmap over doc ids
+        self._group_masks = {
+            int(group_id): self._groups == group_id for group_id in np.unique(self._groups)
+        }
+        self._visible_cache: Dict[frozenset, Tuple[np.ndarray, np.ndarray]] = {}
+
+        # In-memory segments, one per indexed batch until compacted
+        self._delta: List[_Segment] = []
+        self._delta_postings = 0
+        self._live_count = 0
+        self._total_length = 0
+        next_doc_id = self.conn.execute("SELECT COALESCE(MAX(doc_id) + 1, 0) FROM docs").fetchone()[0]
+        self._grow(max(next_doc_id, self._watermark))
+
+        # Replay documents added since the last flush into the delta
+        rows = self.conn.execute(
+            "SELECT doc_id, group_id, payload FROM docs WHERE doc_id >= ? ORDER BY doc_id", (self._watermark,)
+        ).fetchall()
+        for i in range(0, len(rows), 1024):
+            batch = rows[i:i + 1024]
+            self._index_batch(
+                [doc_id for doc_id, _, _ in batch],
+                [Counter(tokenize(self.replay_text(payload))) for _, _, payload in batch],
+                [group_id for _, group_id, _ in batch]
+            )
+
+        # Deletes since the last flush are rows missing from the store
+        if self._watermark:
+            stored = np.fromiter(
+                (row[0] for row in self.conn.execute("SELECT doc_id FROM docs WHERE doc_id < ?", (self._watermark,))),
+                dtype=np.int64
+            )
+            if len(stored) != int(self._live[:self._watermark].sum()):
+                live = np.zeros(self._watermark, dtype=bool)
+                live[stored] = True
+                self._live[:self._watermark] = live
+
+        self._live_count = int(self._live.sum())
+        self._total_length = int(self._lengths[self._live].sum())
+
+    def flush(self):
+        """Persist the delta segment and per-document arrays."""
+        with self._lock:
+            if self._delta:
+                self._compact_delta()
+                self._segments.append(self._delta[0].save(self._new_segment_path()))
+                self._delta = []
+                self._delta_postings = 0
+
+            if len(self._segments) > self.max_segments:
+                self._merge_segments()
+
+            self._watermark = len(self._lengths)
+            self._save_array("doc_lengths.npy", self._lengths)
+            self._save_array("live.npy", self._live)
+            self._save_array("doc_groups.npy", self._groups)
+            self._write_manifest()
+
+    def close(self):
+        """Release the directory (without flushing), so another instance may open it."""
+        with self._lock:
+            self.conn.close()
+            self._dir_lock.release()
+            if self._temporary:
+                shutil.rmtree(self.path, ignore_errors=True)
+
+    def _merge_segments(self):
+        # Tombstoned docs are dropped here
+        old_segments = self._segments
+        merged = self._build_segment(*_merge_postings(old_segments, self._live))
+        self._segments = [merged.save(self._new_segment_path())]
+        self._write_manifest()
+        for segment in old_segments:
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+    def _new_segment_path(self) -> Path:
+        path = self.path / f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return path
+
+    def _save_array(self, name: str, values: np.ndarray):
+        tmp_path = self.path / f"{name}.tmp.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, self.path / name)
+
+    def _write_manifest(self):
+        tmp_path = self.path / "manifest.json.tmp"
+        tmp_path.write_text(json.dumps({
+            "segments": [segment.path.name for segment in self._segments],
+            "next_segment": self._next_segment,
+            "watermark": self._watermark,
+        }))
+        os.replace(tmp_path, self.path / "manifest.json")
+
+    # --- Updates ---
+
+    def add(self, entries: List[IndexEntry]):
+        if not entries:
+            return
+        with self._lock:
+            # Re-adding a key replaces it
+            self._delete_rows("key", [entry.key for entry in entries])
+
+            term_freqs = [Counter(tokenize(entry.text)) for entry in entries]
+            group_ids = [self._resolve_group(entry.group) for entry in entries]
+
+            first_doc_id = len(self._lengths)
+            doc_ids = list(range(first_doc_id, first_doc_id + len(entries)))
+            self._grow(first_doc_id + len(entries))
+            self._index_batch(doc_ids, term_freqs, group_ids)
+            rows = [
+                (doc_id, entry.key, entry.source, entry.document_id, group_id, int(self._lengths[doc_id]), entry.payload)
+                for doc_id, entry, group_id in zip(doc_ids, entries, group_ids)
+            ]
+            self.conn.executemany(
+                "INSERT INTO docs (doc_id, key, source, document_id, group_id, length, payload) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+            if self._delta_postings >= self.flush_postings:
+                self.flush()
+
+    def delete_by_source(self, sources: Iterable[str], keep: Iterable[str] = ()) -> List[str]:
+        """Delete every document with one of these sources, except the keys in ``keep``; returns their payloads."""
+        keep = set(keep)
+        if not keep:
+            return self._delete_and_flush("source", list(sources))
+        with self._lock:
+            keys = [key for key, _ in self._rows_where("source", list(sources)) if key not in keep]
+            return self._delete_and_flush("key", keys)
+
+    def payloads_by_source(self, sources: Iterable[str]) -> List[str]:
+        """Payloads of every document with one of these sources."""
+        with self._lock:
+            return [payload for _, payload in self._rows_where("source", list(sources))]
+
+    def _rows_where(self, column: str, values: List[str]) -> List[Tuple[str, str]]:
+        rows = []
+        for i in range(0, len(values), self._QUERY_BATCH):
+            batch = values[i:i + self._QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(self.conn.execute(f"SELECT key, payload FROM docs WHERE {column} IN ({placeholders})", batch).fetchall())
+        return rows
+
+    def delete_by_document(self, document_ids: Iterable[str]) -> List[str]:
+        return self._delete_and_flush("document_id", list(document_ids))
+
+    def delete_by_key(self, keys: Iterable[str]) -> List[str]:
+        return self._delete_and_flush("key", list(keys))
+
+    def has_sources(self, sources: Iterable[str]) -> bool:
+        """Whether any document of these sources is stored."""
+        sources = list(sources)
+        with self._lock:
+            for i in range(0, len(sources), self._QUERY_BATCH):
+                batch = sources[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                if self.conn.execute(f"SELECT 1 FROM docs WHERE source IN ({placeholders}) LIMIT 1", batch).fetchone():
+                    return True
+        return False
+
+    def update_payloads(self, keys: Iterable[str], update: Callable[[str, str], str]) -> Dict[str, str]:
+        """
+        Replace the payload of each stored key with ``update(key, payload)``;
+        returns the new payloads. The text must stay the same (postings aren't rebuilt).
+        """
+        keys = list(keys)
+        updated: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._QUERY_BATCH):
+                batch = keys[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for key, payload in self.conn.execute(
+                    f"SELECT key, payload FROM docs WHERE key IN ({placeholders})", batch
+                ).fetchall():
+                    updated[key] = update(key, payload)
+            self.conn.executemany("UPDATE docs SET payload = ? WHERE key = ?", [(payload, key) for key, payload in updated.items()])
+            self.conn.commit()
+        return updated
+
+    def _delete_and_flush(self, column: str, values: List[str]) -> List[str]:
+        with self._lock:
+            payloads = self._delete_rows(column, values)
+            if payloads:
+                # Deletes are rare (re-syncs), persist the tombstones right away
+                self.conn.commit()
+                self.flush()
+            return payloads
+
+    def _delete_rows(self, column: str, values: List[str]) -> List[str]:
+        payloads = []
+        for i in range(0, len(values), self._QUERY_BATCH):
+            batch = values[i:i + self._QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT doc_id, payload FROM docs WHERE {column} IN ({placeholders})", batch
+            ).fetchall()
+            if not rows:
+                continue
+            doc_ids = [doc_id for doc_id, _ in rows]
+            self._live_count -= len(doc_ids)
+            self._total_length -= int(self._lengths[doc_ids].sum())
+            self._live[doc_ids] = False
+            self._visible_cache.clear()
+            payloads.extend(payload for _, payload in rows)
+            self.conn.execute(f"DELETE FROM docs WHERE {column} IN ({placeholders})", batch)
+        return payloads
+
+    def _grow(self, size: int):
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, 2 * len(self._lengths), 1024)
+
+        def grown(values: np.ndarray, fill) -> np.ndarray:
+            # A view keeps len() == number of doc ids in use
+            buffer = np.full(capacity, fill, dtype=values.dtype)
+            buffer[:len(values)] = values
+            return buffer[:size]
+
+        self._lengths = grown(self._lengths, 0)
+        self._live = grown(self._live, False)
+        self._groups = grown(self._groups, -1)
+        self._group_masks = {group_id: grown(mask, False) for group_id, mask in self._group_masks.items()}
+        self._visible_cache.clear()
+
+    def _index_batch(self, doc_ids: List[int], term_freqs: List[Counter], group_ids: List[int]):
+        if not doc_ids:
+            return
+        terms = [term for freqs in term_freqs for term in freqs]
+        term_ids = np.array(self._resolve_terms(terms), dtype=np.int32)
+        tfs = np.fromiter((tf for freqs in term_freqs for tf in freqs.values()), dtype=np.int64, count=len(terms))
+        counts = np.fromiter((len(freqs) for freqs in term_freqs), dtype=np.int64, count=len(doc_ids))
+        docs = np.repeat(np.array(doc_ids, dtype=np.int32), counts)
+
+        lengths = [sum(freqs.values()) for freqs in term_freqs]
+        self._lengths[doc_ids] = lengths
+        self._live[doc_ids] = True
+        self._live_count += len(doc_ids)
+        self._total_length += sum(lengths)
+        self._groups[doc_ids] = group_ids
+        for doc_id, group_id in zip(doc_ids, group_ids):
+            if group_id not in self._group_masks:
+                self._group_masks[group_id] = np.zeros(len(self._lengths), dtype=bool)
+            self._group_masks[group_id][doc_id] = True
+        self._visible_cache.clear()
+
+        # Docs were added in id order, so a stable sort by term keeps each term's docs ordered
+        order = np.argsort(term_ids, kind="stable")
+        unique_terms, counts = np.unique(term_ids, return_counts=True)
+        offsets = np.zeros(len(unique_terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        self._delta.append(self._build_segment(unique_terms, offsets, docs[order], np.minimum(tfs[order], 65535)))
+        self._delta_postings += len(terms)
+        if len(self._delta) > 16:
+            self._compact_delta()
+
+    def _compact_delta(self):
+        self._delta = [self._build_segment(*_merge_postings(self._delta))]
+
+    def _build_segment(self, term_ids: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> _Segment:
+        return _Segment.build(term_ids, offsets, docs, tfs, self._lengths, self.avgdl, self.k1, self.b)
+
+    def _resolve_group(self, group: Optional[str]) -> int:
+        if not group:
+            return -1
+        group_id = self._group_ids.get(group)
+        if group_id is None:
+            group_id = self._group_ids[group] = len(self._group_ids)
+            self.conn.execute("INSERT INTO groups (name, group_id) VALUES (?, ?)", (group, group_id))
+        return group_id
+
+    def _resolve_terms(self, terms: Iterable[str], create: bool = True) -> List[Optional[int]]:
+        terms = list(terms)
+        unknown = [term for term in terms if term not in self._term_cache]
+        for i in range(0, len(unknown), self._QUERY_BATCH):
+            batch = unknown[i:i + self._QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            self._term_cache.update(self.conn.execute(
+                f"SELECT term, term_id FROM terms WHERE term IN ({placeholders})", batch
+            ).fetchall())
+        if create:
+            new_terms = [term for term in dict.fromkeys(unknown) if term not in self._term_cache]
+            if new_terms:
+                rows = [(term, self._next_term_id + i) for i, term in enumerate(new_terms)]
+                self.conn.executemany("INSERT INTO terms (term, term_id) VALUES (?, ?)", rows)
+                self._term_cache.update(rows)
+                self._next_term_id += len(rows)
+        return [self._term_cache.get(term) for term in terms]
+
+    @property
+    def avgdl(self) -> float:
+        return self._total_length / self._live_count if self._live_count else 0.0
+
+    # --- Queries ---
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def idf(self, doc_freq: int) -> float:
+        # Lucene-style BM25 idf, always positive
+        doc_freq = min(doc_freq, self._live_count)
+        return math.log(1 + (self._live_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def term_scores(self, docs: np.ndarray, tfs: np.ndarray, idf: float) -> np.ndarray:
+        tf = tfs.astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / (self.avgdl or 1.0))
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def query_terms(self, query: str) -> List[_QueryTerm]:
+        """Postings and per-block score bounds for every distinct query term in the index."""
+        avgdl = self.avgdl
+        result = []
+        for term_id in self._resolve_terms(dict.fromkeys(tokenize(query)), create=False):
+            if term_id is None:
+                continue
+            docs, tfs, blocks, bounds = [], [], [], []
+            # Segments, then delta: doc ids only increase, so concatenation stays sorted
+            for segment in self._segments + self._delta:
+                found = segment.lookup(term_id)
+                if found is None:
+                    continue
+                segment_docs, segment_tfs, segment_blocks, segment_max = found
+                docs.append(segment_docs)
+                tfs.append(segment_tfs)
+                blocks.append(segment_blocks)
+                # A larger avgdl than at build time raises scores by at most that ratio
+                bounds.append(segment_max * max(1.0, avgdl / (segment.avgdl or 1.0)))
+            if not docs:
+                continue
+            if len(docs) > 1:
+                docs, tfs = [np.concatenate(docs)], [np.concatenate(tfs)]
+            docs, tfs = docs[0], tfs[0]
+            # Document frequency counts tombstoned postings until they are merged away
+            idf = self.idf(len(docs))
+            result.append(_QueryTerm(docs, tfs, idf, np.concatenate(blocks), np.concatenate(bounds) * (idf * (self.k1 + 1))))
+        return result
+
+    def search(
+        self, query: str, limit: int = 10, exhaustive: bool = False, groups: Optional[Iterable[str]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        BM25 top-k as (doc_id, score), best first. ``exhaustive`` scores every
+        posting instead of pruning. With ``groups``, only public documents and
+        those of the given access groups are returned.
+        """
+        with self._lock:
+            if not self._live_count or limit <= 0:
+                return []
+            terms = self.query_terms(query)
+            if not terms:
+                return []
+            visible, visible_blocks = self._visible(groups)
+            # Below a few tens of thousands of postings one vectorized pass beats pruning
+            if exhaustive or sum(len(term.docs) for term in terms) <= self._EXHAUSTIVE_POSTINGS:
+                return self._score_all(terms, limit, visible)
+            return self._score_top_k(terms, limit, visible, visible_blocks)
+
+    def _visible(self, groups: Optional[Iterable[str]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Live docs the groups may see, and per block whether it holds any (None when unrestricted)."""
+        if groups is None:
+            return self._live, None
+        key = frozenset(self._group_ids[group] for group in groups if group in self._group_ids)
+        cached = self._visible_cache.get(key)
+        if cached is None:
+            visible = np.zeros(len(self._live), dtype=bool)
+            for group_id in key | {-1}:
+                if group_id in self._group_masks:
+                    visible |= self._group_masks[group_id]
+            visible &= self._live
+            blocks = np.logical_or.reduceat(visible, np.arange(0, len(visible), 1 << _BLOCK_BITS)) if len(visible) else visible
+            if len(self._visible_cache) >= 64:
+                self._visible_cache.clear()
+            cached = self._visible_cache[key] = (visible, blocks)
+        return cached
+
+    def _accumulate(
+        self, terms: List[_QueryTerm], visible: np.ndarray, positions: Optional[List[np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Summed scores of the visible docs at the given postings positions of each term (all if None)."""
+        docs, scores = [], []
+        for i, term in enumerate(terms):
+            term_docs, term_tfs = term.docs, term.tfs
+            if positions is not None:
+                term_docs, term_tfs = term_docs[positions[i]], term_tfs[positions[i]]
+            if len(term_docs):
+                docs.append(term_docs)
+                scores.append(self.term_scores(term_docs, term_tfs, term.idf))
+        if not docs:
+            return _EMPTY_DOCS, _EMPTY_BOUNDS
+        candidates, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        keep = visible[candidates]
+        return candidates[keep], totals[keep]
+
+    def _score_all(self, terms: List[_QueryTerm], limit: int, visible: np.ndarray) -> List[Tuple[int, float]]:
+        candidates, totals = self._accumulate(terms, visible)
+        if not len(candidates):
+            return []
+        top = min(limit, len(candidates))
+        best = np.argpartition(-totals, top - 1)[:top]
+        best = best[np.argsort(-totals[best], kind="stable")]
+        return [(int(candidates[i]), float(totals[i])) for i in best if totals[i] > 0]
+
+    def _score_top_k(
+        self, terms: List[_QueryTerm], limit: int, visible: np.ndarray, visible_blocks: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Block-max top-k: blocks of doc ids are scored exactly in order of their
+        score upper bound (the sum of the query terms' block bounds), keeping the
+        best hits in a min-heap. Evaluation stops once the next block's bound
+        can't beat the current k-th score, so most postings are never touched.
+        Blocks are scored in batches that double in size, which keeps the
+        number of numpy round trips logarithmic when little can be pruned.
+        """
+        # A block split across two segments is counted twice, which only loosens its bound
+        blocks, inverse = np.unique(np.concatenate([term.blocks for term in terms]), return_inverse=True)
+        upper = np.bincount(inverse, weights=np.concatenate([term.bounds for term in terms]))
+        if visible_blocks is not None:
+            # Blocks without a single visible doc can't contribute
+            upper[~visible_blocks[blocks]] = 0.0
+        order = np.argsort(-upper, kind="stable")
+        order = order[upper[order] > 0]
+        blocks, neg_upper = blocks[order], -upper[order]
+
+        heap: List[Tuple[float, int]] = []  # (score, -doc_id): the weakest hit, ties to the larger id, on top
+        position, step = 0, 1
+        while position < len(blocks):
+            end = min(position + step, len(blocks))
+            if len(heap) == limit:
+                # Only blocks whose bound beats the current k-th score are worth scoring
+                end = position + int(np.searchsorted(neg_upper[position:end], -heap[0][0]))
+                if end == position:
+                    break
+            # Keys match the int32 postings dtype so searchsorted doesn't convert the postings
+            first_docs = blocks[position:end] << _BLOCK_BITS
+            last_docs = first_docs + ((1 << _BLOCK_BITS) - 1)
+            candidates, totals = self._accumulate(terms, visible, [
+                _ranges(np.searchsorted(term.docs, first_docs), np.searchsorted(term.docs, last_docs, side="right"))
+                for term in terms
+            ])
+            if len(candidates) > limit:
+                best = np.argpartition(-totals, limit - 1)[:limit]
+                candidates, totals = candidates[best], totals[best]
+            for doc_id, score in zip(candidates.tolist(), totals.tolist()):
+                if score <= 0:
+                    continue
+                if len(heap) < limit:
+                    heapq.heappush(heap, (score, -doc_id))
+                elif (score, -doc_id) > heap[0]:
+                    heapq.heapreplace(heap, (score, -doc_id))
+            position, step = end, step * 2
+        return [(-neg_doc_id, score) for score, neg_doc_id in sorted(heap, reverse=True)]
+
+    def fetch(self, doc_ids: List[int]) -> Dict[int, str]:
+        """Payloads by doc id, in the given order. Ids deleted since they were found are missing."""
+        with self._lock:
+            found: Dict[int, str] = {}
+            for i in range(0, len(doc_ids), self._QUERY_BATCH):
+                batch = doc_ids[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self.conn.execute(
+                    f"SELECT doc_id, payload FROM docs WHERE doc_id IN ({placeholders})", batch
+                ).fetchall())
+            return {doc_id: found[doc_id] for doc_id in doc_ids if doc_id in found}
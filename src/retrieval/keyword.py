@@ -1,33 +1,92 @@
-from typing import List
-from rank_bm25 import BM25Okapi
+import json
+from typing import Any, Dict, Iterable, List, Optional
+from src.config import settings
 from src.types import Chunk, SearchResult
+from src.retrieval.inverted_index import IndexEntry, InvertedIndex
 
 class KeywordSearch:
-    def __init__(self):
-        self.bm25 = None
-        self.chunks = []
+    """
+    BM25 keyword search over a persistent inverted index (see InvertedIndex).
+    Without KEYWORD_INDEX_PATH every process has its own temporary index. A configured
+    path is single-process: another process opening it fails with IndexLockedError.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.index_store = InvertedIndex(
+            path or settings.KEYWORD_INDEX_PATH,
+            flush_postings=settings.KEYWORD_INDEX_FLUSH_POSTINGS,
+            max_segments=settings.KEYWORD_INDEX_MAX_SEGMENTS,
+            replay_text=lambda payload: json.loads(payload)["content"]
+        )
 
     def index(self, chunks: List[Chunk]):
-        self.chunks = chunks
-        tokenized_corpus = [chunk.content.split(" ") for chunk in chunks]
-        self.bm25 = BM25Okapi(tokenized_corpus)
-
-    def search(self, query: str, limit: int = 10) -> List[SearchResult]:
-        if not self.bm25:
-            return []
-            
-        tokenized_query = query.split(" ")
-        doc_scores = self.bm25.get_scores(tokenized_query)
-        
-        # Get top-k indices
-        top_n = sorted(range(len(doc_scores)), key=lambda i: doc_scores[i], reverse=True)[:limit]
-        
-        return [
-            SearchResult(
-                chunk=self.chunks[i],
-                score=doc_scores[i],
-                rank=idx
+        # Postings are appended incrementally; earlier batches stay searchable
+        self.index_store.add([
+            IndexEntry(
+                key=chunk.id,
+                text=chunk.content,
+                payload=self._dump(chunk),
+                source=chunk.metadata.get("source"),
+                document_id=chunk.document_id,
+                group=chunk.metadata.get("access_group")
             )
-            for idx, i in enumerate(top_n)
-            if doc_scores[i] > 0
+            for chunk in chunks
+        ])
+
+    def remove_sources(self, sources: List[str], keep: Iterable[str] = ()) -> List[Chunk]:
+        """Remove the chunks of these sources, except the chunk ids in ``keep``; returns the removed chunks."""
+        return [self._load(payload) for payload in self.index_store.delete_by_source(sources, keep)]
+
+    def chunks_for_sources(self, sources: List[str]) -> List[Chunk]:
+        return [self._load(payload) for payload in self.index_store.payloads_by_source(sources)]
+
+    def remove_documents(self, document_ids: List[str]) -> List[Chunk]:
+        return [self._load(payload) for payload in self.index_store.delete_by_document(document_ids)]
+
+    def has_sources(self, sources: List[str]) -> bool:
+        return self.index_store.has_sources(sources)
+
+    def add_duplicates(self, duplicates: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Append aliases to the ``duplicates`` metadata of indexed chunks; returns each chunk's full list."""
+        def update(key: str, payload: str) -> str:
+            data = json.loads(payload)
+            data["metadata"] = {**data["metadata"], "duplicates": data["metadata"].get("duplicates", []) + duplicates[key]}
+            return json.dumps(data, default=str)
+
+        updated = self.index_store.update_payloads(duplicates, update)
+        return {key: json.loads(payload)["metadata"]["duplicates"] for key, payload in updated.items()}
+
+    def flush(self):
+        self.index_store.flush()
+
+    def close(self):
+        self.index_store.close()
+
+    def search(self, query: str, limit: int = 10, groups: Optional[List[str]] = None) -> List[SearchResult]:
+        # groups restricts hits to public chunks and those groups (None: no restriction)
+        hits = self.index_store.search(query, limit=limit, groups=groups)
+        payloads = self.index_store.fetch([doc_id for doc_id, _ in hits])
+        # Docs deleted by a concurrent ingest between search and fetch are dropped
+        hits = [(doc_id, score) for doc_id, score in hits if doc_id in payloads]
+        return [
+            SearchResult(chunk=self._load(payloads[doc_id]), score=score, rank=idx)
+            for idx, (doc_id, score) in enumerate(hits)
         ]
+
+    def __len__(self) -> int:
+        return len(self.index_store)
+
+    @staticmethod
+    def _dump(chunk: Chunk) -> str:
+        return json.dumps({
+            "id": chunk.id,
+            "document_id": chunk.document_id,
+            "content": chunk.content,
+            "chunk_index": chunk.chunk_index,
+            "metadata": chunk.metadata,
+            "token_count": chunk.token_count,
+        }, default=str)
+
+    @staticmethod
+    def _load(payload: str) -> Chunk:
+        return Chunk(**json.loads(payload))
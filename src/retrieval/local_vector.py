@@ -0,0 +1,106 @@
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from src.config import settings
+from src.types import Chunk, SearchResult
+from src.retrieval.ann import IVFIndex, VectorEntry
+
+class LocalVectorStore:
+    """
+    In-process VectorStore backed by a persistent IVF index (see IVFIndex), for
+    single-process deployments: a second process opening the same
+    LOCAL_VECTOR_PATH fails with IndexLockedError. Use Qdrant to serve from
+    several workers.
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: Optional[int] = None):
+        self.index = IVFIndex(
+            path or settings.LOCAL_VECTOR_PATH,
+            dim=dim or settings.EMBEDDING_DIMENSIONS or 3072,
+            nlist=settings.LOCAL_VECTOR_NLIST,
+            nprobe=settings.LOCAL_VECTOR_NPROBE,
+            exact_threshold=settings.LOCAL_VECTOR_EXACT_THRESHOLD
+        )
+
+    async def initialize(self):
+        pass
+
+    async def upsert(self, chunks: List[Chunk]):
+        entries = [
+            VectorEntry(
+                key=str(chunk.id),
+                vector=chunk.embedding,
+                # Same payload layout as the Qdrant points, plus the chunk id
+                payload=json.dumps({
+                    "id": str(chunk.id),
+                    "content": chunk.content,
+                    "document_id": chunk.document_id,
+                    "chunk_index": chunk.chunk_index,
+                    **chunk.metadata
+                }, default=str),
+                source=chunk.metadata.get("source"),
+                document_id=chunk.document_id,
+                group=chunk.metadata.get("access_group")
+            )
+            for chunk in chunks
+            if chunk.embedding is not None
+        ]
+        await asyncio.to_thread(self.index.add, entries)
+
+    async def delete_by_source(self, sources: List[str], keep: Iterable[str] = ()):
+        if not sources:
+            return
+        await asyncio.to_thread(self.index.delete_by_source, sources, [str(chunk_id) for chunk_id in keep])
+
+    async def delete_documents(self, document_ids: List[str]):
+        if not document_ids:
+            return
+        await asyncio.to_thread(self.index.delete_by_document, document_ids)
+
+    async def has_sources(self, sources: List[str]) -> bool:
+        return await asyncio.to_thread(self.index.has_sources, sources)
+
+    async def set_duplicates(self, duplicates: Dict[str, List[Dict[str, Any]]]):
+        if not duplicates:
+            return
+        await asyncio.to_thread(
+            self.index.update_payloads,
+            duplicates,
+            lambda key, payload: json.dumps({**json.loads(payload), "duplicates": duplicates[key]}, default=str)
+        )
+
+    async def flush(self):
+        await asyncio.to_thread(self.index.flush)
+
+    def close(self):
+        self.index.close()
+
+    async def search(self, query_vector: np.ndarray, limit: int = 10, groups: Optional[List[str]] = None, with_content: Optional[bool] = None) -> List[SearchResult]:
+        # Payloads are read from local SQLite for the hits only, so content always comes back
+        return await asyncio.to_thread(self._search, query_vector, limit, groups)
+
+    async def hydrate(self, results: List[SearchResult]):
+        pass
+
+    def _search(self, query_vector: np.ndarray, limit: int, groups: Optional[List[str]]) -> List[SearchResult]:
+        hits = self.index.search(query_vector, limit=limit, groups=groups)
+        payloads = self.index.fetch([doc_id for doc_id, _ in hits])
+        results = []
+        for doc_id, score in hits:
+            # Deleted by a concurrent ingest between search and fetch
+            if doc_id not in payloads:
+                continue
+            payload = json.loads(payloads[doc_id])
+            results.append(SearchResult(
+                chunk=Chunk(
+                    id=payload.pop("id"),
+                    document_id=payload.get("document_id"),
+                    content=payload.get("content"),
+                    chunk_index=payload.get("chunk_index"),
+                    metadata={k: v for k, v in payload.items() if k not in ["content", "document_id", "chunk_index"]}
+                ),
+                score=score,
+                rank=len(results)
+            ))
+        return results
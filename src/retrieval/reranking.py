@@ -1,30 +1,200 @@
-from typing import List
-from sentence_transformers import CrossEncoder
+import importlib.util
+import os
+import shutil
+import threading
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from src.config import settings
 from src.types import SearchResult, Chunk
+from src.retrieval.batching import MicroBatcher
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export a Hugging Face cross-encoder to ONNX (and an int8 copy), returning the model path.
+
+    Needs torch/transformers once; serving the exported model only needs onnxruntime.
+    """
+    model_path = os.path.join(output_dir, "model.int8.onnx" if quantize else "model.onnx")
+    if os.path.exists(model_path):
+        return model_path
+
+    # Built next to its final name and renamed into place, so an interrupted export
+    # never leaves a model (or a model without its tokenizer) that would be loaded
+    tmp_dir = output_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    if os.path.isdir(output_dir):
+        # Keep an earlier export, e.g. the fp32 model when only the int8 copy is missing
+        shutil.copytree(output_dir, tmp_dir)
+    else:
+        os.makedirs(tmp_dir)
+    fp32_path = os.path.join(tmp_dir, "model.onnx")
+    int8_path = os.path.join(tmp_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        print(f"Exporting {model_name} to ONNX...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        sample = tokenizer(["query"], ["passage"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17
+            )
+        tokenizer.save_pretrained(tmp_dir)
+
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        # Weights to int8, activations quantized on the fly: no calibration data needed
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return model_path
+
+
+class OnnxCrossEncoder:
+    """ONNX Runtime stand-in for sentence_transformers.CrossEncoder (predict only)."""
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, model_dir: Optional[str] = None, quantize: bool = True, intra_op_threads: int = 0, max_length: int = 512):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = model_dir or os.path.join(settings.RERANK_ONNX_DIR, model_name.replace("/", "--"))
+        model_path = os.path.join(model_dir, "model.int8.onnx" if quantize else "model.onnx")
+        if not os.path.exists(model_path):
+            model_path = export_onnx(model_name, model_dir, quantize=quantize)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = min(max_length, self.tokenizer.model_max_length)
+
+    def predict(self, sentences: List[List[str]], batch_size: int = 32) -> np.ndarray:
+        scores = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            features = self.tokenizer(
+                [pair[0] for pair in batch],
+                [pair[1] for pair in batch],
+                padding=True,
+                truncation="only_second",
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            inputs = {name: value.astype(np.int64) for name, value in features.items() if name in self.input_names}
+            logits = self.session.run(["logits"], inputs)[0]
+            scores.append(logits[:, 0] if logits.shape[1] == 1 else logits)
+        if not scores:
+            return np.zeros(0, dtype=np.float32)
+        # Single-logit models get CrossEncoder's default sigmoid, so both backends agree
+        logits = np.concatenate(scores)
+        return 1 / (1 + np.exp(-logits)) if logits.ndim == 1 else logits
+
+
+def load_cross_encoder(model_name: str = DEFAULT_RERANK_MODEL, backend: Optional[str] = None):
+    backend = backend or settings.RERANK_BACKEND
+    if backend == "onnx":
+        if importlib.util.find_spec("onnxruntime") is None:
+            # onnxruntime is optional (requirements-onnx.txt); serve with torch instead
+            print("onnxruntime is not installed, falling back to the torch reranker")
+            backend = "torch"
+    if backend == "onnx":
+        return OnnxCrossEncoder(
+            model_name,
+            quantize=settings.RERANK_ONNX_QUANTIZE,
+            intra_op_threads=settings.RERANK_INTRA_OP_THREADS
+        )
+    if backend == "torch":
+        # Imported here so ONNX-only workers never load torch
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name)
+    raise ValueError(f"Unknown reranker backend: {backend}")
+
 
 class ReRanker:
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
-        # In a real app, load this once globally or use an external service
-        self.model = CrossEncoder(model_name)
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, backend: Optional[str] = None, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        # Weights are loaded on first use (or by warmup()), not at construction
+        self.model_name = model_name
+        self.backend = backend
+        self._model = None
+        self._load_lock = threading.Lock()
+        # Pairs from concurrent requests are scored together on one worker thread
+        self.batcher = MicroBatcher(
+            self._predict,
+            max_batch_size=max_batch_size or settings.RERANK_MAX_BATCH_SIZE,
+            max_wait_ms=settings.RERANK_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            name="rerank"
+        )
 
     def rerank(self, query: str, results: List[SearchResult], top_k: int = 5) -> List[SearchResult]:
         if not results:
             return []
-            
-        inputs = [[query, res.chunk.content] for res in results]
-        scores = self.model.predict(inputs)
-        
+
+        scores = self._predict([(query, res.chunk.content) for res in results])
+        return self._apply_scores(results, scores, top_k)
+
+    async def arerank(self, query: str, results: List[SearchResult], top_k: int = 5) -> List[SearchResult]:
+        """Like rerank, but batched with other in-flight requests."""
+        if not results:
+            return []
+
+        scores = await self.batcher.submit([(query, res.chunk.content) for res in results])
+        return self._apply_scores(results, scores, top_k)
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    print(f"Loading reranker {self.model_name}...")
+                    self._model = load_cross_encoder(self.model_name, self.backend)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warmup(self):
+        """Load the model and run one tiny batch so the first real query doesn't pay for it."""
+        self._predict([("warmup", "warmup")])
+
+    def close(self):
+        self.batcher.close()
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> Sequence[float]:
+        return self.model.predict([list(pair) for pair in pairs], batch_size=self.batcher.max_batch_size)
+
+    @staticmethod
+    def _apply_scores(results: List[SearchResult], scores: Sequence[float], top_k: int) -> List[SearchResult]:
         # Update scores and sort
         for res, score in zip(results, scores):
             res.score = float(score)
-            
+
         # Sort by score descending
         reranked = sorted(results, key=lambda x: x.score, reverse=True)
-        
+
         # Update ranks and slice
         final_results = []
         for i, res in enumerate(reranked[:top_k]):
             res.rank = i
             final_results.append(res)
-            
+
         return final_results
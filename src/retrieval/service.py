@@ -1,48 +1,158 @@
-from typing import List
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+from pydantic import BaseModel, Field
+from src.config import settings
 from src.types import Chunk, SearchResult
 from src.ingestion.embeddings import EmbeddingGenerator
-from src.retrieval.vector import VectorStore
+from src.retrieval.vector import create_vector_store
 from src.retrieval.keyword import KeywordSearch
 from src.retrieval.reranking import ReRanker
 
+class RetrievalTimings(BaseModel):
+    """Wall-clock milliseconds per retrieval stage of one search."""
+    vector_ms: Optional[float] = None  # Query embedding + vector search
+    keyword_ms: Optional[float] = None
+    hydrate_ms: Optional[float] = None  # Bulk content fetch for projected vector hits
+    rerank_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    degraded: List[str] = Field(default_factory=list)  # Branches (or "hydrate") that timed out or failed
+
 class RetrievalService:
     def __init__(self):
         self.embedding_gen = EmbeddingGenerator()
-        self.vector_store = VectorStore()
+        self.vector_store = create_vector_store()
         self.keyword_search = KeywordSearch()
         self.reranker = ReRanker()
 
     async def ingest(self, chunks: List[Chunk]):
-        # index for vector
         await self.embedding_gen.embed_chunks(chunks)
+        await self.index(chunks)
+
+    async def index(self, chunks: List[Chunk]):
+        # index for vector (chunks must already be embedded)
         await self.vector_store.upsert(chunks)
         
-        # index for keyword
-        self.keyword_search.index(chunks) # Note: Naive in-memory implementation for demo
+        # index for keyword (may flush or merge segments on disk, so off the event loop)
+        await asyncio.to_thread(self.keyword_search.index, chunks)
+
+    async def flush(self):
+        """Persist buffered index state, e.g. at the end of an ingest."""
+        await asyncio.gather(self.vector_store.flush(), asyncio.to_thread(self.keyword_search.flush))
+
+    def close(self):
+        self.reranker.close()
+        self.vector_store.close()
+        self.keyword_search.close()
+
+    async def remove_sources(self, sources: List[str], keep: Iterable[str] = ()) -> List[str]:
+        """
+        Drop every chunk that came from these sources (except the chunk ids in ``keep``),
+        e.g. files changed or deleted upstream.
+
+        Returns the other sources whose chunks were only indexed as duplicates of a
+        removed chunk; they must be re-ingested to stay searchable.
+        """
+        keep = set(keep)
+        await self.vector_store.delete_by_source(sources, keep)
+        removed = await asyncio.to_thread(self.keyword_search.remove_sources, sources, keep)
+        return self._alias_sources(removed, sources)
+
+    async def duplicate_sources(self, sources: List[str]) -> List[str]:
+        """Other sources whose chunks are only indexed as duplicates of a chunk of these sources."""
+        chunks = await asyncio.to_thread(self.keyword_search.chunks_for_sources, sources)
+        return self._alias_sources(chunks, sources)
+
+    @staticmethod
+    def _alias_sources(chunks: List[Chunk], sources: List[str]) -> List[str]:
+        stale = set(sources)
+        return sorted({
+            alias["source"]
+            for chunk in chunks
+            for alias in chunk.metadata.get("duplicates", [])
+            if alias.get("source") and alias["source"] not in stale
+        })
+
+    async def has_sources(self, sources: List[str]) -> bool:
+        """Whether both indexes hold chunks of any of these sources."""
+        if not await asyncio.to_thread(self.keyword_search.has_sources, sources):
+            return False
+        return await self.vector_store.has_sources(sources)
+
+    async def add_duplicates(self, duplicates: Dict[str, List[Dict[str, Any]]]):
+        """Record aliases of already indexed chunks, by chunk id (see ChunkDeduplicator.take_pending_aliases)."""
+        if not duplicates:
+            return
+        merged = await asyncio.to_thread(self.keyword_search.add_duplicates, duplicates)
+        await self.vector_store.set_duplicates(merged)
+
+    async def remove_documents(self, document_ids: List[str]) -> int:
+        """Drop every chunk of these documents from both indexes; returns the keyword chunks removed."""
+        await self.vector_store.delete_documents(document_ids)
+        removed = await asyncio.to_thread(self.keyword_search.remove_documents, document_ids)
+        return len(removed)
+
+    async def search(self, query: str, user: 'User', limit: int = 10, timings: Optional[RetrievalTimings] = None) -> List[SearchResult]:
+        timings = timings if timings is not None else RetrievalTimings()
+        started = time.perf_counter()
+
+        # Vector and keyword branches run concurrently, each under its own deadline.
+        # Both backends filter by the user's groups themselves, so no over-fetch is needed
+        vector_results, keyword_results = await asyncio.gather(
+            self._run_branch("vector", self._vector_search(query, limit, user.groups), settings.RETRIEVAL_VECTOR_TIMEOUT, timings),
+            self._run_branch("keyword", asyncio.to_thread(self.keyword_search.search, query, limit, user.groups), settings.RETRIEVAL_KEYWORD_TIMEOUT, timings)
+        )
+        if len(timings.degraded) == 2:
+            raise RuntimeError("All retrieval branches failed: " + ", ".join(timings.degraded))
 
-    async def search(self, query: str, user: 'User', limit: int = 10) -> List[SearchResult]:
-        # Vector Search
-        query_embedding = (await self.embedding_gen.generate([query]))[0]
-        vector_results = await self.vector_store.search(query_embedding, limit=limit * 2) # Fetch more for filtering
-        
-        # Keyword Search
-        keyword_results = self.keyword_search.search(query, limit=limit * 2)
-        
         # Hybrid Fusion using Reciprocal Rank Fusion (RRF) or simple deduplication
         # Here: Simple deduplication based on chunk content/ID
-        seen_ids = set()
+        seen = {}
         candidates = []
-        
+
         for res in vector_results + keyword_results:
-            if res.chunk.id not in seen_ids:
-                # Permission Check
+            chunk_id = str(res.chunk.id)
+            if chunk_id not in seen:
+                # Permission Check (already enforced by the backends; kept as a last line of defence)
                 required_group = res.chunk.metadata.get("access_group")
                 if user.can_access(required_group):
                     candidates.append(res)
-                    seen_ids.add(res.chunk.id)
+                    seen[chunk_id] = res
+            elif seen[chunk_id].chunk.content is None:
+                # Keyword hits carry their text, so a projected vector hit needn't be fetched
+                seen[chunk_id].chunk.content = res.chunk.content
+
+        # Projected vector hits get their content in one bulk fetch, only for the survivors.
+        # It is vector-branch work: it gets what is left of that branch's deadline, and
+        # hits it can't fill in are dropped
+        if any(res.chunk.content is None for res in candidates):
+            remaining = max(settings.RETRIEVAL_VECTOR_TIMEOUT - timings.vector_ms / 1000, 0.0)
+            await self._run_branch("hydrate", self.vector_store.hydrate(candidates), remaining, timings)
+            candidates = [res for res in candidates if res.chunk.content is not None]
+
+        # Re-ranking (micro-batched with concurrent queries on the reranker's worker thread)
+        rerank_started = time.perf_counter()
+        ranking_results = await self.reranker.arerank(query, candidates, limit)
+        timings.rerank_ms = (time.perf_counter() - rerank_started) * 1000
+        timings.total_ms = (time.perf_counter() - started) * 1000
 
-        
-        # Re-ranking
-        ranking_results = self.reranker.rerank(query, candidates, top_k=limit)
-        
         return ranking_results
+
+    async def _vector_search(self, query: str, limit: int, groups: List[str]) -> List[SearchResult]:
+        query_embedding = await self.embedding_gen.embed_query(query)
+        return await self.vector_store.search(query_embedding, limit=limit, groups=groups)
+
+    async def _run_branch(self, name: str, branch: Awaitable[List[SearchResult]], timeout: float, timings: RetrievalTimings) -> List[SearchResult]:
+        """Await one retrieval branch; on timeout or error it contributes no results (if partial results are allowed)."""
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(branch, timeout)
+        except Exception as e:
+            if not settings.RETRIEVAL_ALLOW_PARTIAL:
+                raise
+            reason = f"timed out after {timeout}s" if isinstance(e, asyncio.TimeoutError) else f"failed: {e}"
+            print(f"{name.capitalize()} retrieval {reason}; continuing without it")
+            timings.degraded.append(name)
+            return []
+        finally:
+            setattr(timings, f"{name}_ms", (time.perf_counter() - started) * 1000)
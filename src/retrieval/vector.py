@@ -1,7 +1,9 @@
-from typing import List
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
 from qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models
-from src.types import Chunk, SearchResult
+from src.types import ID_NAMESPACE, Chunk, SearchResult
 from src.config import settings
 import uuid
 
@@ -17,6 +19,22 @@ class VectorStore:
         else:
             print("Using in-memory Qdrant (Ephemeral)...")
             self.client = AsyncQdrantClient(location=":memory:") 
+
+        # Full vectors stay on disk for rescoring; only the compact (and quantized) ones need RAM
+        self.dim = settings.EMBEDDING_DIMENSIONS or 3072  # text-embedding-3-large
+        compact = settings.VECTOR_COMPACT_DIMENSIONS
+        self.compact_dim = compact if compact and compact < self.dim else None
+        self.oversampling = settings.VECTOR_OVERSAMPLING
+        self.quantization = settings.VECTOR_QUANTIZATION
+        self.upsert_batch_size = settings.VECTOR_UPSERT_BATCH_SIZE
+        self.upsert_concurrency = settings.VECTOR_UPSERT_CONCURRENCY
+
+        # Content is fetched only for surviving candidates; optionally kept out of Qdrant entirely
+        self.projected = settings.VECTOR_PROJECTED_SEARCH
+        self.chunk_store = None
+        if settings.CHUNK_STORE_PATH:
+            from src.retrieval.chunk_store import ChunkTextStore
+            self.chunk_store = ChunkTextStore(settings.CHUNK_STORE_PATH)
             
         self._initialized = False
 
@@ -27,44 +45,161 @@ class VectorStore:
         if not await self.client.collection_exists(self.collection_name):
             await self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=models.VectorParams(size=3072, distance=models.Distance.COSINE) # 3072 for text-embedding-3-large
+                vectors_config=self._vectors_config(),
+                on_disk_payload=True
             )
+        else:
+            await self._check_layout()
+        if settings.QDRANT_URL:
+            # Keyword indexes so permission filters are applied inside the HNSW search and
+            # deletes by source/document don't scan (local mode ignores payload indexes)
+            for field_name in ("access_group", "source", "document_id"):
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
         self._initialized = True
 
     async def upsert(self, chunks: List[Chunk]):
         await self.initialize()
         
+        chunks = [chunk for chunk in chunks if chunk.embedding is not None]
         points = [
             models.PointStruct(
-                id=str(uuid.uuid4()), # Qdrant needs UUID or int
-                vector=chunk.embedding,
+                id=self._point_id(chunk.id),  # Deterministic, so re-ingesting overwrites
+                vector=self._point_vectors(chunk.embedding),
                 payload={
-                    "content": chunk.content,
+                    **({} if self.chunk_store else {"content": chunk.content}),
                     "document_id": chunk.document_id,
                     "chunk_index": chunk.chunk_index,
                     **chunk.metadata
                 }
             )
             for chunk in chunks
-            if chunk.embedding
         ]
+        if self.chunk_store:
+            await asyncio.to_thread(self.chunk_store.put_many, [
+                (self._point_id(chunk.id), chunk.metadata.get("source"), chunk.document_id, chunk.content)
+                for chunk in chunks
+            ])
         
-        if points:
-            await self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
+        # Bounded batches in parallel instead of one huge request
+        semaphore = asyncio.Semaphore(self.upsert_concurrency)
+
+        async def upsert_batch(batch: List[models.PointStruct]):
+            async with semaphore:
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=batch
+                )
+
+        await asyncio.gather(*(
+            upsert_batch(points[i:i + self.upsert_batch_size])
+            for i in range(0, len(points), self.upsert_batch_size)
+        ))
+
+    async def delete_by_source(self, sources: List[str], keep: Iterable[str] = ()):
+        """Delete every chunk of these sources, except the chunk ids in ``keep``."""
+        await self._delete_matching("source", sources, keep)
+
+    async def delete_documents(self, document_ids: List[str]):
+        """Delete every chunk of these documents."""
+        await self._delete_matching("document_id", document_ids)
+
+    async def _delete_matching(self, key: str, values: List[str], keep: Iterable[str] = ()):
+        if not values:
+            return
+        await self.initialize()
+
+        keep = [str(chunk_id) for chunk_id in keep]
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key=key, match=models.MatchAny(any=values))],
+                    must_not=[models.HasIdCondition(has_id=[self._point_id(chunk_id) for chunk_id in keep])] if keep else None
+                )
             )
+        )
+        if self.chunk_store:
+            await asyncio.to_thread(self.chunk_store.delete_matching, key, values, keep)
 
-    async def search(self, query_vector: List[float], limit: int = 10) -> List[SearchResult]:
+    async def has_sources(self, sources: List[str]) -> bool:
+        """Whether any chunk of these sources is stored."""
+        if not sources:
+            return False
         await self.initialize()
-        
-        search_result = await self.client.query_points(
+        result = await self.client.count(
             collection_name=self.collection_name,
-            query=query_vector,
-            limit=limit
+            count_filter=models.Filter(must=[models.FieldCondition(key="source", match=models.MatchAny(any=sources))]),
+            exact=True
         )
+        return result.count > 0
+
+    async def set_duplicates(self, duplicates: Dict[str, List[Dict[str, Any]]]):
+        """Replace the ``duplicates`` payload of these chunks (by chunk id), in one request."""
+        if not duplicates:
+            return
+        await self.initialize()
+        await self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={"duplicates": aliases},
+                    points=[self._point_id(chunk_id)]
+                ))
+                for chunk_id, aliases in duplicates.items()
+            ]
+        )
+
+    async def flush(self):
+        # Qdrant persists on every upsert
+        pass
+
+    def close(self):
+        # Nothing held locally; the client's connections close with the process
+        pass
+
+    async def search(self, query_vector: np.ndarray, limit: int = 10, groups: Optional[List[str]] = None, with_content: Optional[bool] = None) -> List[SearchResult]:
+        """
+        Nearest chunks visible to ``groups``. In projected mode (the default, see VECTOR_PROJECTED_SEARCH)
+        results come back with ``content=None``; call ``hydrate`` on the ones that are kept.
+        """
+        await self.initialize()
+        
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_filter = self._access_filter(groups)
+        if with_content is None:
+            with_content = not self.projected
+        with_payload = True if with_content else models.PayloadSelectorExclude(exclude=["content"])
+        if self.compact_dim:
+            # Oversample on the compact vectors, then rescore those candidates with the full ones
+            search_result = await self.client.query_points(
+                collection_name=self.collection_name,
+                prefetch=models.Prefetch(
+                    query=query_vector[:self.compact_dim].tolist(),
+                    using="compact",
+                    filter=query_filter,
+                    limit=int(limit * self.oversampling)
+                ),
+                query=query_vector.tolist(),
+                using="full",
+                query_filter=query_filter,
+                with_payload=with_payload,
+                limit=limit
+            )
+        else:
+            search_result = await self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector.tolist(),
+                query_filter=query_filter,
+                search_params=self._search_params(),
+                with_payload=with_payload,
+                limit=limit
+            )
         
-        return [
+        results = [
             SearchResult(
                 chunk=Chunk(
                     id=hit.id,
@@ -78,3 +213,103 @@ class VectorStore:
             )
             for i, hit in enumerate(search_result.points)
         ]
+        if with_content and self.chunk_store:
+            await self.hydrate(results)
+            results = [res for res in results if res.chunk.content is not None]
+        return results
+
+    async def hydrate(self, results: List[SearchResult]):
+        """Fill in ``content`` of projected search results with one bulk fetch; it stays None for deleted chunks."""
+        missing = {str(res.chunk.id): res for res in results if res.chunk.content is None}
+        if not missing:
+            return
+
+        if self.chunk_store:
+            contents = await asyncio.to_thread(self.chunk_store.get_many, list(missing))
+        else:
+            points = await self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=list(missing),
+                with_payload=models.PayloadSelectorInclude(include=["content"]),
+                with_vectors=False
+            )
+            contents = {str(point.id): point.payload.get("content") for point in points}
+
+        for chunk_id, res in missing.items():
+            # Stays None if the chunk was deleted since the search
+            res.chunk.content = contents.get(chunk_id)
+
+    @staticmethod
+    def _point_id(chunk_id: str) -> str:
+        # Qdrant needs a UUID or int; chunk ids are UUIDs unless set by hand
+        try:
+            return str(uuid.UUID(str(chunk_id)))
+        except ValueError:
+            return str(uuid.uuid5(ID_NAMESPACE, str(chunk_id)))
+
+    def _quantization_config(self) -> Optional[models.QuantizationConfig]:
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        if self.quantization == "none":
+            return None
+        raise ValueError(f"Unknown vector quantization: {self.quantization}")
+
+    def _vectors_config(self):
+        quantization = self._quantization_config()
+        if self.compact_dim:
+            return {
+                "full": models.VectorParams(size=self.dim, distance=models.Distance.COSINE, on_disk=True),
+                "compact": models.VectorParams(size=self.compact_dim, distance=models.Distance.COSINE, quantization_config=quantization),
+            }
+        return models.VectorParams(
+            size=self.dim, distance=models.Distance.COSINE, on_disk=quantization is not None, quantization_config=quantization
+        )
+
+    def _search_params(self) -> Optional[models.SearchParams]:
+        if self.quantization == "none":
+            return None
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=self.oversampling)
+        )
+
+    def _point_vectors(self, embedding: np.ndarray):
+        if self.compact_dim:
+            # Matryoshka embeddings: a leading slice is itself a usable (re-normalized by Qdrant) embedding
+            return {"full": embedding.tolist(), "compact": embedding[:self.compact_dim].tolist()}
+        return embedding.tolist()
+
+    async def _check_layout(self):
+        vectors = (await self.client.get_collection(self.collection_name)).config.params.vectors
+        sizes = {name: params.size for name, params in vectors.items()} if isinstance(vectors, dict) else vectors.size
+        expected = {"full": self.dim, "compact": self.compact_dim} if self.compact_dim else self.dim
+        if sizes != expected:
+            raise ValueError(
+                f"Collection {self.collection_name} has vectors {sizes}, but the settings need {expected}. "
+                "Re-create the collection (re-ingest) or point QDRANT_COLLECTION at a new one."
+            )
+
+    @staticmethod
+    def _access_filter(groups: Optional[List[str]]) -> Optional[models.Filter]:
+        # Mirrors User.can_access: chunks without an access_group are visible to everyone
+        if groups is None:
+            return None
+        return models.Filter(should=[
+            models.FieldCondition(key="access_group", match=models.MatchAny(any=list(groups) + [""])),
+            models.IsEmptyCondition(is_empty=models.PayloadField(key="access_group")),
+            models.IsNullCondition(is_null=models.PayloadField(key="access_group")),
+        ])
+
+
+def create_vector_store():
+    """VectorStore for the configured VECTOR_BACKEND; the single-process local index is opt-in."""
+    backend = settings.VECTOR_BACKEND
+    if backend == "local":
+        from src.retrieval.local_vector import LocalVectorStore
+        return LocalVectorStore()
+    if backend == "qdrant":
+        return VectorStore()
+    raise ValueError(f"Unknown vector backend: {settings.VECTOR_BACKEND}")
@@ -1,7 +1,19 @@
+from dataclasses import dataclass, field
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional
 from datetime import datetime
-from uuid import uuid4
+from uuid import NAMESPACE_URL, uuid4, uuid5
+import numpy as np
+
+# Ids derived from source identity, so re-ingesting a source overwrites its
+# chunks (in Qdrant and the keyword index) instead of duplicating them
+ID_NAMESPACE = uuid5(NAMESPACE_URL, "enterprise-rag-platform")
+
+def document_id_for(source: str, page: Optional[int] = None) -> str:
+    return str(uuid5(ID_NAMESPACE, source if page is None else f"{source}#page={page}"))
+
+def chunk_id_for(document_id: str, chunk_index: int) -> str:
+    return str(uuid5(ID_NAMESPACE, f"{document_id}:{chunk_index}"))
 
 class Document(BaseModel):
     """Represents a source document before chunking."""
@@ -10,17 +22,57 @@ class Document(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-class Chunk(BaseModel):
+# Chunks and search results are created by the thousand on ingest and query
+# paths, so they are slotted records rather than pydantic models. Convert them
+# with to_model() at the API boundary.
+
+@dataclass(slots=True, eq=False)  # Identity equality: comparing embeddings element-wise is never wanted
+class Chunk:
     """Represents a chunk of text for retrieval."""
-    id: str = Field(default_factory=lambda: str(uuid4()))
     document_id: str
     content: str
-    embedding: Optional[List[float]] = None
-    metadata: Dict[str, Any] = Field(default_factory=dict)
     chunk_index: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    id: Optional[str] = None  # Defaults to chunk_id_for(document_id, chunk_index)
+    embedding: Optional[np.ndarray] = None  # float32, usually a row of a batch matrix
+    token_count: Optional[int] = None
+
+    def __post_init__(self):
+        if self.id is None:
+            self.id = chunk_id_for(self.document_id, self.chunk_index)
 
-class SearchResult(BaseModel):
+    def to_model(self) -> "ChunkModel":
+        # Embeddings never leave the process through the API
+        return ChunkModel(
+            id=str(self.id),
+            document_id=self.document_id,
+            content=self.content,
+            metadata=self.metadata,
+            chunk_index=self.chunk_index,
+            token_count=self.token_count
+        )
+
+@dataclass(slots=True)
+class SearchResult:
     """Represents a retrieved chunk with score."""
     chunk: Chunk
     score: float
     rank: int
+
+    def to_model(self) -> "SearchResultModel":
+        return SearchResultModel(chunk=self.chunk.to_model(), score=self.score, rank=self.rank)
+
+class ChunkModel(BaseModel):
+    """API representation of a Chunk."""
+    id: str
+    document_id: str
+    content: str
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    chunk_index: int
+    token_count: Optional[int] = None
+
+class SearchResultModel(BaseModel):
+    """API representation of a SearchResult."""
+    chunk: ChunkModel
+    score: float
+    rank: int
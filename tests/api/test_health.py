@@ -7,4 +7,16 @@ client = TestClient(app)
 def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
+    assert response.json()["status"] == "ok"
+
+def test_not_ready_until_startup_completes():
+    app.state.components = {"orchestrator": "ready", "reranker": "loading"}
+    try:
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert client.get("/health").json()["ready"] is False
+
+        app.state.components["reranker"] = "ready"
+        assert client.get("/health/ready").status_code == 200
+    finally:
+        del app.state.components
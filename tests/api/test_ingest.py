@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from src.api import main
+from src.ingestion.chunking import FixedSizeChunker
+from fastapi import HTTPException
+from src.auth.models import User
+from src.ingestion.jobs import IngestJob, JobManager, JobStatus, JobStore
+
+ADMIN = User(id="1", username="admin", groups=["admin"])
+
+class RecordingRetriever:
+    """Stands in for RetrievalService: records calls in order instead of indexing."""
+
+    def __init__(self, orphaned, fail_embedding=False):
+        self.calls = []
+        self.orphaned = orphaned
+        self.fail_embedding = fail_embedding
+        self.embedding_gen = self
+
+    async def duplicate_sources(self, sources):
+        return self.orphaned
+
+    async def remove_sources(self, sources, keep=()):
+        self.calls.append(("remove", sources, sorted(keep)))
+        return []
+
+    async def embed_chunks(self, chunks):
+        if self.fail_embedding:
+            raise RuntimeError("embedding API down")
+
+    async def index(self, chunks):
+        self.calls.append(("index", sorted({chunk.metadata["source"] for chunk in chunks}), sorted(chunk.id for chunk in chunks)))
+
+    async def add_duplicates(self, duplicates):
+        pass
+
+    async def flush(self):
+        pass
+
+class FakeOrchestrator:
+    def __init__(self, retriever):
+        self.retriever = retriever
+
+def test_file_ingest_replaces_previous_chunks(tmp_path, monkeypatch):
+    path, duplicate = tmp_path / "notes.txt", tmp_path / "copy.txt"
+    path.write_text("shrunk since the last ingest")
+    duplicate.write_text("only indexed as a duplicate of notes.txt")
+    retriever = RecordingRetriever(orphaned=[str(duplicate), "https://github.com/org/repo/blob/main/gone.md"])
+    monkeypatch.setattr(main, "orchestrator", FakeOrchestrator(retriever))
+    monkeypatch.setattr(main, "RecursiveTokenChunker", FixedSizeChunker)
+
+    job = IngestJob(kind="file", params={"file_path": str(path)})
+    result = asyncio.run(main.run_file_ingest(job))
+
+    # Both files are indexed first; only then are the file's chunks that weren't rewritten dropped
+    *indexed, removal = retriever.calls
+    assert sorted(source for _, sources, _ in indexed for source in sources) == sorted([str(path), str(duplicate)])
+    assert removal == ("remove", [str(path)], sorted(chunk_id for _, _, ids in indexed for chunk_id in ids))
+    assert job.progress.files_total == 2 and result == {"chunks_ingested": 2}
+
+def test_failed_file_ingest_keeps_previous_chunks(tmp_path, monkeypatch):
+    path = tmp_path / "notes.txt"
+    path.write_text("new version")
+    retriever = RecordingRetriever(orphaned=[], fail_embedding=True)
+    monkeypatch.setattr(main, "orchestrator", FakeOrchestrator(retriever))
+    monkeypatch.setattr(main, "RecursiveTokenChunker", FixedSizeChunker)
+
+    with pytest.raises(RuntimeError, match="embedding API down"):
+        asyncio.run(main.run_file_ingest(IngestJob(kind="file", params={"file_path": str(path)})))
+    assert retriever.calls == []
+
+def test_cancel_reports_jobs_running_in_another_worker(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(main, "job_manager", JobManager(store, instance_id="this-worker"))
+    monkeypatch.setattr(main, "orchestrator", FakeOrchestrator(RecordingRetriever(orphaned=[])))
+    # Submitted to another worker that shares the job store
+    elsewhere = IngestJob(kind="file", status=JobStatus.RUNNING, worker_instance="other-worker")
+    finished = IngestJob(kind="file", status=JobStatus.SUCCEEDED, worker_instance="other-worker")
+    store.save(elsewhere)
+    store.save(finished)
+
+    def cancel(job_id):
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(main.cancel_ingest_job(job_id, user=ADMIN))
+        return raised.value.status_code, raised.value.detail
+
+    status, detail = cancel(elsewhere.id)
+    assert status == 409 and "another worker" in detail
+    assert cancel(finished.id) == (409, "Job already succeeded")
+    assert cancel("missing")[0] == 404
@@ -0,0 +1,57 @@
+import json
+from fastapi.testclient import TestClient
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+
+from src.api.main import app
+from src.orchestration.llm import LLMClient
+
+client = TestClient(app)
+
+def azure_chunk(content=None, usage=None):
+    choices = [] if content is None else [Choice(index=0, delta=ChoiceDelta(content=content))]
+    return ChatCompletionChunk(id="x", object="chat.completion.chunk", created=0, model="m", choices=choices, usage=usage)
+
+class StreamingOrchestrator:
+    def __init__(self):
+        self.llm = LLMClient()
+        self.llm.cost_tracker = None
+
+        async def create(**kwargs):
+            assert kwargs["stream"] and kwargs["stream_options"] == {"include_usage": True}
+
+            async def chunks():
+                yield azure_chunk("")  # Content-filter preamble
+                yield azure_chunk("Hel")
+                yield azure_chunk("lo")
+                yield azure_chunk(usage=CompletionUsage(prompt_tokens=7, completion_tokens=2, total_tokens=9))
+            return chunks()
+
+        self.llm.client.chat.completions.create = create
+
+    async def query_stream(self, query, user):
+        completion = self.llm.stream_completion([{"role": "user", "content": query}], user_id=user.id)
+        return {"answer": completion.__aiter__(), "completion": completion, "source": "llm"}
+
+def test_streams_chunks_usage_and_done():
+    app.state.orchestrator = StreamingOrchestrator()
+    try:
+        response = client.post(
+            "/v1/chat/completions",
+            headers={"X-User-ID": "alice"},
+            json={"model": "enterprise-rag-v1", "messages": [{"role": "user", "content": "hi"}],
+                  "stream": True, "stream_options": {"include_usage": True}}
+        )
+    finally:
+        del app.state.orchestrator
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in response.text.split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert all(chunk["object"] == "chat.completion.chunk" for chunk in chunks)
+    assert chunks[0]["choices"][0]["delta"] == {"role": "assistant", "content": ""}
+    assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"]) == "Hello"
+    assert chunks[-2]["choices"][0]["finish_reason"] == "stop"
+    assert chunks[-1]["choices"] == [] and chunks[-1]["usage"]["total_tokens"] == 9
@@ -0,0 +1,104 @@
+import pytest
+from src.ingestion.chunking import RecursiveTokenChunker
+from src.types import Document
+
+class ByteEncoder:
+    """tiktoken stand-in: every ``width`` UTF-8 bytes form a token, even mid-character."""
+
+    def __init__(self, width=3):
+        self.width = width
+        self.vocab = {}
+        self.pieces = []
+
+    def _token(self, piece):
+        if piece not in self.vocab:
+            self.vocab[piece] = len(self.pieces)
+            self.pieces.append(piece)
+        return self.vocab[piece]
+
+    def encode_ordinary(self, text):
+        raw = text.encode("utf-8")
+        return [self._token(raw[i:i + self.width]) for i in range(0, len(raw), self.width)]
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        return [self.encode_ordinary(text) for text in texts]
+
+    def decode_bytes(self, tokens):
+        return b"".join(self.pieces[token] for token in tokens)
+
+    def decode(self, tokens):
+        return self.decode_bytes(tokens).decode("utf-8", errors="replace")
+
+def make_chunker(encoder, chunk_size=10, overlap=3):
+    chunker = RecursiveTokenChunker.__new__(RecursiveTokenChunker)
+    chunker.chunk_size = chunk_size
+    chunker.overlap = overlap
+    chunker.encoder = encoder
+    chunker.num_threads = 1
+    chunker.batch_docs = 4
+    return chunker
+
+def old_chunk_contents(chunker, text):
+    """What the chunker produced before slicing by offset: one decode per window."""
+    tokens = chunker.encoder.encode_ordinary(text)
+    contents = []
+    for start in range(0, len(tokens), chunker.chunk_size - chunker.overlap):
+        contents.append(chunker.encoder.decode(tokens[start:start + chunker.chunk_size]))
+    return contents
+
+ASCII = " ".join(f"word{i}" for i in range(40))
+UNICODE = "Grüße, 東京 and naïve café 😀 — " * 6
+
+def test_ascii_chunks_match_the_decoding_chunker():
+    chunker = make_chunker(ByteEncoder())
+    chunks = chunker.chunk(Document(content=ASCII))
+    old = old_chunk_contents(chunker, ASCII)
+
+    assert [chunk.content for chunk in chunks] == old[:len(chunks)]
+    # The old chunker ended with windows that only repeated the last one's overlap
+    assert all(extra in chunks[-1].content for extra in old[len(chunks):])
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk.token_count == 10 for chunk in chunks[:-1]) and 0 < chunks[-1].token_count <= 10
+
+def test_consecutive_chunks_overlap_by_the_configured_tokens():
+    chunker = make_chunker(ByteEncoder(width=1), chunk_size=10, overlap=3)
+    chunks = chunker.chunk(Document(content=ASCII))
+
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.content[-3:] == current.content[:3]
+    assert chunks[0].content + "".join(chunk.content[3:] for chunk in chunks[1:]) == ASCII
+
+def test_offsets_of_split_characters_point_at_the_character():
+    chunker = make_chunker(ByteEncoder(width=1))
+    text = "aé€😀b"  # 1, 2, 3, 4 and 1 bytes
+    tokens = chunker.encoder.encode_ordinary(text)
+
+    offsets = chunker._char_offsets(text, tokens, list(range(len(tokens) + 1)))
+    assert offsets == [0, 1, 1, 2, 2, 2, 3, 3, 3, 3, 4, 5]
+
+@pytest.mark.parametrize("width", [1, 2, 3, 5])
+def test_unicode_chunks_are_slices_of_the_text(width):
+    chunker = make_chunker(ByteEncoder(width), chunk_size=7, overlap=0)
+    chunks = chunker.chunk(Document(content=UNICODE))
+
+    # Without overlap the slices tile the text; no character is split or replaced
+    assert "".join(chunk.content for chunk in chunks) == UNICODE
+    assert "�" not in "".join(chunk.content for chunk in chunks)
+
+    overlapping = make_chunker(ByteEncoder(width), chunk_size=7, overlap=2).chunk(Document(content=UNICODE))
+    position = 0
+    for chunk in overlapping:
+        found = UNICODE.find(chunk.content, max(position - len(chunk.content), 0))
+        assert found >= 0
+        position = found + len(chunk.content)
+    assert position == len(UNICODE)
+
+def test_chunk_many_matches_chunk():
+    chunker = make_chunker(ByteEncoder())
+    documents = [Document(content=ASCII), Document(content=""), Document(content=UNICODE)]
+
+    batched = chunker.chunk_many(documents)
+    single = [chunker.chunk(document) for document in documents]
+    assert [[chunk.content for chunk in chunks] for chunks in batched] == [[chunk.content for chunk in chunks] for chunks in single]
+    assert batched[1] == []
+    assert [chunk.content for chunk in chunker.iter_chunks(documents)] == [chunk.content for chunks in single for chunk in chunks]
@@ -0,0 +1,59 @@
+from src.ingestion.dedup import ChunkDeduplicator
+from src.types import Chunk
+from src.retrieval.keyword import KeywordSearch
+
+TEXT = " ".join(f"word{i}" for i in range(200))
+
+def make_chunk(content, source="a.md", access_group="engineering", index=0):
+    return Chunk(
+        document_id=source,
+        content=content,
+        chunk_index=index,
+        metadata={"source": source, "access_group": access_group}
+    )
+
+def test_exact_duplicate_is_dropped_and_recorded():
+    dedup = ChunkDeduplicator()
+    original = make_chunk(TEXT)
+    unique = dedup.filter([original, make_chunk("  " + TEXT.replace(" ", "\n", 5), source="b.md")])
+
+    assert unique == [original]
+    assert dedup.exact_duplicates == 1
+    assert original.metadata["duplicates"] == [{"document_id": "b.md", "chunk_index": 0, "source": "b.md"}]
+
+def test_near_duplicate_is_dropped():
+    dedup = ChunkDeduplicator()
+    near = TEXT.replace("word100", "changed")
+    unique = dedup.filter([make_chunk(TEXT), make_chunk(near, source="b.md")])
+
+    assert len(unique) == 1
+    assert dedup.near_duplicates == 1
+
+def test_distinct_text_and_other_groups_are_kept():
+    dedup = ChunkDeduplicator()
+    other = " ".join(f"other{i}" for i in range(200))
+    unique = dedup.filter([
+        make_chunk(TEXT),
+        make_chunk(other, source="b.md"),
+        make_chunk(TEXT, source="c.md", access_group="management"),
+    ])
+
+    assert len(unique) == 3
+
+def test_aliases_found_in_later_batches_reach_the_stores(tmp_path):
+    dedup = ChunkDeduplicator()
+    original = make_chunk(TEXT)
+    assert dedup.filter([original]) == [original]
+    search = KeywordSearch(str(tmp_path / "keyword"))
+    search.index([original])  # Indexed before its duplicate turns up
+
+    assert dedup.filter([make_chunk(TEXT, source="b.md", index=3)]) == []
+    assert "duplicates" not in original.metadata
+    pending = dedup.take_pending_aliases()
+    assert pending == {original.id: [{"document_id": "b.md", "chunk_index": 3, "source": "b.md"}]}
+    assert dedup.take_pending_aliases() == {}
+
+    assert search.add_duplicates(pending) == pending
+    # Removing the original now reports b.md as needing re-ingestion
+    removed = search.remove_sources(["a.md"])
+    assert removed[0].metadata["duplicates"] == pending[original.id]
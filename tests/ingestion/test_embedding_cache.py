@@ -0,0 +1,43 @@
+import itertools
+import numpy as np
+from src.ingestion.embedding_cache import EmbeddingCache
+
+def vector(value):
+    return np.full(4, value, dtype=np.float32)
+
+def test_keys_are_stable_and_separate_models():
+    key = EmbeddingCache.make_key("hello world", "text-embedding-3-large")
+    # Pinned: changing the key format would silently invalidate every persisted cache
+    assert key == "1b52f99d761aba5bdba92480cb050c63f6eb3680fe018cc1871a1dd23f0a03a3"
+    assert key == EmbeddingCache.make_key("hello world", "text-embedding-3-large", None)
+    others = {
+        EmbeddingCache.make_key("hello world ", "text-embedding-3-large"),
+        EmbeddingCache.make_key("hello world", "text-embedding-3-small"),
+        EmbeddingCache.make_key("hello world", "text-embedding-3-large", 256),
+    }
+    assert key not in others and len(others) == 3
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # A clock that always moves forward, so last_used never ties
+    clock = itertools.count()
+    monkeypatch.setattr("src.ingestion.embedding_cache.time.time", lambda: next(clock))
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries=3)
+    for key, value in [("a", 1), ("b", 2), ("c", 3)]:
+        cache.put_many({key: vector(value)})
+
+    assert set(cache.get_many(["a"])) == {"a"}  # a is now more recent than b and c
+    cache.put_many({"d": vector(4)})
+
+    found = cache.get_many(["a", "b", "c", "d"])
+    assert sorted(found) == ["a", "c", "d"]
+    assert np.array_equal(found["d"], vector(4))
+    assert cache.stats()["entries"] == 3
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    EmbeddingCache(path).put_many({"a": vector(1)})
+
+    reopened = EmbeddingCache(path)
+    assert np.array_equal(reopened.get_many(["a", "missing"])["a"], vector(1))
+    assert reopened.stats()["entries"] == 1
+    assert (reopened.hits, reopened.misses) == (1, 1)
@@ -0,0 +1,61 @@
+import asyncio
+import numpy as np
+from src.ingestion.embeddings import EmbeddingGenerator, iter_token_batches
+from src.types import Chunk
+
+def test_batches_respect_token_and_item_limits():
+    counts = [3, 4, 2, 1, 1, 1, 5, 2]
+    batches = list(iter_token_batches(counts, max_tokens=8, max_items=3))
+
+    assert batches == [range(0, 2), range(2, 5), range(5, 8)]
+    for batch in batches:
+        assert sum(counts[i] for i in batch) <= 8 and len(batch) <= 3
+    assert list(iter_token_batches([], max_tokens=8, max_items=3)) == []
+
+def test_oversize_input_gets_a_batch_of_its_own():
+    batches = list(iter_token_batches([2, 20, 2, 2], max_tokens=8, max_items=10))
+    assert batches == [range(0, 1), range(1, 2), range(2, 4)]
+
+class WordEncoder:
+    """tiktoken stand-in: one token per word."""
+
+    def encode_ordinary_batch(self, texts):
+        return [text.split() for text in texts]
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+def make_generator(requests):
+    generator = EmbeddingGenerator.__new__(EmbeddingGenerator)
+    generator.max_batch_tokens = 10
+    generator.max_batch_items = 3
+    generator.max_input_tokens = 6
+    generator.max_concurrency = 2
+    generator._encoder = WordEncoder()
+    in_flight = []
+
+    async def generate(texts):
+        in_flight.append(None)
+        requests.append((list(texts), len(in_flight)))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return np.full((len(texts), 4), len(requests), dtype=np.float32)
+
+    generator.generate = generate
+    return generator
+
+def test_embed_chunks_truncates_oversize_inputs_and_batches_within_limits():
+    requests = []
+    generator = make_generator(requests)
+    contents = ["one two", "w " * 20, "three", "four five six", "seven", "eight nine", "ten"]
+    chunks = [Chunk(document_id="d", content=content.strip(), chunk_index=i) for i, content in enumerate(contents)]
+
+    asyncio.run(generator.embed_chunks(chunks))
+
+    sent = [text for texts, _ in requests for text in texts]
+    # The oversize chunk is cut to max_input_tokens, the rest go out unchanged and in order
+    assert sorted(sent) == sorted(["one two", " ".join(["w"] * 6), "three", "four five six", "seven", "eight nine", "ten"])
+    for texts, concurrent in requests:
+        assert len(texts) <= 3 and sum(len(text.split()) for text in texts) <= 10
+        assert concurrent <= 2
+    assert all(chunk.embedding is not None and chunk.embedding.shape == (4,) for chunk in chunks)
@@ -0,0 +1,56 @@
+import subprocess
+from src.ingestion.github import GitHubIngestor
+
+def git(repo, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", "-C", str(repo), *args], check=True, capture_output=True)
+
+def commit_files(repo, files, deleted=()):
+    for name, content in files.items():
+        (repo / name).write_text(content)
+    for name in deleted:
+        (repo / name).unlink()
+    git(repo, "add", "-A")
+    git(repo, "commit", "-m", "update")
+
+def make_repo(tmp_path):
+    repo = tmp_path / "upstream"
+    repo.mkdir()
+    git(repo, "init", "-b", "main")
+    commit_files(repo, {"a.md": "alpha", "b.md": "beta", "c.txt": "gamma", "image.png": "binary"})
+    return repo
+
+def test_sync_reports_added_modified_and_deleted_files(tmp_path):
+    repo = make_repo(tmp_path)
+    ingestor = GitHubIngestor(f"file://{repo}", cache_dir=str(tmp_path / "cache"))
+
+    first = ingestor.sync()
+    assert first.added == ["a.md", "b.md", "c.txt"] and first.previous_commit is None
+    assert not first.modified and not first.deleted and not first.stale_sources
+    ingestor.save_state(first)
+
+    commit_files(repo, {"a.md": "alpha v2", "d.md": "delta"}, deleted=["b.md"])
+    git(repo, "mv", "c.txt", "e.txt")
+    git(repo, "commit", "-m", "rename")
+    second = ingestor.sync()
+    assert second.previous_commit == first.commit
+    assert second.added == ["d.md", "e.txt"]
+    assert second.modified == ["a.md"]
+    assert second.deleted == ["b.md", "c.txt"]
+    assert sorted(second.files_to_load) == ["a.md", "d.md", "e.txt"]
+    assert second.stale_sources == [ingestor._source_for(path) for path in ["a.md", "b.md", "c.txt"]]
+    assert sorted(second.file_hashes) == ["a.md", "d.md", "e.txt"]
+    ingestor.save_state(second)
+
+    unchanged = ingestor.sync()
+    assert not unchanged.has_changes and unchanged.commit == second.commit
+
+def test_reset_state_loads_every_file_again(tmp_path):
+    repo = make_repo(tmp_path)
+    ingestor = GitHubIngestor(f"file://{repo}", cache_dir=str(tmp_path / "cache"))
+    assert ingestor.synced_sources() == []
+    ingestor.save_state(ingestor.sync())
+    assert ingestor.synced_sources() == [ingestor._source_for(path) for path in ["a.md", "b.md", "c.txt"]]
+
+    ingestor.reset_state()
+    again = ingestor.sync()
+    assert again.added == ["a.md", "b.md", "c.txt"] and again.previous_commit is None
@@ -0,0 +1,67 @@
+import asyncio
+import os
+from src.ingestion.jobs import IngestJob, JobManager, JobStatus, JobStore
+
+def test_store_round_trips_jobs_newest_first(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    first = IngestJob(kind="file", params={"file_path": "a.md"})
+    second = IngestJob(kind="file", params={"file_path": "b.md"})
+    second.progress.indexed = 7
+    store.save(first)
+    store.save(second)
+
+    assert store.get(second.id).progress.indexed == 7
+    assert store.get("missing") is None
+    assert [job.id for job in store.list()] == [second.id, first.id]
+
+def test_unfinished_jobs_of_other_instances_fail_on_recovery(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    # The previous server had this very pid (e.g. pid 1 in a restarted container)
+    restarted = IngestJob(kind="file", status=JobStatus.RUNNING, worker_pid=os.getpid(), worker_instance="before-restart")
+    legacy = IngestJob(kind="file", status=JobStatus.QUEUED)  # Written before instance ids existed
+    done = IngestJob(kind="file", status=JobStatus.SUCCEEDED, worker_instance="before-restart")
+    own = IngestJob(kind="file", status=JobStatus.RUNNING, worker_instance="current")
+    for job in (restarted, legacy, done, own):
+        store.save(job)
+
+    JobManager(store, instance_id="current")
+
+    assert store.get(restarted.id).status == JobStatus.FAILED
+    assert store.get(restarted.id).error == "Interrupted by server restart"
+    assert store.get(legacy.id).status == JobStatus.FAILED
+    assert store.get(done.id).status == JobStatus.SUCCEEDED
+    assert store.get(own.id).status == JobStatus.RUNNING
+
+def test_jobs_run_fail_and_cancel(tmp_path):
+    async def main():
+        manager = JobManager(JobStore(str(tmp_path / "jobs.sqlite")), max_concurrent=2, flush_interval=0.01)
+        started = asyncio.Event()
+
+        async def ingest(job):
+            job.progress.indexed = 3
+            return {"files": 1}
+
+        async def broken(job):
+            raise RuntimeError("loader exploded")
+
+        async def slow(job):
+            started.set()
+            await asyncio.sleep(60)
+
+        manager.register("ingest", ingest)
+        manager.register("broken", broken)
+        manager.register("slow", slow)
+        ok, failed, cancelled = (manager.submit(kind, {}) for kind in ("ingest", "broken", "slow"))
+        await started.wait()
+        assert manager.cancel(cancelled.id)
+        await asyncio.sleep(0.05)
+        assert not manager.cancel(cancelled.id)
+        await manager.shutdown()
+        return manager, ok, failed, cancelled
+
+    manager, ok, failed, cancelled = asyncio.run(main())
+    stored = {job.id: job for job in manager.list()}
+    assert stored[ok.id].status == JobStatus.SUCCEEDED
+    assert stored[ok.id].result == {"files": 1} and stored[ok.id].progress.indexed == 3
+    assert stored[failed.id].status == JobStatus.FAILED and stored[failed.id].error == "loader exploded"
+    assert stored[cancelled.id].status == JobStatus.CANCELLED and stored[cancelled.id].finished_at
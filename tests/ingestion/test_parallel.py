@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.ingestion.parallel import imap_ordered
+
+def slow_square(x):
+    # Later items finish first, so ordering can't come from completion order
+    time.sleep(0.02 * (5 - x % 5))
+    return x * x
+
+def test_results_keep_input_order():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(imap_ordered(executor, slow_square, range(12), window=4)) == [x * x for x in range(12)]
+
+def test_items_are_submitted_lazily_within_the_window():
+    pulled = []
+
+    def items():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = imap_ordered(executor, slow_square, items(), window=3)
+        assert next(results) == 0
+        assert len(pulled) == 3
+        assert list(results) == [x * x for x in range(1, 100)]
+
+def test_error_is_raised_at_its_position():
+    def fail_on_three(x):
+        if x == 3:
+            raise ValueError("cannot load 3")
+        return x
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = imap_ordered(executor, fail_on_three, range(6), window=2)
+        assert [next(results) for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(ValueError, match="cannot load 3"):
+            next(results)
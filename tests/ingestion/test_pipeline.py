@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from src.ingestion.chunking import FixedSizeChunker
+from src.ingestion.dedup import ChunkDeduplicator
+from src.ingestion.pipeline import IngestPipeline
+from src.types import Document
+
+class FakeRetriever:
+    """Stands in for RetrievalService; indexing waits until ``release`` is set."""
+
+    def __init__(self, embed_error=None):
+        self.embedding_gen = self
+        self.embed_error = embed_error
+        self.release = asyncio.Event()
+        self.indexed = []
+        self.flushed = False
+
+    async def embed_chunks(self, chunks):
+        if self.embed_error:
+            raise self.embed_error
+
+    async def index(self, chunks):
+        await self.release.wait()
+        self.indexed.extend(chunks)
+
+    async def add_duplicates(self, duplicates):
+        pass
+
+    async def flush(self):
+        self.flushed = True
+
+class CountingDocuments:
+    """Document stream that records how far the pipeline has read into it."""
+
+    def __init__(self, count):
+        self.count = count
+        self.pulled = 0
+
+    def __iter__(self):
+        for i in range(self.count):
+            self.pulled += 1
+            yield Document(content=f"document {i}", metadata={"source": f"{i}.txt"})
+
+def make_pipeline(retriever):
+    return IngestPipeline(retriever, FixedSizeChunker(), batch_size=1, queue_size=1, embed_workers=1, dedup=False)
+
+def test_stalled_index_stage_bounds_how_much_is_read_ahead():
+    docs = CountingDocuments(200)
+
+    async def main():
+        retriever = FakeRetriever()
+        run = asyncio.create_task(make_pipeline(retriever).run(docs))
+        await asyncio.sleep(0.2)
+        # Queues of 8 documents and 1 batch per stage, plus one item in hand per stage
+        stalled_at = docs.pulled
+        assert stalled_at <= 16 and not retriever.indexed
+        retriever.release.set()
+        stats = await run
+        return stalled_at, stats, retriever
+
+    stalled_at, stats, retriever = asyncio.run(main())
+    assert stalled_at > 0
+    assert stats.documents == stats.indexed == len(retriever.indexed) == 200
+    assert retriever.flushed
+
+def test_cancelling_the_run_stops_every_stage():
+    docs = CountingDocuments(200)
+
+    async def main():
+        retriever = FakeRetriever()
+        run = asyncio.create_task(make_pipeline(retriever).run(docs))
+        await asyncio.sleep(0.1)
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        pulled = docs.pulled
+        # Unblocking the index stage afterwards must not resume the cancelled stages
+        retriever.release.set()
+        await asyncio.sleep(0.1)
+        return pulled, retriever
+
+    pulled, retriever = asyncio.run(main())
+    assert docs.pulled == pulled < 200
+    assert not retriever.indexed and not retriever.flushed
+
+def test_stage_error_is_raised_from_run_without_flushing():
+    retriever = FakeRetriever(embed_error=RuntimeError("embedding API down"))
+    retriever.release.set()
+
+    async def main():
+        # The other stages are cancelled instead of waiting on queues forever
+        return await asyncio.wait_for(make_pipeline(retriever).run(CountingDocuments(200)), timeout=5)
+
+    with pytest.raises(RuntimeError, match="embedding API down"):
+        asyncio.run(main())
+    assert not retriever.indexed and not retriever.flushed
+
+def test_dedup_can_be_turned_off_per_pipeline(monkeypatch):
+    monkeypatch.setattr("src.ingestion.pipeline.settings.INGEST_DEDUP_ENABLED", True)
+    retriever = FakeRetriever()
+    assert IngestPipeline(retriever, FixedSizeChunker()).deduplicator is not None
+    assert IngestPipeline(retriever, FixedSizeChunker(), dedup=False).deduplicator is None
+    assert IngestPipeline(retriever, FixedSizeChunker(), deduplicator=ChunkDeduplicator(), dedup=False).deduplicator is None
+
+    monkeypatch.setattr("src.ingestion.pipeline.settings.INGEST_DEDUP_ENABLED", False)
+    assert IngestPipeline(retriever, FixedSizeChunker()).deduplicator is None
+    assert IngestPipeline(retriever, FixedSizeChunker(), dedup=True).deduplicator is not None
+    deduplicator = ChunkDeduplicator()
+    assert IngestPipeline(retriever, FixedSizeChunker(), deduplicator=deduplicator).deduplicator is deduplicator
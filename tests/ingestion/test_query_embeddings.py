@@ -0,0 +1,45 @@
+import asyncio
+import numpy as np
+from src.ingestion.query_embeddings import QueryEmbeddingCache
+
+def test_concurrent_misses_share_one_request_and_entries_expire():
+    cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=60)
+    calls = []
+
+    async def embed():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return np.ones(4, dtype=np.float32)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_embed("q", embed) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1 and all(np.array_equal(r, results[0]) for r in results)
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 4
+
+    cache.put("a", np.zeros(4))
+    cache.put("b", np.zeros(4))
+    assert cache.get("q") is None  # Least recently used, evicted
+    cache.ttl_seconds = -1
+    cache.put("c", np.zeros(4))
+    assert cache.get("c") is None
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    cache = QueryEmbeddingCache()
+
+    async def embed():
+        await asyncio.sleep(0.02)
+        return np.ones(4, dtype=np.float32)
+
+    async def main():
+        owner = asyncio.create_task(cache.get_or_embed("q", embed))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_embed("q", embed))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return owner, await waiter
+
+    owner, vector = asyncio.run(main())
+    assert owner.cancelled() and np.array_equal(vector, np.ones(4))
+    assert cache.stats()["misses"] == 1 and np.array_equal(cache.get("q"), np.ones(4))
@@ -0,0 +1,131 @@
+import asyncio
+import numpy as np
+import pytest
+from src.orchestration.cache_backends import CacheBackend, CachePartition, MemoryCacheBackend, SharedCacheBackend
+from src.orchestration.caching import ExactMatchCache, SemanticCache
+
+class FixedEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def embed_query(self, query):
+        return self.vectors[query]
+
+@pytest.mark.parametrize("backend", ["memory", "shared"])
+def test_partitions_eviction_and_ttl(backend, tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = {f"q{i}": rng.normal(size=64).astype(np.float32) for i in range(10)}
+    if backend == "memory":
+        backend = MemoryCacheBackend(max_entries=4, eviction="lru")
+    else:
+        backend = SharedCacheBackend(str(tmp_path), max_entries=4, eviction="lru")
+    # Only the semantic tier, whose eviction is under test
+    cache = SemanticCache(threshold=0.95, ttl_seconds=60, dimensions=32, backend=backend, exact=ExactMatchCache(max_entries=0))
+    cache.embedding_gen = FixedEmbeddings(vectors)
+
+    async def main():
+        await cache.set("q0", "a0", ["hr"])
+        assert await cache.get("q0", ["hr"]) == "a0"
+        assert await cache.get("q0", ["hr", "eng"]) is None  # Different ACL partition
+        assert await cache.get("q1", ["hr"]) is None
+
+        for i in range(1, 4):
+            await cache.set(f"q{i}", f"a{i}", [])
+        await cache.get("q0", ["hr"])  # Most recently used now
+        await cache.set("q4", "a4", [])
+        assert await cache.get("q0", ["hr"]) == "a0"
+        assert await cache.get("q1", []) is None  # Least recently used, evicted
+        assert cache.size == 4
+
+        cache.ttl_seconds = -1
+        await cache.set("q5", "a5", [])
+        assert await cache.get("q5", []) is None
+
+    asyncio.run(main())
+
+def test_large_partition_probes_clusters():
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(200, 64)).astype(np.float32)
+    vectors = centers[rng.integers(200, size=5000)] + 0.3 * rng.normal(size=(5000, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    partition = CachePartition(64, exact_threshold=2000, nprobe=4)
+    for i, vector in enumerate(vectors):
+        partition.insert(vector, str(i), expires=1e12 if i % 2 else 0.5, now=0)
+
+    assert partition._centroids is not None
+    assert all(partition.lookup(vectors[i], 0.99, now=1) == (str(i), 1e12) for i in range(1, 5000, 98))
+    assert partition.lookup(vectors[0], 0.99, now=1) is None
+
+def test_shared_backend_is_seen_by_other_workers_and_restarts(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(3, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    worker_a = SharedCacheBackend(str(tmp_path), max_entries=2)
+    worker_b = SharedCacheBackend(str(tmp_path), max_entries=2)
+
+    worker_a.insert('["hr"]', vectors[0], "a0", expires=1e12, now=1)
+    worker_a.insert('["hr"]', vectors[1], "a1", expires=1e12, now=2)
+    assert worker_b.lookup('["hr"]', vectors[0], 0.99, now=3) == ("a0", 1e12)
+    assert worker_b.lookup("[]", vectors[0], 0.99, now=3) is None
+
+    # Evictions by one worker are seen by the others; a1 is least recently used
+    worker_b.insert('["hr"]', vectors[2], "a2", expires=1e12, now=4)
+    assert worker_a.lookup('["hr"]', vectors[1], 0.99, now=5) is None
+    assert worker_a.lookup('["hr"]', vectors[2], 0.99, now=5) == ("a2", 1e12)
+    worker_a.conn.close()
+    worker_b.conn.close()
+
+    restarted = SharedCacheBackend(str(tmp_path), max_entries=2)
+    assert restarted.lookup('["hr"]', vectors[0], 0.99, now=6) == ("a0", 1e12)
+    assert len(restarted) == 2
+
+def test_exact_repeats_skip_the_embedding():
+    rng = np.random.default_rng(3)
+    vector = rng.normal(size=32).astype(np.float32)
+    embeddings = FixedEmbeddings({"what is the sla?": vector, "What is the SLA?": vector})
+    calls = []
+    embed_query = embeddings.embed_query
+
+    async def counting_embed_query(query):
+        calls.append(query)
+        return await embed_query(query)
+
+    embeddings.embed_query = counting_embed_query
+    cache = SemanticCache(threshold=0.95, ttl_seconds=60, backend=MemoryCacheBackend(max_entries=10))
+    cache.embedding_gen = embeddings
+
+    async def main():
+        await cache.set("what is the sla?", "99.9%", ["ops"])
+        calls.clear()
+        assert await cache.get("  What is the  SLA? ", ["ops"]) == "99.9%"
+        assert calls == []
+        assert await cache.get("What is the SLA?", ["eng"]) is None  # Other access groups
+
+    asyncio.run(main())
+    stats = cache.stats()
+    assert stats["exact"]["hits"] == 1 and stats["semantic"]["misses"] == 1 and stats["overall"]["hits"] == 1
+
+def test_promoted_semantic_hits_expire_with_the_entry():
+    rng = np.random.default_rng(4)
+    vector = rng.normal(size=32).astype(np.float32)
+    backend = MemoryCacheBackend(max_entries=10)
+    cache = SemanticCache(threshold=0.95, ttl_seconds=60, backend=backend, exact=ExactMatchCache(max_entries=0))
+    cache.embedding_gen = FixedEmbeddings({"q": vector, "paraphrase": vector})
+    asyncio.run(cache.set("q", "answer"))
+
+    # The exact tier is empty; the paraphrase is a semantic hit, promoted with the entry's expiry
+    cache.exact = ExactMatchCache(max_entries=10)
+    assert asyncio.run(cache.get("paraphrase")) == "answer"
+    expires = backend.partitions[cache.partition_key(None)]._expires[0]
+    key = cache.exact.make_key("paraphrase", cache.partition_key(None))
+    assert cache.exact._entries[key] == ("answer", expires)
+    assert cache.exact.get(key, now=expires) is None
+
+def test_incomplete_backend_fails_at_instantiation():
+    class LookupOnly(CacheBackend):
+        def lookup(self, partition, vector, threshold, now):
+            return None
+
+    with pytest.raises(TypeError):
+        LookupOnly()
@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+from src.auth.models import User
+from src.ingestion.embeddings import EmbeddingGenerator
+from src.ingestion.query_embeddings import QueryEmbeddingCache
+from src.orchestration.cache_backends import MemoryCacheBackend
+from src.orchestration.caching import SemanticCache
+from src.orchestration.rag import RAGOrchestrator
+
+USER = User(id="1", username="alice", groups=["engineering"])
+
+class FakeRetriever:
+    async def search(self, query, user, limit=10, timings=None):
+        return []
+
+class FakeStream:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.text = ""
+
+    async def __aiter__(self):
+        for delta in self.deltas:
+            self.text += delta
+            yield delta
+
+class FakeLLM:
+    def stream_completion(self, messages, user_id=None):
+        return FakeStream(["The SLA ", "is 99.9%."])
+
+def make_orchestrator(embedded):
+    # No process-wide query cache, so only the request scope can save a second embedding
+    generator = EmbeddingGenerator.__new__(EmbeddingGenerator)
+    generator.client = SimpleNamespace(api_key="test-key")
+    generator.deployment = "embeddings"
+    generator.dimensions = None
+    generator.query_cache = QueryEmbeddingCache(max_entries=0)
+
+    async def embed_one(query):
+        embedded.append(query)
+        return np.ones(8, dtype=np.float32)
+
+    generator._embed_one = embed_one
+    cache = SemanticCache(threshold=0.95, ttl_seconds=60, backend=MemoryCacheBackend(max_entries=10))
+    cache.embedding_gen = generator
+
+    orchestrator = RAGOrchestrator.__new__(RAGOrchestrator)
+    orchestrator.retriever = FakeRetriever()
+    orchestrator.llm = FakeLLM()
+    orchestrator.cache = cache
+    return orchestrator
+
+def test_streamed_answer_is_cached_without_embedding_the_query_again():
+    embedded = []
+    orchestrator = make_orchestrator(embedded)
+
+    async def main():
+        result = await orchestrator.query_stream("what is the sla?", USER)
+        return "".join([delta async for delta in result["answer"]])
+
+    assert asyncio.run(main()) == "The SLA is 99.9%."
+    assert embedded == ["what is the sla?"]
+    assert orchestrator.cache.size == 1
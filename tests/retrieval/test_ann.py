@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from src.retrieval.ann import IVFIndex, VectorEntry
+from src.retrieval.dir_lock import IndexLockedError
+
+def clustered(rng, n, dim=32, clusters=20):
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.2 * rng.normal(size=(n, dim))).astype(np.float32)
+
+def test_inserts_deletes_and_training_survive_reopen(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, 3000)
+    index = IVFIndex(str(tmp_path), dim=32, exact_threshold=1000)
+    for start in range(0, 3000, 500):
+        index.add([VectorEntry(key=str(i), vector=vectors[i], payload=str(i), source=f"{i % 2}.md") for i in range(start, start + 500)])
+    assert index.trained
+    index.delete_by_source(["0.md"])
+    index.add([VectorEntry(key="late", vector=vectors[0], payload="late")])  # After the last flush
+    index.close()
+
+    reopened = IVFIndex(str(tmp_path), dim=32, exact_threshold=1000)
+    assert len(reopened) == 1501 and reopened.trained
+    hits = reopened.search(vectors[0], limit=20)
+    assert list(reopened.fetch([hits[0][0]]).values()) == ["late"]
+    assert all(payload == "late" or int(payload) % 2 == 1 for payload in reopened.fetch([doc_id for doc_id, _ in hits]).values())
+
+def test_probe_recall_and_group_filter():
+    rng = np.random.default_rng(1)
+    vectors = clustered(rng, 5000)
+    index = IVFIndex(dim=32, nprobe=8, exact_threshold=1000)
+    index.add([
+        VectorEntry(key=str(i), vector=vectors[i], payload=str(i), group="management" if i % 50 else "engineering")
+        for i in range(5000)
+    ])
+
+    queries = clustered(rng, 50)
+    recall = np.mean([
+        len({d for d, _ in index.search(q, 10)} & {d for d, _ in index.search(q, 10, exact=True)}) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+
+    # Only 100 engineering rows, spread over all lists: probing widens until the top k is full
+    hits = index.search(queries[0], limit=10, groups=["engineering"])
+    assert len(hits) == 10
+    assert all(int(payload) % 50 == 0 for payload in index.fetch([doc_id for doc_id, _ in hits]).values())
+
+def test_second_opener_fails_until_the_first_closes(tmp_path):
+    index = IVFIndex(str(tmp_path), dim=8)
+    with pytest.raises(IndexLockedError):
+        IVFIndex(str(tmp_path), dim=8)
+    index.close()
+    IVFIndex(str(tmp_path), dim=8).close()
+
+def test_delete_by_source_keeps_listed_keys(tmp_path):
+    rng = np.random.default_rng(2)
+    index = IVFIndex(str(tmp_path), dim=32)
+    vectors = clustered(rng, 4)
+    index.add([VectorEntry(key=str(i), vector=vectors[i], payload=str(i), source="a.md" if i < 3 else "b.md") for i in range(4)])
+
+    assert sorted(index.delete_by_source(["a.md"], keep=["0", "1"])) == ["2"]
+    assert sorted(index.fetch([doc_id for doc_id, _ in index.search(vectors[0], limit=10)]).values()) == ["0", "1", "3"]
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from src.retrieval.batching import MicroBatcher
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+    threads = set()
+
+    def score(batch):
+        calls.append(list(batch))
+        threads.add(threading.current_thread().name)
+        return [len(item) for item in batch]
+
+    batcher = MicroBatcher(score, max_batch_size=100, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(["x" * i, "y" * (i + 1)]) for i in range(10)))
+
+    results = asyncio.run(main())
+    batcher.close()
+
+    assert results == [[i, i + 1] for i in range(10)]
+    assert len(calls) == 1 and len(calls[0]) == 20
+    assert threads != {threading.main_thread().name}
+
+def test_batches_respect_max_size_and_propagate_errors():
+    sizes = []
+
+    def score(batch):
+        sizes.append(len(batch))
+        if "boom" in batch:
+            raise ValueError("boom")
+        return batch
+
+    batcher = MicroBatcher(score, max_batch_size=4, max_wait_ms=20)
+
+    async def main():
+        ok = await asyncio.gather(*(batcher.submit([i, i]) for i in range(4)))
+        try:
+            await batcher.submit(["boom"])
+        except ValueError:
+            return ok, True
+        return ok, False
+
+    ok, raised = asyncio.run(main())
+    batcher.close()
+
+    assert ok == [[i, i] for i in range(4)]
+    assert max(sizes[:-1]) <= 4 and raised
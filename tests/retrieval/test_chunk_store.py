@@ -0,0 +1,11 @@
+from src.retrieval.chunk_store import ChunkTextStore
+
+def test_round_trip_and_delete(tmp_path):
+    store = ChunkTextStore(str(tmp_path / "chunks.db"))
+    store.put_many([(f"c{i}", f"{i % 2}.md", f"d{i % 3}", f"text {i} " * 50) for i in range(1200)])
+    assert store.get_many(["c0", "c999", "missing"]) == {"c0": "text 0 " * 50, "c999": "text 999 " * 50}
+
+    store.delete_matching("source", ["0.md"])
+    store.delete_matching("document_id", ["d1"])
+    remaining = store.get_many([f"c{i}" for i in range(1200)])
+    assert sorted(remaining) == sorted(f"c{i}" for i in range(1200) if i % 2 and i % 3 != 1)
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from src.types import Chunk
+from src.retrieval.dir_lock import IndexLockedError
+from src.retrieval.keyword import KeywordSearch
+from src.retrieval.inverted_index import IndexEntry, InvertedIndex
+
+def make_entry(key, text, source="a.md"):
+    return IndexEntry(key=key, text=text, payload=text, source=source)
+
+def test_batches_are_appended_not_replaced():
+    index = InvertedIndex()
+    index.add([make_entry("1", "qdrant stores vectors")])
+    index.add([make_entry("2", "bm25 scores keywords")])
+
+    assert len(index) == 2
+    assert list(index.fetch([doc_id for doc_id, _ in index.search("Vectors")]).values()) == ["qdrant stores vectors"]
+    assert list(index.fetch([doc_id for doc_id, _ in index.search("keywords")]).values()) == ["bm25 scores keywords"]
+
+def test_deletes_and_segments_survive_reopen(tmp_path):
+    index = InvertedIndex(str(tmp_path), flush_postings=4, max_segments=2)
+    for i in range(10):
+        index.add([make_entry(str(i), f"shared term{i}", source=f"{i % 2}.md")])
+    assert index.delete_by_source(["0.md"]) == [f"shared term{i}" for i in range(0, 10, 2)]
+    index.close()
+
+    reopened = InvertedIndex(str(tmp_path))
+    assert len(reopened) == 5
+    assert sorted(reopened.fetch([doc_id for doc_id, _ in reopened.search("shared")]).values()) == [
+        f"shared term{i}" for i in range(1, 10, 2)
+    ]
+
+def test_unflushed_documents_are_replayed_on_open(tmp_path):
+    index = InvertedIndex(str(tmp_path))
+    index.add([make_entry("1", "written before a crash")])
+    index.add([make_entry("1", "replaced before a crash")])
+    index.close()
+
+    reopened = InvertedIndex(str(tmp_path))
+    assert len(reopened) == 1
+    assert reopened.search("written") == []
+    assert list(reopened.fetch([doc_id for doc_id, _ in reopened.search("crash")]).values()) == ["replaced before a crash"]
+
+def test_top_k_matches_exhaustive_scoring():
+    rng = np.random.default_rng(0)
+    index = InvertedIndex()
+    index._EXHAUSTIVE_POSTINGS = 0  # Always take the pruned path
+    words = [f"w{i}" for i in range(300)]
+    weights = 1.0 / np.arange(1, 301)
+    for start in range(0, 3000, 500):
+        index.add([
+            make_entry(str(i), " ".join(rng.choice(words, size=30, p=weights / weights.sum())))
+            for i in range(start, start + 500)
+        ])
+    index.delete_by_key([str(i) for i in range(0, 3000, 3)])
+
+    for query in ["w0 w250", "w1 w2 w3", "w299", "w5 w120 w17"]:
+        expected = index.search(query, limit=10, exhaustive=True)
+        actual = index.search(query, limit=10)
+        assert np.allclose([score for _, score in actual], [score for _, score in expected])
+
+def test_group_filter_returns_full_top_k_of_visible_docs(tmp_path):
+    index = InvertedIndex(str(tmp_path))
+    index._EXHAUSTIVE_POSTINGS = 0
+    index.add([IndexEntry(key=f"m{i}", text="budget budget plan", payload="management", group="management") for i in range(50)])
+    index.add([IndexEntry(key=f"e{i}", text="budget plan", payload="engineering", group="engineering") for i in range(5)])
+    index.add([IndexEntry(key="p", text="budget", payload="public")])
+
+    hits = index.search("budget", limit=10, groups=["engineering"])
+    assert sorted(index.fetch([doc_id for doc_id, _ in hits]).values()) == ["engineering"] * 5 + ["public"]
+
+    index.flush()
+    index.close()
+    reopened = InvertedIndex(str(tmp_path))
+    assert len(reopened.search("budget", limit=10, groups=["management"])) == 10
+    assert list(reopened.fetch([doc_id for doc_id, _ in reopened.search("budget", groups=[])]).values()) == ["public"]
+
+def test_orphan_segment_from_a_crash_is_discarded(tmp_path):
+    index = InvertedIndex(str(tmp_path))
+    index.add([make_entry("1", "flushed before the crash")])
+    index.flush()
+    # A segment written by a flush that died before updating the manifest
+    (tmp_path / f"seg-{index._next_segment:06d}").mkdir()
+    (tmp_path / f"seg-{index._next_segment:06d}" / "docs.npy").write_bytes(b"partial")
+    index.add([make_entry("2", "written after the crash")])
+    index.close()
+
+    reopened = InvertedIndex(str(tmp_path))
+    reopened.flush()
+    reopened.add([make_entry("3", "next ingest")])
+    reopened.flush()
+    assert sorted(reopened.fetch([doc_id for doc_id, _ in reopened.search("crash")]).values()) == [
+        "flushed before the crash", "written after the crash"
+    ]
+
+def test_search_skips_docs_deleted_before_fetch(tmp_path):
+    search = KeywordSearch(str(tmp_path))
+    search.index([
+        Chunk(id=f"c{i}", document_id="d", content=f"budget plan {i}", chunk_index=i, metadata={"source": f"{i}.md"})
+        for i in range(3)
+    ])
+    # Hits found just before a concurrent ingest removed one of them
+    stale_hits = search.index_store.search("budget")
+    search.remove_sources(["1.md"])
+    search.index_store.search = lambda *args, **kwargs: stale_hits
+
+    results = search.search("budget")
+    assert sorted(result.chunk.id for result in results) == ["c0", "c2"]
+    assert [result.rank for result in results] == [0, 1]
+
+    # Both indexes are single-process
+    with pytest.raises(IndexLockedError):
+        KeywordSearch(str(tmp_path))
+
+def test_has_sources():
+    index = InvertedIndex()
+    index.add([make_entry("1", "text", source="a.md")])
+    assert index.has_sources(["b.md", "a.md"])
+    assert not index.has_sources(["b.md"]) and not index.has_sources([])
+
+def test_default_keyword_index_is_private_to_each_instance():
+    # Like uvicorn workers: each opens its own temporary index instead of contending for a lock
+    first, second = KeywordSearch(), KeywordSearch()
+    assert first.index_store.path != second.index_store.path
+    first.index([Chunk(document_id="d", content="only in the first", chunk_index=0)])
+    assert len(first) == 1 and len(second) == 0
+
+    path = first.index_store.path
+    first.close()
+    second.close()
+    assert not path.exists()
+
+def test_delete_by_source_keeps_listed_keys():
+    index = InvertedIndex()
+    index.add([make_entry(str(i), f"shared term{i}", source="a.md" if i < 3 else "b.md") for i in range(4)])
+
+    assert index.payloads_by_source(["a.md"]) == ["shared term0", "shared term1", "shared term2"]
+    assert index.delete_by_source(["a.md"], keep=["0", "1"]) == ["shared term2"]
+    assert sorted(index.fetch([doc_id for doc_id, _ in index.search("shared")]).values()) == ["shared term0", "shared term1", "shared term3"]
@@ -0,0 +1,34 @@
+import importlib.util
+import sys
+import types
+import numpy as np
+import pytest
+from src.retrieval.reranking import OnnxCrossEncoder, load_cross_encoder
+
+MODEL = "cross-encoder/ms-marco-TinyBERT-L-2-v2"
+PAIRS = [
+    ["how do I rotate the api key", "API keys are rotated from the admin console under Security."],
+    ["how do I rotate the api key", "The cafeteria is open from 8am to 3pm."],
+    ["what is the refund window", "Refunds are accepted within 30 days of purchase."],
+]
+
+def test_onnx_scores_match_torch(tmp_path):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+
+    onnx_model = OnnxCrossEncoder(MODEL, model_dir=str(tmp_path / "model"), quantize=False)
+    torch_model = sentence_transformers.CrossEncoder(MODEL)
+    assert np.allclose(onnx_model.predict(PAIRS), torch_model.predict(PAIRS), atol=1e-4)
+    # The export was renamed into place, nothing is left half-written next to it
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["model"]
+
+def test_onnx_backend_falls_back_to_torch_without_onnxruntime(monkeypatch):
+    if importlib.util.find_spec("onnxruntime") is not None:
+        pytest.skip("onnxruntime is installed")
+    fake = types.ModuleType("sentence_transformers")
+    fake.CrossEncoder = lambda model_name: ("torch", model_name)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake)
+
+    assert load_cross_encoder(MODEL, backend="onnx") == ("torch", MODEL)
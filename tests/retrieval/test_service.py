@@ -0,0 +1,135 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from src.auth.models import User
+from src.retrieval.service import RetrievalService, RetrievalTimings
+from src.types import Chunk, SearchResult
+
+USER = User(id="1", username="alice", groups=["engineering"])
+
+def hit(chunk_id, content, score=1.0):
+    return SearchResult(chunk=Chunk(id=chunk_id, document_id="d", content=content, chunk_index=0), score=score, rank=0)
+
+class FakeEmbeddings:
+    async def embed_query(self, query):
+        return np.zeros(4, dtype=np.float32)
+
+class FakeVectorStore:
+    """Projected search: hits come back without content until hydrated."""
+
+    def __init__(self, ids, contents, search_delay=0.0, hydrate_delay=0.0):
+        self.ids = ids
+        self.contents = contents
+        self.search_delay = search_delay
+        self.hydrate_delay = hydrate_delay
+        self.hydrated = []
+
+    async def search(self, query_vector, limit=10, groups=None):
+        await asyncio.sleep(self.search_delay)
+        return [hit(chunk_id, None) for chunk_id in self.ids]
+
+    async def hydrate(self, results):
+        await asyncio.sleep(self.hydrate_delay)
+        missing = [res for res in results if res.chunk.content is None]
+        self.hydrated.extend(str(res.chunk.id) for res in missing)
+        for res in missing:
+            res.chunk.content = self.contents.get(str(res.chunk.id))
+
+class FakeKeywordSearch:
+    def __init__(self, results, delay=0.0):
+        self.results = results
+        self.delay = delay
+
+    def search(self, query, limit=10, groups=None):
+        time.sleep(self.delay)
+        return self.results
+
+class FakeReranker:
+    async def arerank(self, query, results, top_k=5):
+        return results[:top_k]
+
+def make_service(vector_store, keyword_results, keyword_delay=0.0):
+    service = RetrievalService.__new__(RetrievalService)
+    service.embedding_gen = FakeEmbeddings()
+    service.vector_store = vector_store
+    service.keyword_search = FakeKeywordSearch(keyword_results, keyword_delay)
+    service.reranker = FakeReranker()
+    return service
+
+def search(service, timings):
+    return asyncio.run(service.search("query", USER, limit=10, timings=timings))
+
+def test_keyword_hits_fill_in_content_and_deleted_chunks_are_dropped():
+    vector_store = FakeVectorStore(["a", "b", "gone"], {"b": "text b"})
+    service = make_service(vector_store, [hit("a", "text a")])
+    timings = RetrievalTimings()
+
+    results = search(service, timings)
+    assert {str(res.chunk.id): res.chunk.content for res in results} == {"a": "text a", "b": "text b"}
+    # Only the hits without keyword text are fetched
+    assert sorted(vector_store.hydrated) == ["b", "gone"]
+    assert timings.hydrate_ms is not None and timings.degraded == []
+
+def test_slow_hydration_degrades_to_keyword_results(monkeypatch):
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_VECTOR_TIMEOUT", 0.05)
+    service = make_service(FakeVectorStore(["a", "b"], {"b": "text b"}, hydrate_delay=1.0), [hit("a", "text a")])
+    timings = RetrievalTimings()
+
+    results = search(service, timings)
+    assert [(str(res.chunk.id), res.chunk.content) for res in results] == [("a", "text a")]
+    assert timings.degraded == ["hydrate"]
+
+class FailingVectorStore(FakeVectorStore):
+    async def search(self, query_vector, limit=10, groups=None):
+        raise ConnectionError("qdrant unreachable")
+
+def test_slow_vector_branch_degrades_to_keyword_results(monkeypatch):
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_VECTOR_TIMEOUT", 0.05)
+    service = make_service(FakeVectorStore(["b"], {"b": "text b"}, search_delay=1.0), [hit("a", "text a")])
+    timings = RetrievalTimings()
+
+    started = time.perf_counter()
+    results = search(service, timings)
+    assert time.perf_counter() - started < 0.5
+    assert [str(res.chunk.id) for res in results] == ["a"]
+    assert timings.degraded == ["vector"] and timings.vector_ms < 500
+
+def test_slow_keyword_branch_degrades_to_vector_results(monkeypatch):
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_KEYWORD_TIMEOUT", 0.05)
+    service = make_service(FakeVectorStore(["b"], {"b": "text b"}), [hit("a", "text a")], keyword_delay=0.3)
+    timings = RetrievalTimings()
+
+    results = search(service, timings)
+    assert [(str(res.chunk.id), res.chunk.content) for res in results] == [("b", "text b")]
+    assert timings.degraded == ["keyword"]
+
+def test_failing_branch_degrades_and_both_failing_raises(monkeypatch):
+    timings = RetrievalTimings()
+    results = search(make_service(FailingVectorStore([], {}), [hit("a", "text a")]), timings)
+    assert [str(res.chunk.id) for res in results] == ["a"] and timings.degraded == ["vector"]
+
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_KEYWORD_TIMEOUT", 0.05)
+    with pytest.raises(RuntimeError, match="All retrieval branches failed: vector, keyword"):
+        search(make_service(FailingVectorStore([], {}), [hit("a", "text a")], keyword_delay=0.3), RetrievalTimings())
+
+def test_timeout_is_raised_when_partial_results_are_disabled(monkeypatch):
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_VECTOR_TIMEOUT", 0.05)
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_ALLOW_PARTIAL", False)
+    service = make_service(FakeVectorStore(["b"], {"b": "text b"}, search_delay=1.0), [hit("a", "text a")])
+
+    with pytest.raises(asyncio.TimeoutError):
+        search(service, RetrievalTimings())
+
+def test_hydration_only_gets_what_is_left_of_the_vector_deadline(monkeypatch):
+    monkeypatch.setattr("src.retrieval.service.settings.RETRIEVAL_VECTOR_TIMEOUT", 0.3)
+    # Each step fits the deadline on its own, but not both together
+    vector_store = FakeVectorStore(["a", "b"], {"b": "text b"}, search_delay=0.2, hydrate_delay=0.2)
+    service = make_service(vector_store, [hit("a", "text a")])
+    timings = RetrievalTimings()
+
+    started = time.perf_counter()
+    results = search(service, timings)
+    assert time.perf_counter() - started < 0.38
+    assert [str(res.chunk.id) for res in results] == ["a"]
+    assert timings.degraded == ["hydrate"]
@@ -0,0 +1,135 @@
+import asyncio
+import numpy as np
+from src.types import Chunk, chunk_id_for, document_id_for
+import pytest
+from src.retrieval.vector import VectorStore, create_vector_store
+
+def make_chunks(source, count, rng, page=None):
+    document_id = document_id_for(source, page)
+    return [
+        Chunk(
+            id=chunk_id_for(document_id, i),
+            document_id=document_id,
+            content=f"{source} part {i}",
+            chunk_index=i,
+            metadata={"source": source},
+            embedding=rng.normal(size=3072).astype(np.float32)
+        )
+        for i in range(count)
+    ]
+
+def count_points(store):
+    return asyncio.run(store.client.count(store.collection_name)).count
+
+def test_ids_are_stable_and_distinct():
+    assert document_id_for("docs/a.md") == document_id_for("docs/a.md")
+    assert len({document_id_for("docs/a.md"), document_id_for("docs/a.md", 1), document_id_for("docs/a.md", 2)}) == 3
+    document_id = document_id_for("docs/a.md")
+    assert chunk_id_for(document_id, 0) == chunk_id_for(document_id, 0) != chunk_id_for(document_id, 1)
+
+def test_reingest_overwrites_points_in_bounded_batches():
+    rng = np.random.default_rng(0)
+    store = VectorStore(collection_name="reingest")
+    store.upsert_batch_size = 2
+    batches = []
+    upsert = store.client.upsert
+
+    async def recording_upsert(collection_name, points, **kwargs):
+        batches.append(len(points))
+        return await upsert(collection_name=collection_name, points=points, **kwargs)
+
+    store.client.upsert = recording_upsert
+    asyncio.run(store.upsert(make_chunks("a.md", 5, rng)))
+    assert sorted(batches) == [1, 2, 2]
+
+    # Same ids with new vectors replace the points instead of adding copies
+    asyncio.run(store.upsert(make_chunks("a.md", 5, rng)))
+    assert count_points(store) == 5
+
+def test_delete_documents_keeps_other_documents():
+    rng = np.random.default_rng(1)
+    store = VectorStore(collection_name="delete-documents")
+    asyncio.run(store.upsert(make_chunks("a.pdf", 3, rng, page=1) + make_chunks("a.pdf", 2, rng, page=2)))
+
+    asyncio.run(store.delete_documents([document_id_for("a.pdf", 1)]))
+    assert count_points(store) == 2
+    asyncio.run(store.delete_documents([]))
+    assert count_points(store) == 2
+
+def test_set_duplicates_updates_payloads():
+    rng = np.random.default_rng(2)
+    store = VectorStore(collection_name="duplicates")
+    chunks = make_chunks("a.md", 2, rng)
+    asyncio.run(store.upsert(chunks))
+
+    aliases = [{"document_id": "b", "chunk_index": 0, "source": "b.md"}]
+    asyncio.run(store.set_duplicates({chunks[1].id: aliases}))
+    points = asyncio.run(store.client.retrieve(store.collection_name, [chunk.id for chunk in chunks]))
+    assert {point.id: point.payload.get("duplicates") for point in points} == {chunks[0].id: None, chunks[1].id: aliases}
+
+def test_has_sources():
+    store = VectorStore(collection_name="has-sources")
+    asyncio.run(store.upsert(make_chunks("a.md", 1, np.random.default_rng(3))))
+    assert asyncio.run(store.has_sources(["b.md", "a.md"]))
+    assert not asyncio.run(store.has_sources(["b.md"])) and not asyncio.run(store.has_sources([]))
+
+def test_projected_search_leaves_content_for_hydrate():
+    rng = np.random.default_rng(4)
+    store = VectorStore(collection_name="projected")
+    chunks = make_chunks("a.md", 3, rng)
+    asyncio.run(store.upsert(chunks))
+
+    results = asyncio.run(store.search(chunks[0].embedding, limit=3))
+    assert len(results) == 3 and all(res.chunk.content is None for res in results)
+    assert results[0].chunk.metadata["source"] == "a.md"
+    asyncio.run(store.hydrate(results))
+    assert {res.chunk.content for res in results} == {chunk.content for chunk in chunks}
+
+def test_chunk_store_follows_qdrant_upserts_and_deletes(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.retrieval.vector.settings.CHUNK_STORE_PATH", str(tmp_path / "chunks.db"))
+    rng = np.random.default_rng(5)
+    store = VectorStore(collection_name="chunk-store")
+    a, b = make_chunks("a.md", 2, rng), make_chunks("b.md", 2, rng)
+    asyncio.run(store.upsert(a + b))
+    ids = [chunk.id for chunk in a + b]
+    assert store.chunk_store.get_many(ids) == {chunk.id: chunk.content for chunk in a + b}
+    points = asyncio.run(store.client.retrieve(store.collection_name, ids))
+    assert all("content" not in point.payload for point in points)
+
+    asyncio.run(store.delete_by_source(["a.md"]))
+    asyncio.run(store.delete_documents([b[0].document_id]))
+    assert store.chunk_store.get_many(ids) == {} and count_points(store) == 0
+
+    # Content comes from the chunk store even when asked for with the search
+    asyncio.run(store.upsert(a))
+    results = asyncio.run(store.search(a[0].embedding, limit=1, with_content=True))
+    assert results[0].chunk.content == a[0].content
+
+def test_local_backend_is_opt_in(tmp_path, monkeypatch):
+    # Without QDRANT_URL the default is still Qdrant (in memory), never the locked local index
+    monkeypatch.setattr("src.retrieval.vector.settings.QDRANT_URL", None)
+    assert isinstance(create_vector_store(), VectorStore)
+
+    from src.retrieval.local_vector import LocalVectorStore
+    monkeypatch.setattr("src.retrieval.vector.settings.VECTOR_BACKEND", "local")
+    monkeypatch.setattr("src.retrieval.vector.settings.LOCAL_VECTOR_PATH", str(tmp_path))
+    store = create_vector_store()
+    assert isinstance(store, LocalVectorStore)
+    store.close()
+
+    monkeypatch.setattr("src.retrieval.vector.settings.VECTOR_BACKEND", "auto")
+    with pytest.raises(ValueError, match="Unknown vector backend"):
+        create_vector_store()
+
+def test_delete_by_source_keeps_listed_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.retrieval.vector.settings.CHUNK_STORE_PATH", str(tmp_path / "chunks.db"))
+    rng = np.random.default_rng(6)
+    store = VectorStore(collection_name="delete-keep")
+    a, b = make_chunks("a.md", 3, rng), make_chunks("b.md", 1, rng)
+    asyncio.run(store.upsert(a + b))
+
+    asyncio.run(store.delete_by_source(["a.md"], keep=[a[0].id, a[1].id]))
+    ids = [chunk.id for chunk in a + b]
+    points = asyncio.run(store.client.retrieve(store.collection_name, ids))
+    assert sorted(point.id for point in points) == sorted([a[0].id, a[1].id, b[0].id])
+    assert sorted(store.chunk_store.get_many(ids)) == sorted([a[0].id, a[1].id, b[0].id])
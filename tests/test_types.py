@@ -0,0 +1,32 @@
+import numpy as np
+from src.types import Chunk, SearchResult, chunk_id_for
+
+def make_chunk():
+    return Chunk(
+        document_id="doc-1",
+        content="hello world",
+        chunk_index=3,
+        metadata={"source": "a.md", "access_group": "engineering"},
+        embedding=np.ones(8, dtype=np.float32),
+        token_count=2
+    )
+
+def test_chunk_to_model_round_trips_without_embedding():
+    chunk = make_chunk()
+    data = chunk.to_model().model_dump()
+
+    assert "embedding" not in data
+    assert data["id"] == chunk_id_for("doc-1", 3)
+    restored = Chunk(**data)
+    assert restored.embedding is None
+    for name in ("id", "document_id", "content", "chunk_index", "metadata", "token_count"):
+        assert getattr(restored, name) == getattr(chunk, name)
+
+def test_search_result_to_model_round_trips_without_embedding():
+    result = SearchResult(chunk=make_chunk(), score=0.75, rank=1)
+    data = result.to_model().model_dump()
+
+    assert "embedding" not in data["chunk"]
+    restored = SearchResult(chunk=Chunk(**data["chunk"]), score=data["score"], rank=data["rank"])
+    assert (restored.score, restored.rank) == (0.75, 1)
+    assert restored.chunk.content == "hello world" and restored.chunk.embedding is None